@@ -0,0 +1,332 @@
+"""
+Reproducible load test for every API route.
+
+Seeds a realistic data set, then drives each route through the ASGI app at a
+configurable concurrency and reports throughput and p50/p95/p99 latency.
+Results can be saved as a baseline; later runs compared against it fail
+(exit code 1) when a route regresses beyond the threshold.
+
+By default the app runs against an in-process fake of the Prisma models
+(benchmarks/fake_prisma.py). With `--backend postgres` it uses the database
+from DATABASE_URL instead; that database is emptied before seeding, so point
+it at a dedicated instance.
+
+Usage:
+    python -m benchmarks.api_load --requests 2000 --concurrency 64
+    python -m benchmarks.api_load --save-baseline benchmarks/baseline.json
+    python -m benchmarks.api_load --baseline benchmarks/baseline.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import prisma
+import prisma.models
+
+SEED = 1234
+
+PASSWORD = "correct horse"
+
+ACTIONS = ["Reboot", "Update", "ConfigurationChange"]
+
+CONTENT_TYPES = ["Image", "Video", "NewsTicker"]
+
+
+class Dataset:
+    """
+    Identifiers of the seeded rows, used to build realistic requests.
+    """
+
+    def __init__(self) -> None:
+        self.kiosks: List[str] = []
+        self.users: List[str] = []
+        self.emails: List[str] = []
+        self.tokens: List[str] = []
+
+
+async def seed(args: argparse.Namespace) -> Dataset:
+    from project.password_hashing import pwd_context
+    from project.user_login_service import create_access_token
+
+    rng = random.Random(SEED)
+    now = datetime.now(timezone.utc)
+    data = Dataset()
+    for model in (
+        "AuthToken",
+        "DeviceInteraction",
+        "ContentInteraction",
+        "UserFeedback",
+        "UserProfile",
+        "Content",
+        "Device",
+        "User",
+    ):
+        await getattr(prisma.models, model).prisma().delete_many()
+
+    hashed = pwd_context.hash(PASSWORD)
+    users = []
+    for i in range(args.users):
+        user_id = str(uuid.uuid4())
+        data.users.append(user_id)
+        data.emails.append(f"user{i}@example.org")
+        users.append(
+            {
+                "id": user_id,
+                "email": data.emails[-1],
+                "password": hashed,
+                # The first user administers the routes that require permissions.
+                "role": "MunicipalAdmin"
+                if i == 0
+                else rng.choice(["MunicipalAdmin", "Technician", "Citizen"]),
+            }
+        )
+    await prisma.models.User.prisma().create_many(data=users)
+    await prisma.models.UserProfile.prisma().create_many(
+        data=[
+            {
+                "userId": user_id,
+                "firstName": "Test",
+                "lastName": f"User {i}",
+                "language": rng.choice(["en", "fr", "de", "es"]),
+            }
+            for i, user_id in enumerate(data.users)
+        ]
+    )
+
+    devices = []
+    for i in range(args.kiosks):
+        device_id = str(uuid.uuid4())
+        data.kiosks.append(device_id)
+        devices.append(
+            {
+                "id": device_id,
+                "identifier": f"kiosk-{i:05d}",
+                "os": "linux",
+                "status": "Online",
+                "lastCheckIn": now,
+                "location": f"Site {i % 50}",
+            }
+        )
+    await prisma.models.Device.prisma().create_many(data=devices)
+
+    contents = []
+    for kiosk in data.kiosks:
+        for j in range(args.content_per_kiosk):
+            contents.append(
+                {
+                    "kioskId": kiosk,
+                    "title": f"Item {j}",
+                    "contentBody": "Lorem ipsum dolor sit amet. " * 20,
+                    "contentType": rng.choice(CONTENT_TYPES),
+                    "scheduledTime": now + timedelta(hours=rng.randint(-72, 24)),
+                    "isActive": rng.random() > 0.1,
+                }
+            )
+    for start in range(0, len(contents), 5000):
+        await prisma.models.Content.prisma().create_many(
+            data=contents[start : start + 5000]
+        )
+
+    interactions = [
+        {
+            "deviceId": rng.choice(data.kiosks),
+            "userId": rng.choice(data.users),
+            "action": rng.choice(ACTIONS),
+            "description": "Scheduled maintenance",
+            "createdAt": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+        }
+        for _ in range(args.interactions)
+    ]
+    for start in range(0, len(interactions), 5000):
+        await prisma.models.DeviceInteraction.prisma().create_many(
+            data=interactions[start : start + 5000]
+        )
+
+    tokens = []
+    for user_id, email in zip(data.users, data.emails):
+        token = create_access_token(
+            {"sub": email, "jti": str(uuid.uuid4())}, timedelta(hours=1)
+        )
+        data.tokens.append(token)
+        tokens.append(
+            {"token": token, "userId": user_id, "expiresAt": now + timedelta(hours=1)}
+        )
+    await prisma.models.AuthToken.prisma().create_many(data=tokens)
+    return data
+
+
+def scenarios(
+    client: httpx.AsyncClient, data: Dataset
+) -> Dict[str, Callable[[random.Random], Awaitable[httpx.Response]]]:
+    admin = {"Authorization": f"Bearer {data.tokens[0]}"}
+    return {
+        "GET /content/{kioskId}": lambda rng: client.get(
+            f"/content/{rng.choice(data.kiosks)}"
+        ),
+        "POST /content/{kioskId}/update": lambda rng: client.post(
+            f"/content/{rng.choice(data.kiosks)}/update",
+            params={
+                "title": f"Item {rng.randint(0, 50)}",
+                "contentBody": "Updated body",
+                "contentType": rng.choice(CONTENT_TYPES),
+                "scheduledTime": datetime.now(timezone.utc).isoformat(),
+                "isActive": True,
+            },
+            headers=admin,
+        ),
+        "GET /ui-settings/{userId}": lambda rng: client.get(
+            f"/ui-settings/{rng.choice(data.users)}"
+        ),
+        "PUT /ui-settings/{userId}/update": lambda rng: client.put(
+            f"/ui-settings/{rng.choice(data.users)}/update",
+            params={"theme": "dark", "layout": "grid", "language": "en"},
+            headers=admin,
+        ),
+        "PUT /users/{userId}/permissions": lambda rng: client.put(
+            f"/users/{rng.choice(data.users)}/permissions",
+            json=["Technician"],
+            headers=admin,
+        ),
+        "POST /auth/login": lambda rng: client.post(
+            "/auth/login",
+            params={"username": rng.choice(data.emails), "password": PASSWORD},
+        ),
+        "POST /auth/logout": lambda rng: client.post(
+            "/auth/logout", params={"token": rng.choice(data.tokens[1:])}
+        ),
+        "GET /security/audit-logs": lambda rng: client.get(
+            "/security/audit-logs", params={"limit": 100}, headers=admin
+        ),
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def drive(
+    request: Callable[[random.Random], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    rng = random.Random(SEED)
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await request(rng)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput": total / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    regressions = []
+    for route, result in results.items():
+        reference = baseline.get(route)
+        if reference is None:
+            continue
+        if result["p95_ms"] > reference["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{route}: p95 {result['p95_ms']:.2f}ms vs baseline {reference['p95_ms']:.2f}ms"
+            )
+        if result["throughput"] < reference["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{route}: {result['throughput']:.0f} req/s vs baseline {reference['throughput']:.0f} req/s"
+            )
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["fake", "postgres"], default="fake")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--kiosks", type=int, default=300)
+    parser.add_argument("--content-per-kiosk", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--interactions", type=int, default=100000)
+    parser.add_argument("--routes", nargs="*", help="Only run routes containing these substrings")
+    parser.add_argument("--baseline", help="Compare against this baseline file")
+    parser.add_argument("--save-baseline", help="Write the results to this file")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        from benchmarks import fake_prisma
+
+        fake = fake_prisma.install()
+
+    import project.server
+
+    if args.backend == "fake":
+        project.server.db_client = fake
+
+    async with project.server.lifespan(project.server.app):
+        data = await seed(args)
+        transport = httpx.ASGITransport(app=project.server.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            results = {}
+            for route, request in scenarios(client, data).items():
+                if args.routes and not any(part in route for part in args.routes):
+                    continue
+                results[route] = await drive(request, args.requests, args.concurrency)
+                result = results[route]
+                print(
+                    f"{route:<36} {result['throughput']:9.1f} req/s  "
+                    f"p50={result['p50_ms']:8.2f}ms  p95={result['p95_ms']:8.2f}ms  "
+                    f"p99={result['p99_ms']:8.2f}ms  errors={result['errors']:.0f}"
+                )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
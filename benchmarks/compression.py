@@ -0,0 +1,149 @@
+"""
+CPU cost against bytes saved for each response encoding.
+
+Compresses a per-kiosk content snapshot and an audit-log page with every
+encoding available in this process (gzip always; brotli and zstd when their
+packages are installed) at the dynamic and static levels used by
+`project.compression`, and at the extremes. A final table shows why bodies
+below `COMPRESSION_MIN_BYTES` are sent as is: small bodies save few bytes
+while still paying the per-call overhead.
+
+Usage:
+    python -m benchmarks.compression --items 200 --rows 100
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+from project.compression import (
+    COMPRESSION_MIN_BYTES,
+    DYNAMIC_LEVELS,
+    GZIP,
+    STATIC_LEVELS,
+    SUPPORTED_ENCODINGS,
+    compress,
+)
+from project.fast_json import dumps
+
+EXTRA_LEVELS: Dict[str, List[int]] = {GZIP: [1, 9], "br": [1, 11], "zstd": [1, 19]}
+
+WORDS = (
+    "schedule library opening hours closed public holiday event council meeting "
+    "recycling collection park swimming pool museum exhibition free entry ticket "
+    "https://city.example.org/media/ image video news"
+).split()
+
+
+def content_snapshot(items: int, rng: random.Random) -> bytes:
+    now = datetime.now(timezone.utc)
+    return dumps(
+        {
+            "contentList": [
+                {
+                    "title": f"Item {i}",
+                    "contentBody": " ".join(rng.choice(WORDS) for _ in range(80)),
+                    "contentType": rng.choice(["Image", "Video", "NewsTicker"]),
+                    "scheduledTime": now - timedelta(minutes=i),
+                    "endTime": None,
+                    "isActive": True,
+                }
+                for i in range(items)
+            ],
+            "removedTitles": [],
+            "isDelta": False,
+            "cursor": now,
+        }
+    )
+
+
+def audit_page(rows: int, rng: random.Random) -> bytes:
+    now = datetime.now(timezone.utc)
+    return dumps(
+        {
+            "logs": [
+                {
+                    "timestamp": now - timedelta(seconds=i * 7),
+                    "user_id": f"{rng.getrandbits(128):032x}",
+                    "device_id": f"{rng.getrandbits(128):032x}",
+                    "action": rng.choice(["Reboot", "Update", "ConfigurationChange"]),
+                    "description": "Scheduled maintenance window",
+                }
+                for i in range(rows)
+            ],
+            "nextCursor": "MjAyNi0xMC0xN1QwMDowMDowMHw0Mg==",
+        }
+    )
+
+
+def best_of(repeat: int, fn: Callable[[], bytes]) -> tuple:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - started)
+    return best, size
+
+
+def report(label: str, body: bytes, repeat: int) -> None:
+    print(f"\n{label}: {len(body) / 1024:.1f} KiB uncompressed")
+    print(
+        f"{'encoding':<10}{'level':>6}{'ms':>9}{'MB/s':>9}{'KiB':>9}"
+        f"{'ratio':>8}{'KiB saved/ms':>14}"
+    )
+    for encoding in SUPPORTED_ENCODINGS:
+        levels = sorted(
+            {DYNAMIC_LEVELS[encoding], STATIC_LEVELS[encoding], *EXTRA_LEVELS[encoding]}
+        )
+        for level in levels:
+            seconds, size = best_of(repeat, lambda: compress(body, encoding, level))
+            saved = (len(body) - size) / 1024
+            tag = (
+                " dynamic"
+                if level == DYNAMIC_LEVELS[encoding]
+                else " static" if level == STATIC_LEVELS[encoding] else ""
+            )
+            print(
+                f"{encoding:<10}{level:>6}{seconds * 1000:>9.2f}"
+                f"{len(body) / seconds / 1e6:>9.1f}{size / 1024:>9.1f}"
+                f"{len(body) / size:>8.2f}{saved / (seconds * 1000):>14.1f}{tag}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    print(f"encodings: {', '.join(SUPPORTED_ENCODINGS)}")
+
+    report(
+        f"content snapshot ({args.items} items)",
+        content_snapshot(args.items, rng),
+        args.repeat,
+    )
+    report(
+        f"audit-log page ({args.rows} rows)", audit_page(args.rows, rng), args.repeat
+    )
+
+    print(f"\nsmall bodies (threshold COMPRESSION_MIN_BYTES={COMPRESSION_MIN_BYTES})")
+    print(f"{'bytes':>8}{'encoding':>10}{'us':>9}{'saved':>8}")
+    for items in (1, 2, 4, 8):
+        body = content_snapshot(items, rng)[: 256 * items]
+        for encoding in SUPPORTED_ENCODINGS:
+            seconds, size = best_of(
+                args.repeat * 20, lambda: compress(body, encoding)
+            )
+            print(
+                f"{len(body):>8}{encoding:>10}{seconds * 1e6:>9.1f}"
+                f"{len(body) - size:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
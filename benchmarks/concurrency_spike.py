@@ -0,0 +1,126 @@
+"""
+Simulates a 10x load spike against a backend of fixed capacity.
+
+Requests arrive open-loop (at a fixed rate, whether or not earlier ones have
+finished) for a cheap route and an expensive one, the way kiosk polling mixes
+with analytics queries. The backend serves at most `capacity` requests at a
+time; the rest queue for a slot, like queries waiting for a Prisma
+connection. After a warm-up at the normal rate, arrivals jump to 10x for the
+spike and then return to normal.
+
+Each phase is run with and without the adaptive limiter, and the report shows
+per-route latency relative to its no-load service time, the number of shed
+requests, and the limit at the end of each phase.
+
+Usage:
+    python -m benchmarks.concurrency_spike --rate 400 --spike 10 --seconds 3
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from project.concurrency_limit import CRITICAL, LOW, AdaptiveLimiter
+
+SEED = 1234
+
+TICK_SECONDS = 0.001
+
+# (route, priority, service seconds, share of arrivals)
+ROUTES = [
+    ("GET /content/{kioskId}", CRITICAL, 0.002, 0.9),
+    ("GET /analytics/content", LOW, 0.020, 0.1),
+]
+
+
+class Backend:
+    """
+    A server with `capacity` slots; requests beyond it wait for a free slot.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._slots = asyncio.Semaphore(capacity)
+
+    async def serve(self, seconds: float) -> None:
+        async with self._slots:
+            await asyncio.sleep(seconds)
+
+
+async def run_phase(
+    name: str,
+    rate: float,
+    seconds: float,
+    backend: Backend,
+    limiter: Optional[AdaptiveLimiter],
+    rng: random.Random,
+) -> None:
+    latencies: Dict[str, List[float]] = {route: [] for route, *_ in ROUTES}
+    shed = 0
+    tasks: List[asyncio.Task] = []
+
+    async def request(route: str, priority: str, service: float) -> None:
+        nonlocal shed
+        if limiter is not None and not limiter.try_acquire(priority):
+            shed += 1
+            return
+        started = time.perf_counter()
+        try:
+            await backend.serve(service)
+        finally:
+            elapsed = time.perf_counter() - started
+            latencies[route].append(elapsed / service)
+            if limiter is not None:
+                limiter.release(elapsed, route)
+
+    weights = [share for *_, share in ROUTES]
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        # Timers are too coarse for one sleep per arrival at spike rates, so
+        # every tick sends the requests that arrived since the previous one.
+        due = int((time.perf_counter() - started) * rate) - len(tasks)
+        for _ in range(due):
+            route, priority, service, _ = rng.choices(ROUTES, weights)[0]
+            tasks.append(asyncio.create_task(request(route, priority, service)))
+        await asyncio.sleep(TICK_SECONDS)
+    await asyncio.gather(*tasks)
+
+    summary = []
+    for route, values in latencies.items():
+        if values:
+            values.sort()
+            summary.append(
+                f"{route}: p50 {statistics.median(values):.1f}x"
+                f" p99 {values[int(len(values) * 0.99) - 1]:.1f}x"
+            )
+    limit = f" limit {limiter.limit:.0f}" if limiter is not None else ""
+    print(f"  {name:<7} sent {len(tasks):>6} shed {shed:>6}{limit}  " + "  ".join(summary))
+
+
+async def simulate(
+    rate: float, spike: float, seconds: float, capacity: int, limited: bool
+) -> None:
+    rng = random.Random(SEED)
+    backend = Backend(capacity)
+    limiter = AdaptiveLimiter(initial_limit=capacity, window=200) if limited else None
+    print("adaptive limiter" if limited else "no limiter")
+    await run_phase("normal", rate, seconds, backend, limiter, rng)
+    await run_phase("spike", rate * spike, seconds, backend, limiter, rng)
+    await run_phase("after", rate, seconds, backend, limiter, rng)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rate", type=float, default=400, help="Normal arrivals per second.")
+    parser.add_argument("--spike", type=float, default=10, help="Arrival multiplier during the spike.")
+    parser.add_argument("--seconds", type=float, default=3, help="Duration of each phase.")
+    parser.add_argument("--capacity", type=int, default=8, help="Requests the backend serves at once.")
+    args = parser.parse_args()
+    for limited in (False, True):
+        asyncio.run(simulate(args.rate, args.spike, args.seconds, args.capacity, limited))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+In-process fake of the Prisma models used by the services.
+
+It implements the subset of the Prisma Client Python query API the services
+rely on (filters, ordering, pagination, batched writes) over plain Python
+lists, so the API can be benchmarked without a database. Rows are returned
+as attribute objects and timestamps are normalised to aware UTC, like the
+real client does.
+"""
+
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import prisma
+import prisma.models
+
+MODELS = [
+    "User",
+    "UserProfile",
+    "Content",
+    "Device",
+    "UserFeedback",
+    "ContentInteraction",
+    "DeviceInteraction",
+    "AuthToken",
+    "InteractionRollup",
+    "RolePermission",
+    "RolePolicy",
+]
+
+DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "Content": {"isActive": True, "endTime": None},
+    "UserProfile": {"theme": "default", "layout": "default"},
+    "AuthToken": {"revokedAt": None},
+    "DeviceInteraction": {"description": None, "userId": None},
+    "ContentInteraction": {"userId": None},
+    "User": {"lastLogin": None, "permissions": []},
+    "InteractionRollup": {"count": 0},
+}
+
+
+def _normalise(value: Any) -> Any:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+    return value
+
+
+def _compare(actual: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return actual == _normalise(condition)
+    for operator, expected in condition.items():
+        expected = _normalise(expected)
+        if operator == "equals" and actual != expected:
+            return False
+        if operator == "not":
+            if isinstance(expected, dict):
+                if _compare(actual, expected):
+                    return False
+            elif actual == expected:
+                return False
+        if operator == "in" and actual not in expected:
+            return False
+        if operator == "not_in" and actual in expected:
+            return False
+        if operator in ("lt", "lte", "gt", "gte"):
+            if actual is None:
+                return False
+            if operator == "lt" and not actual < expected:
+                return False
+            if operator == "lte" and not actual <= expected:
+                return False
+            if operator == "gt" and not actual > expected:
+                return False
+            if operator == "gte" and not actual >= expected:
+                return False
+        if operator == "contains" and expected not in (actual or ""):
+            return False
+    return True
+
+
+def matches(row: SimpleNamespace, where: Optional[dict]) -> bool:
+    for key, condition in (where or {}).items():
+        if key == "OR":
+            if not any(matches(row, clause) for clause in condition):
+                return False
+        elif key == "AND":
+            clauses = condition if isinstance(condition, list) else [condition]
+            if not all(matches(row, clause) for clause in clauses):
+                return False
+        elif key == "NOT":
+            if matches(row, condition):
+                return False
+        elif not hasattr(row, key) and isinstance(condition, dict):
+            # Compound unique keys such as {"kioskId_title": {...}}.
+            if not matches(row, condition):
+                return False
+        elif not _compare(getattr(row, key, None), condition):
+            return False
+    return True
+
+
+class FakeActions:
+    """
+    Query actions of one fake model, mirroring `prisma.models.X.prisma()`.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.rows: List[SimpleNamespace] = []
+        self.queries = 0
+
+    def _build(self, data: dict) -> SimpleNamespace:
+        now = datetime.now(timezone.utc)
+        values = {"id": str(uuid.uuid4()), "createdAt": now, "updatedAt": now}
+        values.update(DEFAULTS.get(self.name, {}))
+        values.update({key: _normalise(value) for key, value in data.items()})
+        return SimpleNamespace(**values)
+
+    def _apply(self, row: SimpleNamespace, data: dict) -> None:
+        for key, value in data.items():
+            if isinstance(value, dict) and "increment" in value:
+                value = getattr(row, key) + value["increment"]
+            setattr(row, key, _normalise(value))
+        row.updatedAt = datetime.now(timezone.utc)
+
+    def _select(
+        self,
+        where: Optional[dict] = None,
+        order: Any = None,
+        take: Optional[int] = None,
+        skip: Optional[int] = None,
+    ) -> List[SimpleNamespace]:
+        rows = [row for row in self.rows if matches(row, where)]
+        orders = order if isinstance(order, list) else ([order] if order else [])
+        for clause in reversed(orders):
+            for field, direction in clause.items():
+                rows.sort(
+                    key=lambda row: getattr(row, field), reverse=direction == "desc"
+                )
+        if skip:
+            rows = rows[skip:]
+        if take is not None:
+            rows = rows[:take]
+        return rows
+
+    async def find_many(self, where=None, order=None, take=None, skip=None, **kwargs):
+        self.queries += 1
+        return self._select(where, order, take, skip)
+
+    async def find_first(self, where=None, order=None, skip=None, **kwargs):
+        self.queries += 1
+        rows = self._select(where, order, 1, skip)
+        return rows[0] if rows else None
+
+    async def find_unique(self, where, **kwargs):
+        self.queries += 1
+        rows = self._select(where, take=1)
+        return rows[0] if rows else None
+
+    async def count(self, where=None, **kwargs):
+        self.queries += 1
+        return len(self._select(where))
+
+    async def create(self, data, **kwargs):
+        self.queries += 1
+        row = self._build(data)
+        self.rows.append(row)
+        return row
+
+    async def create_many(self, data, skip_duplicates=False, **kwargs):
+        self.queries += 1
+        self.rows.extend(self._build(item) for item in data)
+        return len(data)
+
+    async def update(self, where, data, **kwargs):
+        self.queries += 1
+        rows = self._select(where, take=1)
+        if not rows:
+            return None
+        self._apply(rows[0], data)
+        return rows[0]
+
+    async def update_many(self, where, data, **kwargs):
+        self.queries += 1
+        rows = self._select(where)
+        for row in rows:
+            self._apply(row, data)
+        return len(rows)
+
+    async def upsert(self, where, data, **kwargs):
+        self.queries += 1
+        rows = self._select(where, take=1)
+        if rows:
+            self._apply(rows[0], data["update"])
+            return rows[0]
+        row = self._build(data["create"])
+        self.rows.append(row)
+        return row
+
+    async def delete(self, where, **kwargs):
+        self.queries += 1
+        rows = self._select(where, take=1)
+        if not rows:
+            return None
+        self.rows.remove(rows[0])
+        return rows[0]
+
+    async def delete_many(self, where=None, **kwargs):
+        self.queries += 1
+        doomed = {id(row) for row in self._select(where)}
+        self.rows = [row for row in self.rows if id(row) not in doomed]
+        return len(doomed)
+
+
+class FakeBatch:
+    """
+    Collects writes issued inside `async with client.batch_()` and runs them on exit.
+    """
+
+    def __init__(self, client: "FakeClient") -> None:
+        self._operations: List[Callable[[], Any]] = []
+        for name, actions in client.actions.items():
+            setattr(self, name.lower(), self._recorder(actions))
+
+    def _recorder(self, actions: FakeActions) -> SimpleNamespace:
+        def record(method: str) -> Callable[..., None]:
+            return lambda *args, **kwargs: self._operations.append(
+                lambda: getattr(actions, method)(*args, **kwargs)
+            )
+
+        return SimpleNamespace(
+            **{
+                method: record(method)
+                for method in (
+                    "create",
+                    "create_many",
+                    "update",
+                    "update_many",
+                    "upsert",
+                    "delete",
+                    "delete_many",
+                )
+            }
+        )
+
+    async def commit(self) -> None:
+        for operation in self._operations:
+            await operation()
+        self._operations.clear()
+
+    async def __aenter__(self) -> "FakeBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.commit()
+
+
+class FakeTransaction:
+    """
+    Exposes the fake models under `async with client.tx() as transaction`.
+
+    Operations run immediately; there is no rollback.
+    """
+
+    def __init__(self, client: "FakeClient") -> None:
+        for name, actions in client.actions.items():
+            setattr(self, name.lower(), actions)
+
+    async def __aenter__(self) -> "FakeTransaction":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+class FakeClient:
+    """
+    Stands in for the registered `Prisma` client and its models.
+    """
+
+    def __init__(self) -> None:
+        self.actions = {name: FakeActions(name) for name in MODELS}
+        for name, actions in self.actions.items():
+            setattr(self, name.lower(), actions)
+
+    def batch_(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def tx(self, **kwargs) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    async def connect(self) -> None:
+        pass
+
+    async def disconnect(self) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    @property
+    def queries(self) -> int:
+        return sum(actions.queries for actions in self.actions.values())
+
+
+def install() -> FakeClient:
+    """
+    Routes every `prisma.models.X.prisma()` call and `prisma.get_client()` to a new fake.
+    """
+    client = FakeClient()
+    for name, actions in client.actions.items():
+        model = getattr(prisma.models, name)
+        setattr(model, "prisma", classmethod(lambda cls, actions=actions: actions))
+    setattr(prisma, "get_client", lambda: client)
+    return client
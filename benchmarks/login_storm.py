@@ -0,0 +1,89 @@
+"""
+Measures event-loop latency seen by other routes during a login storm.
+
+A probe task sleeps for a fixed interval in a loop and records how late it
+wakes up, which is the delay any other request on the worker would suffer.
+The storm is run twice: once verifying bcrypt inline on the event loop (the
+previous behaviour) and once through the password hashing pool.
+
+Usage:
+    python -m benchmarks.login_storm --logins 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from project.password_hashing import (
+    PasswordHasher,
+    PasswordHasherBusyError,
+    pwd_context,
+)
+
+PROBE_INTERVAL_SECONDS = 0.005
+
+
+async def probe(lags: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL_SECONDS)
+
+
+async def storm(
+    mode: str, hashed: str, logins: int, concurrency: int, hasher: PasswordHasher
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def login() -> None:
+        nonlocal rejected
+        async with semaphore:
+            if mode == "inline":
+                pwd_context.verify("correct horse", hashed)
+                # Yield like a real handler would between awaits.
+                await asyncio.sleep(0)
+            else:
+                try:
+                    await hasher.verify("correct horse", hashed)
+                except PasswordHasherBusyError:
+                    rejected += 1
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    print(
+        f"{mode:>9}: {logins / elapsed:7.1f} logins/s | loop lag "
+        f"p50={statistics.median(lags_ms):7.2f}ms "
+        f"p99={lags_ms[int(len(lags_ms) * 0.99) - 1]:7.2f}ms "
+        f"max={lags_ms[-1]:7.2f}ms | rejected={rejected}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-limit", type=int, default=64)
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("correct horse")
+    hasher = PasswordHasher(workers=args.workers, queue_limit=args.queue_limit)
+    try:
+        for mode in ("inline", "offloaded"):
+            await storm(mode, hashed, args.logins, args.concurrency, hasher)
+    finally:
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
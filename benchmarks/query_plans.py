@@ -0,0 +1,185 @@
+"""
+Query-plan regression check for the hot queries.
+
+Seeds the database from DATABASE_URL with the `api_load` data set, refreshes
+planner statistics, then runs EXPLAIN on the SQL behind the hottest reads:
+schedule loads and delta syncs per kiosk, the active-content window, audit-log
+pages, the archive job's batch read and the expired-token sweep. Exits with
+code 1 when any of them plans a sequential scan of its table, which means an
+index from schema.prisma is missing or no longer usable.
+
+The database is emptied before seeding, so point DATABASE_URL at a dedicated
+instance, with the schema pushed (`prisma db push`).
+
+Usage:
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --show-plans --interactions 200000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Tuple
+
+import prisma
+import prisma.models
+from benchmarks.api_load import seed
+from prisma import Prisma
+
+# The table that must not be scanned sequentially, the SQL and its parameters.
+# Raw query parameters arrive as JSON text, so timestamps are cast to the
+# columns' type, as the services do, to plan the same comparisons.
+HotQuery = Tuple[str, str, List[object]]
+
+
+def hot_queries(kioskId: str, now: datetime) -> Dict[str, HotQuery]:
+    since = now - timedelta(minutes=5)
+    return {
+        "schedule load": (
+            "Content",
+            """
+            SELECT * FROM "Content"
+            WHERE "kioskId" = $1 AND "isActive" = true
+            ORDER BY "scheduledTime" ASC
+            """,
+            [kioskId],
+        ),
+        "content delta": (
+            "Content",
+            """
+            SELECT * FROM "Content"
+            WHERE "kioskId" = $1
+              AND ("updatedAt" > $2::timestamp(3)
+                   OR ("scheduledTime" > $2::timestamp(3)
+                       AND "scheduledTime" <= $3::timestamp(3))
+                   OR ("endTime" > $2::timestamp(3) AND "endTime" <= $3::timestamp(3)))
+            ORDER BY "scheduledTime" ASC
+            """,
+            [kioskId, since, now],
+        ),
+        "active content window": (
+            "Content",
+            """
+            SELECT * FROM "Content"
+            WHERE "isActive" = true
+              AND "scheduledTime" > $1::timestamp(3)
+              AND "scheduledTime" <= $2::timestamp(3)
+            ORDER BY "scheduledTime" ASC
+            """,
+            [now, now + timedelta(hours=1)],
+        ),
+        "audit-log first page": (
+            "DeviceInteraction",
+            """
+            SELECT * FROM "DeviceInteraction"
+            ORDER BY "createdAt" DESC, "id" DESC
+            LIMIT 101
+            """,
+            [],
+        ),
+        "audit-log time range": (
+            "DeviceInteraction",
+            """
+            SELECT * FROM "DeviceInteraction"
+            WHERE "createdAt" >= $1::timestamp(3) AND "createdAt" < $2::timestamp(3)
+            ORDER BY "createdAt" DESC, "id" DESC
+            LIMIT 101
+            """,
+            [now - timedelta(days=2), now - timedelta(days=1)],
+        ),
+        "archive batch": (
+            "DeviceInteraction",
+            """
+            SELECT * FROM "DeviceInteraction"
+            WHERE "createdAt" < $1::timestamp(3)
+            ORDER BY "createdAt" ASC, "id" ASC
+            LIMIT 5000
+            """,
+            [now - timedelta(days=90)],
+        ),
+        "expired token sweep": (
+            "AuthToken",
+            """
+            SELECT "id" FROM "AuthToken"
+            WHERE "expiresAt" < $1::timestamp(3)
+            LIMIT 1000
+            """,
+            [now],
+        ),
+    }
+
+
+def plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain(sql: str, params: List[object]) -> dict:
+    rows = await prisma.get_client().query_raw(f"EXPLAIN (FORMAT JSON) {sql}", *params)
+    plan = rows[0]["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def describe(plan: dict) -> str:
+    return " > ".join(
+        f"{node['Node Type']}"
+        + (f" using {node['Index Name']}" if "Index Name" in node else "")
+        + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+        for node in plan_nodes(plan)
+    )
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--kiosks", type=int, default=300)
+    parser.add_argument("--content-per-kiosk", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--interactions", type=int, default=100000)
+    parser.add_argument(
+        "--skip-seed", action="store_true", help="Check the data already in the database"
+    )
+    parser.add_argument("--show-plans", action="store_true")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    client = Prisma(auto_register=True)
+    await client.connect()
+    try:
+        if not args.skip_seed:
+            await seed(args)
+        await client.execute_raw("ANALYZE")
+        content = await prisma.models.Content.prisma().find_first()
+        if content is None:
+            print("No content rows to plan against; seed the database first.")
+            return 1
+        now = datetime.now(timezone.utc)
+        for name, (table, sql, params) in hot_queries(content.kioskId, now).items():
+            plan = await explain(sql, params)
+            seq_scans = [
+                node
+                for node in plan_nodes(plan)
+                if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == table
+            ]
+            status = "SEQ SCAN" if seq_scans else "ok"
+            print(
+                f"{name:<24} {status:<9} cost={plan['Total Cost']:>10.2f}  "
+                f"{describe(plan)}"
+            )
+            if args.show_plans:
+                print(json.dumps(plan, indent=2))
+            if seq_scans:
+                failures.append(f"{name}: sequential scan of {table}")
+    finally:
+        await client.disconnect()
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,124 @@
+"""
+Per-row cost of encoding large audit-log and content responses.
+
+Compares the model path (one Pydantic object per row, response model
+validation, `jsonable_encoder`, then `json.dumps`) with the direct path
+(rows to plain dicts to JSON bytes) and, for content, with serving the
+schedule index's pre-encoded snapshot.
+
+Usage:
+    python -m benchmarks.serialization --rows 10000
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from project.content_schedule_index import KioskSchedule
+from project.fast_json import dumps, orjson
+from project.get_content_service import (
+    ContentDetails,
+    GetContentResponse,
+    content_details_from_row,
+    encode_content_details,
+)
+from project.get_security_audit_logs_service import (
+    GetSecurityAuditLogsResponse,
+    audit_log_from_row,
+    audit_log_record,
+)
+
+
+def measure(label: str, rows: int, repeat: int, fn: Callable[[], bytes]) -> None:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - started)
+    print(
+        f"{label:<42} {best * 1000:9.2f}ms total  "
+        f"{best / rows * 1e6:7.2f}us/row  {size / 1024:9.1f} KiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    now = datetime.now(timezone.utc)
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}, rows: {args.rows}")
+
+    interactions = [
+        SimpleNamespace(
+            id=f"{i:08d}",
+            createdAt=now - timedelta(seconds=i),
+            userId=f"user-{i % 500}",
+            deviceId=f"device-{i % 300}",
+            action="Reboot",
+            description="Scheduled maintenance window",
+        )
+        for i in range(args.rows)
+    ]
+
+    def audit_models() -> bytes:
+        logs = [audit_log_from_row(row) for row in interactions]
+        response = GetSecurityAuditLogsResponse(logs=logs)
+        validated = GetSecurityAuditLogsResponse(**response.dict())
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def audit_direct() -> bytes:
+        return dumps({"logs": [audit_log_record(row) for row in interactions]})
+
+    measure("audit logs: models + jsonable_encoder", args.rows, args.repeat, audit_models)
+    measure("audit logs: rows -> bytes", args.rows, args.repeat, audit_direct)
+
+    contents = [
+        SimpleNamespace(
+            id=f"{i:08d}",
+            kioskId="kiosk-1",
+            title=f"Item {i}",
+            contentBody="Lorem ipsum dolor sit amet. " * 20,
+            contentType="Image",
+            scheduledTime=now - timedelta(minutes=i),
+            endTime=None,
+            updatedAt=now,
+            isActive=True,
+        )
+        for i in range(args.rows)
+    ]
+
+    def content_models() -> bytes:
+        details = [content_details_from_row(row) for row in contents]
+        response = GetContentResponse(contentList=details)
+        validated = GetContentResponse(**response.dict())
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    schedule: KioskSchedule[ContentDetails] = KioskSchedule()
+    for row in contents:
+        entry = content_details_from_row(row)
+        schedule.upsert(row, entry, encode_content_details(entry))
+
+    def content_snapshot_cold() -> bytes:
+        schedule.revision += 1
+        return schedule.snapshot(now)
+
+    measure("content: models + jsonable_encoder", args.rows, args.repeat, content_models)
+    measure(
+        "content: join pre-encoded entries", args.rows, args.repeat, content_snapshot_cold
+    )
+    measure(
+        "content: cached snapshot",
+        args.rows,
+        args.repeat,
+        lambda: schedule.snapshot(now),
+    )
+
+
+if __name__ == "__main__":
+    main()
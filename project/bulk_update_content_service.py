@@ -0,0 +1,238 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import prisma
+import prisma.enums
+import prisma.errors
+import prisma.models
+from project.content_events import content_events
+from project.content_schedule_index import as_utc
+from project.get_content_service import ContentDetails, schedule_index
+from project.invalidation_bus import CONTENT_TOPIC, invalidation_bus
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+BULK_CHUNK_SIZE = 500
+
+# Times a chunk is rewritten after a concurrent writer created one of its rows.
+BULK_CONFLICT_RETRIES = 2
+
+
+class ContentImportItem(BaseModel):
+    """
+    A single content item to schedule on a kiosk as part of a bulk import.
+    """
+
+    kioskId: str
+    title: str
+    contentBody: str
+    contentType: prisma.enums.ContentType
+    scheduledTime: datetime
+    endTime: Optional[datetime] = None
+    isActive: bool = True
+
+
+class ContentImportResult(BaseModel):
+    """
+    The outcome of importing a single item, in the same position as the request item.
+    """
+
+    index: int
+    kioskId: str
+    title: str
+    contentId: Optional[str] = None
+    status: str
+    message: Optional[str] = None
+
+
+class BulkUpdateContentResponse(BaseModel):
+    """
+    Response model for a bulk content import, with one result per submitted item.
+    """
+
+    created: int
+    updated: int
+    failed: int
+    results: List[ContentImportResult]
+
+
+async def _resolve_existing(
+    items: List[ContentImportItem],
+) -> Dict[Tuple[str, str], str]:
+    """
+    Looks up the ids of the rows that already exist for a chunk in a single query.
+    """
+    rows = await prisma.models.Content.prisma().find_many(
+        where={
+            "kioskId": {"in": list({item.kioskId for item in items})},
+            "title": {"in": list({item.title for item in items})},
+        }
+    )
+    wanted = {(item.kioskId, item.title) for item in items}
+    return {
+        (row.kioskId, row.title): row.id
+        for row in rows
+        if (row.kioskId, row.title) in wanted
+    }
+
+
+async def _import_chunk(
+    chunk: List[Tuple[int, ContentImportItem]],
+) -> List[ContentImportResult]:
+    """
+    Writes one chunk of items in a single batched transaction.
+
+    If another writer creates one of the chunk's rows between the lookup and the
+    commit, the transaction fails on the (kioskId, title) unique constraint and is
+    rolled back; the existing rows are then resolved again and the chunk is
+    rewritten, so those rows are updated instead of created.
+    """
+    attempt = 0
+    while True:
+        existing = await _resolve_existing([item for _, item in chunk])
+        try:
+            return await _write_chunk(chunk, existing)
+        except prisma.errors.UniqueViolationError:
+            if attempt == BULK_CONFLICT_RETRIES:
+                raise
+            attempt += 1
+            logger.info("Bulk content import chunk raced a concurrent writer; retrying")
+
+
+async def _write_chunk(
+    chunk: List[Tuple[int, ContentImportItem]],
+    existing: Dict[Tuple[str, str], str],
+) -> List[ContentImportResult]:
+    """
+    Creates the chunk's new rows and updates its existing ones in one batch.
+    """
+    results = []
+    async with prisma.get_client().batch_() as batcher:
+        for index, item in chunk:
+            data = {
+                "contentBody": item.contentBody,
+                "contentType": item.contentType,
+                "scheduledTime": item.scheduledTime,
+                "endTime": item.endTime,
+                "isActive": item.isActive,
+            }
+            content_id = existing.get((item.kioskId, item.title))
+            if content_id:
+                batcher.content.update(where={"id": content_id}, data=data)
+                status, message = "updated", "Content updated successfully."
+            else:
+                content_id = str(uuid.uuid4())
+                batcher.content.create(
+                    data={
+                        **data,
+                        "id": content_id,
+                        "title": item.title,
+                        "kioskId": item.kioskId,
+                    }
+                )
+                status, message = "created", "New content added successfully."
+            results.append(
+                ContentImportResult(
+                    index=index,
+                    kioskId=item.kioskId,
+                    title=item.title,
+                    contentId=content_id,
+                    status=status,
+                    message=message,
+                )
+            )
+    return results
+
+
+async def bulk_update_content(
+    items: List[ContentImportItem],
+) -> BulkUpdateContentResponse:
+    """
+    Creates or updates many scheduled content items across kiosks.
+
+    Items are processed in chunks of `BULK_CHUNK_SIZE`. Each chunk resolves its
+    existing rows with one query and writes all of its creates and updates in one
+    batched transaction, so the number of round trips grows with the number of
+    chunks rather than the number of items. Items whose `endTime` is not after
+    their `scheduledTime` are rejected individually. A failing chunk is rolled back and
+    its items are reported as errors without affecting the other chunks. When the
+    same kiosk and title appear more than once, the last occurrence wins.
+
+    Args:
+        items (List[ContentImportItem]): The content to schedule.
+
+    Returns:
+        BulkUpdateContentResponse: Per-item results, in request order, with totals.
+    """
+    results: List[Optional[ContentImportResult]] = [None] * len(items)
+    latest: Dict[Tuple[str, str], int] = {}
+    for index, item in enumerate(items):
+        if item.endTime is not None and as_utc(item.endTime) <= as_utc(
+            item.scheduledTime
+        ):
+            results[index] = ContentImportResult(
+                index=index,
+                kioskId=item.kioskId,
+                title=item.title,
+                status="error",
+                message="endTime must be after scheduledTime",
+            )
+        else:
+            latest[(item.kioskId, item.title)] = index
+    pending = []
+    for index, item in enumerate(items):
+        if results[index] is not None:
+            continue
+        if latest[(item.kioskId, item.title)] != index:
+            results[index] = ContentImportResult(
+                index=index,
+                kioskId=item.kioskId,
+                title=item.title,
+                status="skipped",
+                message="Superseded by a later item with the same kiosk and title.",
+            )
+        else:
+            pending.append((index, item))
+    for start in range(0, len(pending), BULK_CHUNK_SIZE):
+        chunk = pending[start : start + BULK_CHUNK_SIZE]
+        try:
+            chunk_results = await _import_chunk(chunk)
+        except Exception as e:
+            logger.exception("Bulk content import chunk failed")
+            for index, item in chunk:
+                results[index] = ContentImportResult(
+                    index=index,
+                    kioskId=item.kioskId,
+                    title=item.title,
+                    status="error",
+                    message=f"Failed to import content: {e}",
+                )
+            continue
+        for result in chunk_results:
+            results[result.index] = result
+        for kioskId in {item.kioskId for _, item in chunk}:
+            invalidation_bus.publish(CONTENT_TOPIC, kioskId)
+        for index, item in chunk:
+            schedule_index.invalidate(item.kioskId)
+            content_events.publish(
+                item.kioskId,
+                "content",
+                ContentDetails(
+                    title=item.title,
+                    contentBody=item.contentBody,
+                    contentType=item.contentType,
+                    scheduledTime=item.scheduledTime,
+                    endTime=item.endTime,
+                    isActive=item.isActive,
+                ).json(),
+            )
+    final_results = [result for result in results if result is not None]
+    return BulkUpdateContentResponse(
+        created=sum(result.status == "created" for result in final_results),
+        updated=sum(result.status == "updated" for result in final_results),
+        failed=sum(result.status == "error" for result in final_results),
+        results=final_results,
+    )
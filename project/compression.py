@@ -0,0 +1,281 @@
+import gzip
+import os
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", "33554432"))
+
+GZIP = "gzip"
+
+BROTLI = "br"
+
+ZSTD = "zstd"
+
+# Levels for bodies compressed on every request: cheap, most of the gain.
+DYNAMIC_LEVELS: Dict[str, int] = {GZIP: 5, BROTLI: 4, ZSTD: 3}
+
+# Levels for bodies compressed once and cached: slower, smallest output.
+STATIC_LEVELS: Dict[str, int] = {GZIP: 9, BROTLI: 9, ZSTD: 12}
+
+COMPRESSIBLE_TYPES = (
+    b"application/json",
+    b"application/x-ndjson",
+    b"text/csv",
+    b"text/plain",
+    b"text/html",
+)
+
+
+def available_encodings() -> List[str]:
+    """
+    Returns the encodings this process can produce, most preferred first.
+    """
+    encodings = []
+    if brotli is not None:
+        encodings.append(BROTLI)
+    if zstandard is not None:
+        encodings.append(ZSTD)
+    encodings.append(GZIP)
+    return encodings
+
+
+SUPPORTED_ENCODINGS = available_encodings()
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks the response encoding for an Accept-Encoding header.
+
+    Among the encodings the client accepts with a non-zero q-value, the one
+    with the highest q-value wins; ties go to the server's preference
+    (brotli, then zstd, then gzip).
+
+    Args:
+        accept_encoding (Optional[str]): The request's Accept-Encoding header.
+
+    Returns:
+        Optional[str]: The content coding to use, or None to send the body as is.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best: Optional[str] = None
+    best_weight = 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """
+    Compresses a body with one of `SUPPORTED_ENCODINGS`.
+
+    Args:
+        body (bytes): The uncompressed body.
+        encoding (str): The content coding.
+        level (Optional[int]): Compression level, defaults to the encoding's dynamic level.
+
+    Returns:
+        bytes: The encoded body.
+    """
+    if level is None:
+        level = DYNAMIC_LEVELS[encoding]
+    if encoding == GZIP:
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == BROTLI and brotli is not None:
+        return brotli.compress(body, quality=level)
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+class CompressedCache:
+    """
+    Keeps compressed variants of cacheable bodies, bounded by total size.
+
+    Bodies are looked up by a key that changes whenever the body does, such as
+    an ETag, so each variant is compressed once per change, at the slower
+    `STATIC_LEVELS`, rather than once per request. Least recently used
+    variants are evicted first.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._variants: "OrderedDict[Tuple[Hashable, str], bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._variants)
+
+    def get(self, key: Hashable, body: bytes, encoding: str) -> bytes:
+        """
+        Returns `body` compressed with `encoding`, compressing it on the first request.
+        """
+        variant_key = (key, encoding)
+        variant = self._variants.get(variant_key)
+        if variant is not None:
+            self.hits += 1
+            self._variants.move_to_end(variant_key)
+            return variant
+        self.misses += 1
+        variant = compress(body, encoding, STATIC_LEVELS[encoding])
+        self._variants[variant_key] = variant
+        self.size += len(variant)
+        while self.size > self.max_bytes and self._variants:
+            _, evicted = self._variants.popitem(last=False)
+            self.size -= len(evicted)
+        return variant
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._variants),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+compressed_cache = CompressedCache()
+
+
+def precompressed(
+    key: Hashable, body: bytes, accept_encoding: Optional[str]
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Negotiates the encoding of a cacheable body and returns the cached variant.
+
+    Args:
+        key (Hashable): Identifies this version of the body, e.g. its ETag.
+        body (bytes): The uncompressed body.
+        accept_encoding (Optional[str]): The request's Accept-Encoding header.
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: The body to send and the headers describing its encoding.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate(accept_encoding)
+    if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+        return body, headers
+    headers["Content-Encoding"] = encoding
+    return compressed_cache.get(key, body, encoding), headers
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _vary_accept_encoding(
+    headers: List[Tuple[bytes, bytes]],
+) -> List[Tuple[bytes, bytes]]:
+    """
+    Adds Accept-Encoding to the response's Vary header, merging it into one already set.
+    """
+    merged = []
+    found = False
+    for key, value in headers:
+        if key.lower() == b"vary":
+            found = True
+            fields = [field.strip().lower() for field in value.split(b",")]
+            if b"accept-encoding" not in fields and b"*" not in fields:
+                value = value + b", Accept-Encoding"
+        merged.append((key, value))
+    if not found:
+        merged.append((b"vary", b"Accept-Encoding"))
+    return merged
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the encoding negotiated from Accept-Encoding.
+
+    Only complete bodies of compressible types of at least `minimum_size`
+    bytes are compressed. Responses that already carry a Content-Encoding
+    (precompressed variants, bundle blobs) and streamed responses (exports,
+    server-sent events) are passed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = _header(scope["headers"], b"accept-encoding")
+        encoding = negotiate(accept.decode("latin-1") if accept else None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+
+        async def send_wrapper(message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = _header(headers, b"content-type") or b""
+                if _header(headers, b"content-encoding") is None and any(
+                    content_type.startswith(kind) for kind in COMPRESSIBLE_TYPES
+                ):
+                    start = message
+                    return
+                await send(message)
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            body = message.get("body", b"")
+            headers = _vary_accept_encoding(pending.get("headers", []))
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send({**pending, "headers": headers})
+                await send(message)
+                return
+            body = compress(body, encoding)
+            etag = _header(headers, b"etag")
+            headers = [
+                (key, value)
+                for key, value in headers
+                if key.lower() not in (b"content-length", b"etag")
+            ]
+            if etag is not None:
+                # The compressed body is a different variant and needs its own ETag.
+                headers.append((b"etag", etag[:-1] + b"-" + encoding.encode() + b'"'))
+            headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**pending, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
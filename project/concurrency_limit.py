@@ -0,0 +1,214 @@
+import math
+import os
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from project.fast_json import dumps
+
+CONCURRENCY_INITIAL_LIMIT = int(os.getenv("CONCURRENCY_INITIAL_LIMIT", "64"))
+
+CONCURRENCY_MIN_LIMIT = int(os.getenv("CONCURRENCY_MIN_LIMIT", "8"))
+
+CONCURRENCY_MAX_LIMIT = int(os.getenv("CONCURRENCY_MAX_LIMIT", "1024"))
+
+CRITICAL = "critical"
+
+NORMAL = "normal"
+
+LOW = "low"
+
+# Fraction of the current limit each priority may occupy; lower priorities are
+# shed first as the limit shrinks or fills up.
+PRIORITY_SHARES: Dict[str, float] = {CRITICAL: 1.0, NORMAL: 0.8, LOW: 0.4}
+
+# (method, path prefix, path suffix, priority); the first match wins.
+ROUTE_PRIORITIES: List[Tuple[str, str, str, str]] = [
+    ("GET", "/content/", "", CRITICAL),
+    ("GET", "/ui-settings/", "", CRITICAL),
+    ("GET", "/kiosks/", "", CRITICAL),
+    ("GET", "/bundles/", "", CRITICAL),
+    ("POST", "/devices/", "/heartbeat", CRITICAL),
+    ("POST", "/auth/", "", NORMAL),
+    ("GET", "/security/audit-logs", "", LOW),
+    ("GET", "/analytics/", "", LOW),
+    ("POST", "/content/bulk-import", "", LOW),
+]
+
+# Long-lived or operational routes that must never be shed.
+EXEMPT_PATHS = ("/metrics", "/ready", "/internal/")
+
+EXEMPT_SUFFIXES = ("/events",)
+
+
+class RouteBaseline:
+    """
+    The no-load latency of one route, re-measured every `window` samples.
+    """
+
+    __slots__ = ("latency", "next_latency", "samples")
+
+    def __init__(self) -> None:
+        self.latency = math.inf
+        self.next_latency = math.inf
+        self.samples = 0
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to observed latency (gradient algorithm).
+
+    Routes differ in cost by orders of magnitude, so every route keeps its own
+    no-load baseline, the minimum latency it showed over a window of samples,
+    and each latency is normalised by the baseline of its route. A moving
+    average of those ratios measures how much slower than usual requests are,
+    whatever mix of routes is being served. After each request the limit is
+    multiplied by `tolerance / ratio`, clamped to [0.5, 1], and, while the limit
+    is actually in use, grown by a headroom of sqrt(limit). While requests run
+    at their usual speed the limit grows; as soon as they start queueing in
+    Prisma the limit shrinks and the excess is rejected up front instead of
+    waiting in line. Baselines are re-measured from lightly loaded samples
+    every `window` samples of their route, so they can follow real changes in
+    query cost, rising by at most 5% per window.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = CONCURRENCY_INITIAL_LIMIT,
+        min_limit: int = CONCURRENCY_MIN_LIMIT,
+        max_limit: int = CONCURRENCY_MAX_LIMIT,
+        tolerance: float = 2.0,
+        smoothing: float = 0.05,
+        window: int = 1000,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.window = window
+        self.in_flight = 0
+        self.shed: Dict[str, int] = {CRITICAL: 0, NORMAL: 0, LOW: 0}
+        self.baselines: Dict[Hashable, RouteBaseline] = {}
+        self._recent: Optional[float] = None
+
+    def try_acquire(self, priority: str) -> bool:
+        if self.in_flight >= self.limit * PRIORITY_SHARES[priority]:
+            self.shed[priority] += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self, latency: Optional[float], route: Hashable = None) -> None:
+        """
+        Frees a slot and adapts the limit to the latency of the finished request.
+
+        A latency of None frees the slot without sampling, for responses whose
+        duration does not reflect server load.
+        """
+        in_use = self.in_flight
+        self.in_flight -= 1
+        if latency is None:
+            return
+        baseline = self.baselines.get(route)
+        if baseline is None:
+            baseline = self.baselines[route] = RouteBaseline()
+        baseline.samples += 1
+        if in_use * 2 < self.limit:
+            # Only lightly loaded samples may re-establish the baseline, so
+            # sustained overload cannot pass itself off as the new normal.
+            baseline.next_latency = min(baseline.next_latency, latency)
+        if baseline.samples % self.window == 0 and baseline.next_latency < math.inf:
+            baseline.latency = min(baseline.next_latency, baseline.latency * 1.05)
+            baseline.next_latency = math.inf
+        baseline.latency = min(baseline.latency, latency)
+        ratio = latency / max(baseline.latency, 1e-9)
+        if self._recent is None:
+            self._recent = ratio
+        self._recent += (ratio - self._recent) * 0.1
+        gradient = max(0.5, min(1.0, self.tolerance / max(self._recent, 1e-9)))
+        target = self.limit * gradient
+        if in_use * 2 >= self.limit:
+            target += math.sqrt(self.limit)
+        self.limit = min(
+            self.max_limit,
+            max(
+                self.min_limit,
+                self.limit * (1 - self.smoothing) + target * self.smoothing,
+            ),
+        )
+
+
+def route_priority(method: str, path: str) -> Optional[str]:
+    """
+    Returns the priority of a request, or None if it must never be shed.
+    """
+    if path.startswith(EXEMPT_PATHS) or path.endswith(EXEMPT_SUFFIXES):
+        return None
+    for rule_method, prefix, suffix, priority in ROUTE_PRIORITIES:
+        if method == rule_method and path.startswith(prefix) and path.endswith(suffix):
+            return priority
+    return NORMAL
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    ASGI middleware admitting requests through an `AdaptiveLimiter`.
+
+    Rejected requests get an immediate 503 with Retry-After, so overload costs
+    the client one fast round trip instead of an unbounded wait.
+
+    The latency fed to the limiter runs until the response starts, so large
+    downloads such as offline bundles are measured by the work needed to
+    produce them, not by the client's bandwidth. Streamed responses, which
+    carry no Content-Length (audit-log exports), hold their slot but are not
+    sampled. Samples are grouped by the matched route.
+    """
+
+    def __init__(self, app, limiter: AdaptiveLimiter, retry_after: int = 1) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.retry_after = retry_after
+        self._body = dumps({"error": "Server is overloaded, please retry shortly."})
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = route_priority(scope["method"], scope["path"])
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        if not self.limiter.try_acquire(priority):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 503,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"retry-after", str(self.retry_after).encode()),
+                        (b"content-length", str(len(self._body)).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": self._body})
+            return
+        started = time.perf_counter()
+        latency: Optional[float] = None
+
+        async def send_wrapper(message) -> None:
+            nonlocal latency
+            if message["type"] == "http.response.start" and any(
+                name.lower() == b"content-length" for name, _ in message.get("headers", ())
+            ):
+                latency = time.perf_counter() - started
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.limiter.release(
+                latency, (scope["method"], scope.get("endpoint", "unmatched"))
+            )
+
+
+concurrency_limiter = AdaptiveLimiter()
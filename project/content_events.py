@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_BUFFER_SIZE = 32
+
+KEEPALIVE_INTERVAL_SECONDS = 15.0
+
+
+class Subscription:
+    """
+    A single kiosk connection waiting for content events.
+
+    Each subscription owns a bounded queue of pre-encoded server-sent events.
+    A subscriber that lets its queue fill up is considered too slow and is
+    dropped instead of holding memory for it.
+    """
+
+    def __init__(self, kioskId: str, buffer_size: int) -> None:
+        self.kioskId = kioskId
+        self.queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(buffer_size)
+        self.dropped = False
+
+    def offer(self, message: bytes) -> bool:
+        """
+        Queues a message without waiting. Returns False if the subscriber is too slow.
+        """
+        if self.dropped:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            # Make room for the sentinel so the reader wakes up and closes the stream.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+        return True
+
+
+class ContentEventBroker:
+    """
+    Fans content changes out to every connection subscribed to a kiosk.
+
+    Publishing is synchronous and never blocks the writer: a message is encoded
+    once and offered to each subscriber's bounded buffer. Only connections to
+    this worker are reached; the other workers learn of content changes from
+    the invalidation bus and send their kiosks the reloaded playlist.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = SUBSCRIBER_BUFFER_SIZE,
+        keepalive_interval: float = KEEPALIVE_INTERVAL_SECONDS,
+    ) -> None:
+        self.buffer_size = buffer_size
+        self.keepalive_interval = keepalive_interval
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.dropped_total = 0
+
+    def subscribe(self, kioskId: str) -> Subscription:
+        subscription = Subscription(kioskId, self.buffer_size)
+        self._subscribers.setdefault(kioskId, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.kioskId)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.kioskId]
+
+    def subscriber_count(self, kioskId: Optional[str] = None) -> int:
+        if kioskId is not None:
+            return len(self._subscribers.get(kioskId, ()))
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, kioskId: str, event: str, data: str) -> int:
+        """
+        Sends an event to every subscriber of a kiosk.
+
+        Args:
+            kioskId (str): The kiosk whose subscribers should receive the event.
+            event (str): The server-sent event name.
+            data (str): The event payload, usually a JSON document on a single line.
+
+        Returns:
+            int: The number of subscribers the event was delivered to.
+        """
+        subscribers = self._subscribers.get(kioskId)
+        if not subscribers:
+            return 0
+        message = f"event: {event}\ndata: {data}\n\n".encode()
+        delivered = 0
+        for subscription in list(subscribers):
+            if subscription.offer(message):
+                delivered += 1
+            else:
+                logger.warning("Dropping slow content subscriber for kiosk %s", kioskId)
+                self.dropped_total += 1
+                self.unsubscribe(subscription)
+        return delivered
+
+    async def stream(self, kioskId: str) -> AsyncIterator[bytes]:
+        """
+        Yields server-sent events for a kiosk until the subscriber is dropped.
+
+        A comment line is sent after `keepalive_interval` seconds of silence so
+        proxies keep idle connections open.
+        """
+        subscription = self.subscribe(kioskId)
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.queue.get(), self.keepalive_interval
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+
+content_events = ContentEventBroker()
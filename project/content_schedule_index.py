@@ -0,0 +1,394 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import time
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+import prisma
+import prisma.models
+from project.fast_json import join_array
+
+Entry = TypeVar("Entry")
+
+SCHEDULE_INDEX_MAX_KIOSKS = int(os.getenv("SCHEDULE_INDEX_MAX_KIOSKS", "10000"))
+
+SCHEDULE_TTL_SECONDS = float(os.getenv("SCHEDULE_TTL_SECONDS", "60"))
+
+# Reloads attempted when writes keep landing while a schedule is being read.
+LOAD_ATTEMPTS = 3
+
+_revisions = itertools.count(1)
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Normalises a datetime to an aware UTC datetime so naive values written by
+    clients and aware values returned by Prisma compare consistently.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class KioskSchedule(Generic[Entry]):
+    """
+    Active content for one kiosk, kept sorted by scheduled time.
+
+    The lists are parallel: ``times[i]`` is the activation time of the
+    content ``ids[i]``, ``ends[i]`` its optional end time, last written at
+    ``versions[i]``, whose prebuilt response entry is ``entries[i]`` and whose
+    JSON encoding is ``encoded[i]``. ``endings`` holds the end times alone,
+    sorted, so the number of items started and the number of items ended at a
+    given moment identify the visible set. ``revision`` is renewed on every
+    change and, together with those two counts, is used to memoise the ETag
+    and encoded array of the visible entries. It is drawn from a process-wide
+    counter, so a schedule reloaded after an invalidation never reuses the
+    revision of the one it replaced.
+    """
+
+    def __init__(self) -> None:
+        self.times: List[datetime] = []
+        self.ends: List[Optional[datetime]] = []
+        self.endings: List[datetime] = []
+        self.ids: List[str] = []
+        self.versions: List[datetime] = []
+        self.entries: List[Entry] = []
+        self.encoded: List[bytes] = []
+        self.revision = next(_revisions)
+        self.loaded = time.monotonic()
+        self._etag: Tuple[int, Tuple[int, int], str] = (-1, (-1, -1), "")
+        self._snapshot: Tuple[int, Tuple[int, int], bytes] = (-1, (-1, -1), b"")
+
+    def remove(self, content_id: str) -> None:
+        try:
+            position = self.ids.index(content_id)
+        except ValueError:
+            return
+        end = self.ends[position]
+        if end is not None:
+            self.endings.remove(end)
+        del self.times[position]
+        del self.ends[position]
+        del self.ids[position]
+        del self.versions[position]
+        del self.entries[position]
+        del self.encoded[position]
+        self.revision = next(_revisions)
+
+    def upsert(
+        self, content: prisma.models.Content, entry: Entry, encoded: bytes
+    ) -> None:
+        content_id = content.id
+        self.remove(content_id)
+        if not content.isActive:
+            return
+        scheduled = as_utc(content.scheduledTime)
+        end = as_utc(content.endTime) if content.endTime is not None else None
+        if end is not None and end <= scheduled:
+            return
+        position = bisect_right(self.times, scheduled)
+        self.times.insert(position, scheduled)
+        self.ends.insert(position, end)
+        if end is not None:
+            insort(self.endings, end)
+        self.ids.insert(position, content_id)
+        self.versions.insert(position, as_utc(content.updatedAt))
+        self.entries.insert(position, entry)
+        self.encoded.insert(position, encoded)
+        self.revision = next(_revisions)
+
+    def _window(self, now: datetime) -> Tuple[int, int]:
+        return bisect_right(self.times, now), bisect_right(self.endings, now)
+
+    def _visible(self, window: Tuple[int, int], now: datetime) -> Sequence[int]:
+        started, ended = window
+        if not ended:
+            return range(started)
+        ends = self.ends
+        return [
+            position
+            for position in range(started)
+            if ends[position] is None or ends[position] > now
+        ]
+
+    def current(self, now: datetime) -> List[Entry]:
+        window = self._window(now)
+        if not window[1]:
+            return self.entries[: window[0]]
+        return [self.entries[position] for position in self._visible(window, now)]
+
+    def etag(self, now: datetime) -> str:
+        """
+        Returns a strong ETag for the entries visible at ``now``.
+
+        The tag is derived from the ids and ``updatedAt`` of the visible rows,
+        so every worker computes the same value for the same data.
+        """
+        window = self._window(now)
+        revision, cached_window, tag = self._etag
+        if revision == self.revision and cached_window == window:
+            return tag
+        digest = hashlib.blake2b(digest_size=16)
+        for position in self._visible(window, now):
+            digest.update(
+                f"{self.ids[position]}:{self.versions[position].isoformat()};".encode()
+            )
+        tag = f'"{digest.hexdigest()}"'
+        self._etag = (self.revision, window, tag)
+        return tag
+
+    def snapshot(self, now: datetime) -> bytes:
+        """
+        Returns the JSON array of the entries visible at ``now``.
+
+        The array is assembled from the per-entry encodings and kept until the
+        schedule changes or an entry starts or ends.
+        """
+        window = self._window(now)
+        revision, cached_window, body = self._snapshot
+        if revision == self.revision and cached_window == window:
+            return body
+        if not window[1]:
+            body = join_array(self.encoded[: window[0]])
+        else:
+            body = join_array(
+                [self.encoded[position] for position in self._visible(window, now)]
+            )
+        self._snapshot = (self.revision, window, body)
+        return body
+
+    def same_rows(self, other: "KioskSchedule[Entry]") -> bool:
+        """
+        Tells whether two schedules hold the same rows at the same versions.
+        """
+        return self.ids == other.ids and self.versions == other.versions
+
+    def upcoming(self, now: datetime, until: datetime) -> List[bytes]:
+        """
+        Returns the encoded entries displayed at any moment between ``now`` and ``until``.
+
+        This covers what is showing now as well as everything that starts
+        before ``until``, in activation order.
+        """
+        ends = self.ends
+        return [
+            self.encoded[position]
+            for position in range(bisect_right(self.times, until))
+            if ends[position] is None or ends[position] > now
+        ]
+
+    def next_transition(self, now: datetime) -> Optional[datetime]:
+        """
+        Returns the first moment after ``now`` at which an entry starts or ends.
+        """
+        started, ended = self._window(now)
+        candidates = []
+        if started < len(self.times):
+            candidates.append(self.times[started])
+        if ended < len(self.endings):
+            candidates.append(self.endings[ended])
+        return min(candidates) if candidates else None
+
+
+class ContentScheduleIndex(Generic[Entry]):
+    """
+    In-process, per-kiosk index of active content sorted by scheduled time.
+
+    Reads are a bisect over already-built entries. The database is queried the
+    first time a kiosk is requested, after it was evicted or invalidated, and
+    once its schedule is older than `ttl`, which bounds how long a write made
+    on another instance can go unseen when no invalidation bus is configured.
+    A reload that finds the same rows keeps the existing schedule and its
+    revision. Writes made through ``update_content`` are applied in place. At
+    most `max_kiosks` schedules are kept, least recently used first out.
+
+    Args:
+        build_entry (Callable[[prisma.models.Content], Entry]): Converts a Content row into the entry served to kiosks.
+        encode_entry (Callable[[Entry], bytes]): Encodes an entry to JSON once, when it is indexed.
+        max_kiosks (int): The maximum number of kiosk schedules kept in memory.
+        ttl (float): The number of seconds a loaded schedule is served before it is re-read.
+    """
+
+    def __init__(
+        self,
+        build_entry: Callable[[prisma.models.Content], Entry],
+        encode_entry: Callable[[Entry], bytes],
+        max_kiosks: int = SCHEDULE_INDEX_MAX_KIOSKS,
+        ttl: float = SCHEDULE_TTL_SECONDS,
+    ) -> None:
+        self._build_entry = build_entry
+        self._encode_entry = encode_entry
+        self.max_kiosks = max_kiosks
+        self.ttl = ttl
+        self._schedules: "OrderedDict[str, KioskSchedule[Entry]]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Lock] = {}
+        self._reading: Set[str] = set()
+        self._stale: Set[str] = set()
+        self._listeners: List[Callable[[str, KioskSchedule[Entry]], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def on_change(
+        self, listener: Callable[[str, KioskSchedule[Entry]], None]
+    ) -> None:
+        """
+        Registers a callback invoked with the kiosk id and its schedule whenever
+        a schedule is loaded or a row is applied to it.
+        """
+        self._listeners.append(listener)
+
+    def _changed(self, kioskId: str, schedule: KioskSchedule[Entry]) -> None:
+        for listener in self._listeners:
+            listener(kioskId, schedule)
+
+    def _upsert(
+        self, schedule: KioskSchedule[Entry], content: prisma.models.Content
+    ) -> None:
+        entry = self._build_entry(content)
+        schedule.upsert(content, entry, self._encode_entry(entry))
+
+    def _fresh(self, kioskId: str) -> Optional[KioskSchedule[Entry]]:
+        schedule = self._schedules.get(kioskId)
+        if schedule is None or time.monotonic() - schedule.loaded > self.ttl:
+            return None
+        self._schedules.move_to_end(kioskId)
+        return schedule
+
+    def _store(self, kioskId: str, schedule: KioskSchedule[Entry]) -> None:
+        self._schedules[kioskId] = schedule
+        self._schedules.move_to_end(kioskId)
+        while len(self._schedules) > self.max_kiosks:
+            self._schedules.popitem(last=False)
+
+    async def _read(self, kioskId: str) -> KioskSchedule[Entry]:
+        contents = await prisma.models.Content.prisma().find_many(
+            where={"kioskId": kioskId, "isActive": True},
+            order={"scheduledTime": "asc"},
+        )
+        schedule: KioskSchedule[Entry] = KioskSchedule()
+        for content in contents:
+            self._upsert(schedule, content)
+        return schedule
+
+    async def _load(self, kioskId: str) -> KioskSchedule[Entry]:
+        lock = self._loading.setdefault(kioskId, asyncio.Lock())
+        async with lock:
+            try:
+                schedule = self._fresh(kioskId)
+                if schedule is not None:
+                    return schedule
+                previous = self._schedules.get(kioskId)
+                for _ in range(LOAD_ATTEMPTS):
+                    # A write applied or invalidated while the query runs marks the
+                    # kiosk stale, since the rows read may predate it.
+                    self._stale.discard(kioskId)
+                    self._reading.add(kioskId)
+                    try:
+                        schedule = await self._read(kioskId)
+                    finally:
+                        self._reading.discard(kioskId)
+                    if kioskId not in self._stale:
+                        break
+                else:
+                    self._stale.discard(kioskId)
+                    return schedule
+                if previous is not None and previous.same_rows(schedule):
+                    previous.loaded = schedule.loaded
+                    schedule = previous
+                self._store(kioskId, schedule)
+            finally:
+                # Callers already waiting on this lock find the schedule stored.
+                if self._loading.get(kioskId) is lock:
+                    del self._loading[kioskId]
+        if schedule is not previous:
+            self._changed(kioskId, schedule)
+        return schedule
+
+    def peek(self, kioskId: str) -> Optional[KioskSchedule[Entry]]:
+        """
+        Returns the schedule of a kiosk if it is loaded and fresh, without querying the database.
+        """
+        return self._fresh(kioskId)
+
+    async def get_schedule(self, kioskId: str) -> KioskSchedule[Entry]:
+        """
+        Returns the schedule for a kiosk, loading it from the database on a miss.
+        """
+        schedule = self._fresh(kioskId)
+        if schedule is None:
+            schedule = await self._load(kioskId)
+        return schedule
+
+    async def current(
+        self, kioskId: str, now: Optional[datetime] = None
+    ) -> List[Entry]:
+        """
+        Returns the content whose scheduled time has been reached for a kiosk.
+
+        Args:
+            kioskId (str): The kiosk whose schedule is requested.
+            now (Optional[datetime]): The reference time, defaults to the current UTC time.
+
+        Returns:
+            List[Entry]: Active content scheduled at or before ``now``, oldest first.
+        """
+        schedule = await self.get_schedule(kioskId)
+        return schedule.current(as_utc(now) if now else datetime.now(timezone.utc))
+
+    async def snapshot(self, kioskId: str, now: Optional[datetime] = None) -> bytes:
+        """
+        Returns the pre-encoded JSON array of the content currently visible to a kiosk.
+        """
+        schedule = await self.get_schedule(kioskId)
+        return schedule.snapshot(as_utc(now) if now else datetime.now(timezone.utc))
+
+    async def etag(self, kioskId: str, now: Optional[datetime] = None) -> str:
+        """
+        Returns the ETag of the content currently visible to a kiosk.
+        """
+        schedule = await self.get_schedule(kioskId)
+        return schedule.etag(as_utc(now) if now else datetime.now(timezone.utc))
+
+    def apply(self, content: prisma.models.Content) -> None:
+        """
+        Applies a freshly written Content row to the index.
+
+        Kiosks that have not been loaded yet are left alone; they will read the
+        row from the database on their first request.
+        """
+        if content.kioskId in self._reading:
+            self._stale.add(content.kioskId)
+        schedule = self._schedules.get(content.kioskId)
+        if schedule is not None:
+            self._upsert(schedule, content)
+            self._changed(content.kioskId, schedule)
+
+    def invalidate(self, kioskId: Optional[str] = None) -> None:
+        """
+        Drops the cached schedule of one kiosk, or of every kiosk when no id is given.
+
+        A load of the same kiosk already in progress is retried, since the
+        rows it is reading may predate the change.
+        """
+        if kioskId is None:
+            self._schedules.clear()
+            self._stale.update(self._reading)
+        else:
+            self._schedules.pop(kioskId, None)
+            if kioskId in self._reading:
+                self._stale.add(kioskId)
@@ -0,0 +1,86 @@
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+DEFAULT_MAX_BATCH_SIZE = 500
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Coalesces single-row lookups issued in the same event-loop tick into one query.
+
+    Callers await `load(key)` as if it were a `find_unique`. Keys requested
+    before the loop gets to run scheduled callbacks are collected, deduplicated
+    and resolved with a single call to `batch_fn`, and every caller receives its
+    own row (or None). An exception raised by `batch_fn` is raised in every
+    caller of that batch. Callers receive a shielded view of the shared future,
+    so one that is cancelled does not fail the same key for the others. Nothing
+    is cached across batches.
+
+    Args:
+        batch_fn (Callable[[List[K]], Awaitable[Dict[K, V]]]): Fetches the rows of many keys, mapped by key.
+        max_batch_size (int): The maximum number of keys resolved by one call.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ) -> None:
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.loads = 0
+        self._pending: Dict[K, "asyncio.Future[Optional[V]]"] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def stats(self) -> Dict[str, float]:
+        return {"loads": self.loads, "batches": self.batches}
+
+    def load(self, key: K) -> "asyncio.Future[Optional[V]]":
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is not None:
+            return asyncio.shield(future)
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            loop.call_soon(self._dispatch)
+        future = loop.create_future()
+        self._pending[key] = future
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        return asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        # The loop only keeps a weak reference to tasks, so hold on to it until it ends.
+        task = asyncio.get_running_loop().create_task(self._resolve(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, pending: Dict[K, "asyncio.Future[Optional[V]]"]) -> None:
+        self.batches += 1
+        try:
+            rows = await self.batch_fn(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(rows.get(key))
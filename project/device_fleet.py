@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+import prisma
+import prisma.models
+from project.content_schedule_index import as_utc
+
+logger = logging.getLogger(__name__)
+
+FLEET_WRITE_SECONDS = float(os.getenv("FLEET_WRITE_SECONDS", "15"))
+
+DEVICE_STALE_SECONDS = float(os.getenv("DEVICE_STALE_SECONDS", "60"))
+
+DEVICE_OFFLINE_SECONDS = float(os.getenv("DEVICE_OFFLINE_SECONDS", "120"))
+
+ONLINE = "Online"
+
+OFFLINE = "Offline"
+
+MAINTENANCE = "Maintenance"
+
+
+class DeviceState:
+    """
+    The last known state of one device, as seen by this worker.
+    """
+
+    __slots__ = ("deviceId", "identifier", "location", "status", "lastCheckIn", "timer")
+
+    def __init__(
+        self,
+        deviceId: str,
+        identifier: str,
+        location: str,
+        status: str,
+        lastCheckIn: datetime,
+    ) -> None:
+        self.deviceId = deviceId
+        self.identifier = identifier
+        self.location = location
+        self.status = status
+        self.lastCheckIn = lastCheckIn
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class DeviceFleet:
+    """
+    In-memory view of every device's status and last check-in.
+
+    Heartbeats only update memory and mark the device dirty; a background task
+    writes the latest state of all dirty devices in one batched transaction
+    every `write_interval` seconds, so a device beating every 30 seconds costs
+    at most one row update per interval. Each heartbeat re-arms a per-device
+    timer that marks the device offline after `offline_after` seconds of
+    silence, without any database polling.
+
+    Several instances may each hold a view of the same device, and only the
+    one receiving its heartbeats has it current. Writes are therefore
+    conditional: a check-in is only written over an older one, and a silent
+    device is re-read before it is marked offline, then only marked if no
+    newer check-in reached the database in between. Devices deleted from the
+    database are dropped from the view when they are next re-read.
+    """
+
+    def __init__(
+        self,
+        write_interval: float = FLEET_WRITE_SECONDS,
+        stale_after: float = DEVICE_STALE_SECONDS,
+        offline_after: float = DEVICE_OFFLINE_SECONDS,
+    ) -> None:
+        self.write_interval = write_interval
+        self.stale_after = stale_after
+        self.offline_after = offline_after
+        self.devices: Dict[str, DeviceState] = {}
+        self.dirty: Set[str] = set()
+        self.expired: Set[str] = set()
+        self._checks: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _add(self, device: prisma.models.Device) -> DeviceState:
+        state = DeviceState(
+            device.id,
+            device.identifier,
+            device.location,
+            str(getattr(device.status, "value", device.status)),
+            as_utc(device.lastCheckIn),
+        )
+        self.devices[device.id] = state
+        return state
+
+    def _arm(self, state: DeviceState, now: datetime) -> None:
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        if state.status != ONLINE:
+            return
+        remaining = self.offline_after - (now - state.lastCheckIn).total_seconds()
+        state.timer = asyncio.get_running_loop().call_later(
+            max(0.0, remaining), self._expire, state.deviceId
+        )
+
+    def _expire(self, deviceId: str) -> None:
+        state = self.devices.get(deviceId)
+        if state is None or state.status != ONLINE:
+            return
+        state.timer = None
+        task = asyncio.get_running_loop().create_task(self._check_expired(deviceId))
+        self._checks.add(task)
+        task.add_done_callback(self._checks.discard)
+
+    async def _check_expired(self, deviceId: str) -> None:
+        """
+        Marks a silent device offline unless another instance recorded a newer check-in.
+        """
+        try:
+            device = await prisma.models.Device.prisma().find_unique(
+                where={"id": deviceId}
+            )
+        except Exception:
+            logger.exception("Failed to re-read device %s", deviceId)
+            return
+        state = self.devices.get(deviceId)
+        if state is None or state.status != ONLINE or state.timer is not None:
+            return
+        if device is None:
+            self.forget(deviceId)
+            return
+        now = datetime.now(timezone.utc)
+        if as_utc(device.lastCheckIn) > state.lastCheckIn:
+            state.status = str(getattr(device.status, "value", device.status))
+            state.lastCheckIn = as_utc(device.lastCheckIn)
+            self._arm(state, now)
+            return
+        state.status = OFFLINE
+        self.expired.add(deviceId)
+        logger.info("Device %s missed its heartbeats, marking offline", deviceId)
+
+    def forget(self, deviceId: str) -> None:
+        """
+        Drops a device that no longer exists from the view.
+        """
+        state = self.devices.pop(deviceId, None)
+        if state is not None and state.timer is not None:
+            state.timer.cancel()
+        self.dirty.discard(deviceId)
+        self.expired.discard(deviceId)
+
+    async def load(self) -> None:
+        """
+        Loads every device once and arms the offline timers of online devices.
+        """
+        now = datetime.now(timezone.utc)
+        for device in await prisma.models.Device.prisma().find_many():
+            self._arm(self._add(device), now)
+
+    async def heartbeat(self, deviceId: str, status: str = ONLINE) -> Optional[DeviceState]:
+        """
+        Records a heartbeat. Returns None if the device does not exist.
+        """
+        state = self.devices.get(deviceId)
+        if state is None:
+            device = await prisma.models.Device.prisma().find_unique(
+                where={"id": deviceId}
+            )
+            if device is None:
+                return None
+            state = self._add(device)
+        now = datetime.now(timezone.utc)
+        state.status = status
+        state.lastCheckIn = now
+        self.dirty.add(deviceId)
+        self.expired.discard(deviceId)
+        self._arm(state, now)
+        return state
+
+    async def write(self) -> int:
+        """
+        Writes the latest state of every dirty device. Returns the number of devices written.
+
+        Check-ins only overwrite older ones, and offline marks only apply while
+        the stored check-in is still the one this instance last saw, so a stale
+        view never moves a device's state backwards. Devices deleted meanwhile
+        match no row and are skipped.
+        """
+        if not self.dirty and not self.expired:
+            return 0
+        dirty, self.dirty = self.dirty, set()
+        expired, self.expired = self.expired, set()
+        try:
+            async with prisma.get_client().batch_() as batcher:
+                for deviceId in dirty:
+                    state = self.devices.get(deviceId)
+                    if state is None:
+                        continue
+                    batcher.device.update_many(
+                        where={"id": deviceId, "lastCheckIn": {"lt": state.lastCheckIn}},
+                        data={"status": state.status, "lastCheckIn": state.lastCheckIn},
+                    )
+                for deviceId in expired - dirty:
+                    state = self.devices.get(deviceId)
+                    if state is None:
+                        continue
+                    batcher.device.update_many(
+                        where={
+                            "id": deviceId,
+                            "status": ONLINE,
+                            "lastCheckIn": {"lte": state.lastCheckIn},
+                        },
+                        data={"status": OFFLINE},
+                    )
+        except Exception:
+            self.dirty |= dirty
+            self.expired |= expired
+            raise
+        return len(dirty | expired)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.write_interval)
+            try:
+                await self.write()
+            except Exception:
+                logger.exception("Failed to write device heartbeats")
+
+    async def start(self) -> None:
+        await self.load()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for state in self.devices.values():
+            if state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+        for task in list(self._checks):
+            task.cancel()
+        await asyncio.gather(*self._checks, return_exceptions=True)
+        try:
+            await self.write()
+        except Exception:
+            logger.exception("Failed to write device heartbeats on shutdown")
+
+    def stale(self, now: Optional[datetime] = None) -> List[DeviceState]:
+        """
+        Returns the devices that have not checked in for `stale_after` seconds.
+        """
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=self.stale_after)
+        return sorted(
+            (state for state in self.devices.values() if state.lastCheckIn < cutoff),
+            key=lambda state: state.lastCheckIn,
+        )
+
+
+device_fleet = DeviceFleet()
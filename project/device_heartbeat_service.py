@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Dict, List
+
+import prisma
+import prisma.enums
+from project.device_fleet import device_fleet
+from pydantic import BaseModel
+
+
+class DeviceHeartbeatResponse(BaseModel):
+    """
+    Confirms a device heartbeat and reports the status recorded for the device.
+    """
+
+    deviceId: str
+    status: str
+    lastCheckIn: datetime
+
+
+class StaleDevice(BaseModel):
+    """
+    A device that has not checked in recently.
+    """
+
+    deviceId: str
+    identifier: str
+    location: str
+    status: str
+    lastCheckIn: datetime
+
+
+class FleetStatusResponse(BaseModel):
+    """
+    Summary of the fleet: device counts per status and devices that stopped checking in.
+    """
+
+    total: int
+    counts: Dict[str, int]
+    stale: List[StaleDevice]
+
+
+async def record_heartbeat(
+    deviceId: str, status: prisma.enums.Status = prisma.enums.Status.Online
+) -> DeviceHeartbeatResponse:
+    """
+    Records a heartbeat from a kiosk device.
+
+    The heartbeat only updates the in-memory fleet view; `lastCheckIn` and `status`
+    are written to the database in periodic batches.
+
+    Args:
+        deviceId (str): The unique identifier of the reporting device.
+        status (prisma.enums.Status): The status reported by the device.
+
+    Returns:
+        DeviceHeartbeatResponse: The recorded status and check-in time.
+
+    Raises:
+        LookupError: If the device does not exist.
+    """
+    state = await device_fleet.heartbeat(deviceId, str(getattr(status, "value", status)))
+    if state is None:
+        raise LookupError(f"Device with ID {deviceId} does not exist.")
+    return DeviceHeartbeatResponse(
+        deviceId=state.deviceId, status=state.status, lastCheckIn=state.lastCheckIn
+    )
+
+
+async def get_fleet_status() -> FleetStatusResponse:
+    """
+    Summarises the fleet from memory, without querying the database.
+
+    Returns:
+        FleetStatusResponse: Device counts per status and the devices that stopped checking in.
+    """
+    counts = {status.value: 0 for status in prisma.enums.Status}
+    for state in device_fleet.devices.values():
+        counts[state.status] = counts.get(state.status, 0) + 1
+    stale = [
+        StaleDevice(
+            deviceId=state.deviceId,
+            identifier=state.identifier,
+            location=state.location,
+            status=state.status,
+            lastCheckIn=state.lastCheckIn,
+        )
+        for state in device_fleet.stale()
+    ]
+    return FleetStatusResponse(
+        total=len(device_fleet.devices), counts=counts, stale=stale
+    )
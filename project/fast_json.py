@@ -0,0 +1,44 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encodes plain Python data (dicts, lists, strings, numbers, datetimes, enums) to JSON bytes.
+
+    Uses orjson when it is installed and falls back to the standard library
+    encoder, producing the same ISO 8601 timestamps either way.
+
+    Args:
+        value (Any): The data to encode.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(
+        value, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+def join_array(items: "list[bytes]") -> bytes:
+    """
+    Joins already encoded JSON values into a JSON array without re-encoding them.
+    """
+    return b"[" + b",".join(items) + b"]"
@@ -1,38 +1,113 @@
-from datetime import datetime
-from typing import List
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 
 import prisma
 import prisma.enums
 import prisma.models
+from project.content_schedule_index import (
+    SCHEDULE_INDEX_MAX_KIOSKS,
+    SCHEDULE_TTL_SECONDS,
+    ContentScheduleIndex,
+    as_utc,
+)
+from project.fast_json import dumps, join_array
+from project.single_flight import single_flight
+from project.ttl_cache import TTLCache
 from pydantic import BaseModel
 
+LOOKAHEAD_MAX_HOURS = int(os.getenv("LOOKAHEAD_MAX_HOURS", "168"))
+
 
 class ContentDetails(BaseModel):
     """
     Detailed information about a single content item including its title, type, and scheduled time.
+
+    `endTime` is when the item stops being displayed; items without one stay on
+    the playlist until they are deactivated.
     """
 
     title: str
     contentBody: str
     contentType: prisma.enums.ContentType
     scheduledTime: datetime
+    endTime: Optional[datetime] = None
     isActive: bool
 
 
 class GetContentResponse(BaseModel):
     """
     Response model for scheduled content retrieval. Contains details about the content scheduled for the specified kiosk.
+
+    For a delta sync, `contentList` holds only the items added or changed since the
+    requested cursor and `removedTitles` the items that are no longer displayed.
+    `cursor` is the server time to send as `since` on the next poll.
+    """
+
+    contentList: List[ContentDetails]
+    removedTitles: List[str] = []
+    isDelta: bool = False
+    cursor: Optional[datetime] = None
+
+
+class GetContentLookaheadResponse(BaseModel):
+    """
+    Response model for a schedule lookahead. Lists every item displayed on the kiosk
+    between `start` and `end`, including those already showing, in activation order.
     """
 
+    kioskId: str
+    start: datetime
+    end: datetime
     contentList: List[ContentDetails]
 
 
+def content_details_from_row(content: prisma.models.Content) -> ContentDetails:
+    """
+    Builds the response entry for a single Content row.
+
+    Args:
+        content (prisma.models.Content): The Content row to convert.
+
+    Returns:
+        ContentDetails: The content as served to kiosks.
+    """
+    return ContentDetails(
+        title=content.title,
+        contentBody=content.contentBody,
+        contentType=content.contentType,
+        scheduledTime=content.scheduledTime,
+        endTime=content.endTime,
+        isActive=content.isActive,
+    )
+
+
+def encode_content_details(details: ContentDetails) -> bytes:
+    """
+    Encodes a content entry to JSON bytes, once, when it enters the schedule index.
+
+    Args:
+        details (ContentDetails): The entry to encode.
+
+    Returns:
+        bytes: The entry as a JSON object.
+    """
+    return dumps(details.dict())
+
+
+schedule_index: ContentScheduleIndex[ContentDetails] = ContentScheduleIndex(
+    content_details_from_row, encode_content_details
+)
+
+
 async def get_content(kioskId: str) -> GetContentResponse:
     """
     Retrieves scheduled content for a specific kiosk.
 
-    This function queries the database to find all active content related to
-    the specified kiosk, scheduled before the current time.
+    Content is served from the in-process schedule index, which is loaded from
+    the database the first time a kiosk is requested and kept current by
+    `update_content`. Only entries scheduled before the current time and not yet
+    past their end time are returned.
 
     Args:
         kioskId (str): Unique identifier for the kiosk whose content is being requested.
@@ -40,17 +115,140 @@ async def get_content(kioskId: str) -> GetContentResponse:
     Returns:
         GetContentResponse: Response model for scheduled content retrieval. Contains details about the content scheduled for the specified kiosk.
     """
+    now = datetime.now(timezone.utc)
+    content_details_list = await schedule_index.current(kioskId, now)
+    return GetContentResponse(contentList=content_details_list, cursor=now)
+
+
+content_bodies: TTLCache[str, Tuple[str, bytes]] = TTLCache(
+    maxsize=SCHEDULE_INDEX_MAX_KIOSKS, ttl=SCHEDULE_TTL_SECONDS
+)
+
+
+@single_flight
+async def get_content_snapshot(kioskId: str) -> Tuple[str, bytes]:
+    """
+    Retrieves scheduled content for a specific kiosk as an encoded `GetContentResponse`,
+    together with its ETag.
+
+    The content list is a pre-encoded snapshot kept by the schedule index, so
+    serving a poll costs a bisect and a byte concatenation rather than building
+    and encoding one model per row. The whole body is kept until the ETag
+    changes, so it is byte-for-byte stable and its compressed variants can be
+    cached. Its `cursor` is therefore the time the body was built: a cursor
+    older than the request only widens the next delta, since nothing visible
+    changed in between.
+
+    Args:
+        kioskId (str): Unique identifier for the kiosk whose content is being requested.
+
+    Returns:
+        Tuple[str, bytes]: The ETag and the JSON encoded response body.
+    """
+    now = datetime.now(timezone.utc)
+    schedule = await schedule_index.get_schedule(kioskId)
+    etag = schedule.etag(now)
+    cached = content_bodies.get(kioskId)
+    if cached is not None and cached[0] == etag:
+        return cached
+    body = (
+        b'{"contentList":'
+        + schedule.snapshot(now)
+        + b',"removedTitles":[],"isDelta":false,"cursor":'
+        + dumps(now)
+        + b"}"
+    )
+    content_bodies.put(kioskId, (etag, body))
+    return etag, body
+
+
+async def get_content_etag(kioskId: str) -> str:
+    """
+    Computes the ETag of the content currently scheduled for a kiosk.
+
+    Args:
+        kioskId (str): Unique identifier for the kiosk whose content is being requested.
+
+    Returns:
+        str: A quoted strong ETag that changes whenever the visible content changes.
+    """
+    return await schedule_index.etag(kioskId)
+
+
+@single_flight
+async def get_content_changes(kioskId: str, since: datetime) -> GetContentResponse:
+    """
+    Retrieves the changes to a kiosk's scheduled content since a previous sync.
+
+    A row is part of the delta when it was written after `since`, or when its
+    scheduled time or end time was reached after `since`. Active rows that are
+    currently displayed are returned in `contentList`; deactivated, rescheduled or
+    ended rows are reported by title in `removedTitles`.
+
+    Args:
+        kioskId (str): Unique identifier for the kiosk whose content is being requested.
+        since (datetime): The `cursor` returned by the kiosk's previous sync.
+
+    Returns:
+        GetContentResponse: The delta, with a cursor to use for the next sync.
+    """
+    since = as_utc(since)
+    now = datetime.now(timezone.utc)
     contents = await prisma.models.Content.prisma().find_many(
-        where={"isActive": True, "scheduledTime": {"lte": datetime.utcnow()}}
+        where={
+            "kioskId": kioskId,
+            "OR": [
+                {"updatedAt": {"gt": since}},
+                {"scheduledTime": {"gt": since, "lte": now}},
+                {"endTime": {"gt": since, "lte": now}},
+            ],
+        },
+        order={"scheduledTime": "asc"},
+    )
+    changed = []
+    removed = []
+    for content in contents:
+        ended = content.endTime is not None and as_utc(content.endTime) <= now
+        if content.isActive and as_utc(content.scheduledTime) <= now and not ended:
+            changed.append(content_details_from_row(content))
+        elif as_utc(content.updatedAt) > since or ended:
+            removed.append(content.title)
+    return GetContentResponse(
+        contentList=changed, removedTitles=removed, isDelta=True, cursor=now
+    )
+
+
+@single_flight
+async def get_content_lookahead_json(kioskId: str, hours: int) -> bytes:
+    """
+    Retrieves the upcoming schedule of a kiosk as an encoded `GetContentLookaheadResponse`.
+
+    Kiosks use the lookahead to preload the media of items before they are due
+    instead of fetching it at display time.
+
+    Args:
+        kioskId (str): Unique identifier for the kiosk whose schedule is being requested.
+        hours (int): How far ahead to look, between 1 and `LOOKAHEAD_MAX_HOURS`.
+
+    Returns:
+        bytes: The JSON encoded response body.
+
+    Raises:
+        ValueError: If `hours` is out of range.
+    """
+    if not 1 <= hours <= LOOKAHEAD_MAX_HOURS:
+        raise ValueError(f"hours must be between 1 and {LOOKAHEAD_MAX_HOURS}")
+    schedule = await schedule_index.get_schedule(kioskId)
+    now = datetime.now(timezone.utc)
+    end = now + timedelta(hours=hours)
+    return (
+        b'{"kioskId":'
+        + dumps(kioskId)
+        + b',"start":'
+        + dumps(now)
+        + b',"end":'
+        + dumps(end)
+        + b',"contentList":'
+        + join_array(schedule.upcoming(now, end))
+        + b"}"
     )
-    content_details_list = [
-        ContentDetails(
-            title=content.title,
-            contentBody=content.contentBody,
-            contentType=content.contentType,
-            scheduledTime=content.scheduledTime,
-            isActive=content.isActive,
-        )
-        for content in contents
-    ]
-    return GetContentResponse(contentList=content_details_list)
@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import prisma
+import prisma.models
+from project.content_schedule_index import as_utc
+from project.interaction_rollups import (
+    CONTENT_INTERACTIONS,
+    DAY,
+    DEVICE_INTERACTIONS,
+    bucket_start,
+    interaction_rollups,
+)
+from project.single_flight import single_flight
+from pydantic import BaseModel
+
+
+class InteractionBucket(BaseModel):
+    """
+    The number of interactions of one action for one device or content item within a time bucket.
+    """
+
+    bucketStart: datetime
+    granularity: str
+    subjectId: str
+    action: str
+    count: int
+
+
+class GetDeviceAnalyticsResponse(BaseModel):
+    """
+    Device interaction counts per device, action and time bucket, oldest bucket first.
+    """
+
+    start: datetime
+    end: datetime
+    buckets: List[InteractionBucket]
+
+
+class ContentEngagement(BaseModel):
+    """
+    View, like and dislike totals for a single content item.
+    """
+
+    contentId: str
+    views: int
+    likes: int
+    dislikes: int
+
+
+class GetContentAnalyticsResponse(BaseModel):
+    """
+    Engagement totals per content item over the requested time range, most viewed first.
+    """
+
+    start: datetime
+    end: datetime
+    content: List[ContentEngagement]
+
+
+async def _rollup_counts(
+    source: str,
+    start: datetime,
+    end: datetime,
+    subjectId: Optional[str],
+    granularity: str,
+) -> Dict[Tuple[datetime, str, str, str], int]:
+    """
+    Sums stored and pending rollups in [start, end), re-bucketed to the requested granularity.
+
+    Buckets that were already compacted into days stay daily even when hourly
+    buckets are requested.
+    """
+    where: dict = {"source": source, "bucketStart": {"gte": start, "lt": end}}
+    if subjectId:
+        where["subjectId"] = subjectId
+    rows = await prisma.models.InteractionRollup.prisma().find_many(where=where)
+    entries = [
+        (
+            str(getattr(row.granularity, "value", row.granularity)),
+            row.bucketStart,
+            row.subjectId,
+            row.action,
+            row.count,
+        )
+        for row in rows
+    ]
+    for (_, row_granularity, row_start, row_subject, action), count in (
+        interaction_rollups.pending_counts(source)
+    ):
+        if start <= row_start < end and (not subjectId or row_subject == subjectId):
+            entries.append((row_granularity, row_start, row_subject, action, count))
+    counts: Dict[Tuple[datetime, str, str, str], int] = {}
+    for row_granularity, row_start, row_subject, action, count in entries:
+        if granularity == DAY:
+            row_granularity = DAY
+            row_start = bucket_start(row_start, DAY)
+        key = (as_utc(row_start), row_granularity, row_subject, action)
+        counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+def _resolve_range(
+    start: Optional[datetime], end: Optional[datetime]
+) -> Tuple[datetime, datetime]:
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(days=1)
+    return start, end
+
+
+@single_flight
+async def get_device_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    deviceId: Optional[str] = None,
+    granularity: str = "Hour",
+) -> GetDeviceAnalyticsResponse:
+    """
+    Reports device interactions per device, action and hour or day.
+
+    Only the rollup table is read, so the cost depends on the number of buckets in
+    the range, not on the size of `DeviceInteraction`.
+
+    Args:
+        start (Optional[datetime]): Start of the range, defaults to 24 hours before `end`.
+        end (Optional[datetime]): End of the range (exclusive), defaults to now.
+        deviceId (Optional[str]): Only report this device.
+        granularity (str): "Hour" or "Day".
+
+    Returns:
+        GetDeviceAnalyticsResponse: Interaction counts per bucket, oldest first.
+    """
+    start, end = _resolve_range(start, end)
+    counts = await _rollup_counts(
+        DEVICE_INTERACTIONS, start, end, deviceId, granularity
+    )
+    buckets = [
+        InteractionBucket(
+            bucketStart=bucket,
+            granularity=bucket_granularity,
+            subjectId=subject,
+            action=action,
+            count=count,
+        )
+        for (bucket, bucket_granularity, subject, action), count in sorted(
+            counts.items()
+        )
+    ]
+    return GetDeviceAnalyticsResponse(start=start, end=end, buckets=buckets)
+
+
+@single_flight
+async def get_content_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    contentId: Optional[str] = None,
+) -> GetContentAnalyticsResponse:
+    """
+    Reports views, likes and dislikes per content item.
+
+    Only the rollup table is read, so the cost depends on the number of buckets in
+    the range, not on the size of `ContentInteraction`.
+
+    Args:
+        start (Optional[datetime]): Start of the range, defaults to 24 hours before `end`.
+        end (Optional[datetime]): End of the range (exclusive), defaults to now.
+        contentId (Optional[str]): Only report this content item.
+
+    Returns:
+        GetContentAnalyticsResponse: Engagement totals per content item, most viewed first.
+    """
+    start, end = _resolve_range(start, end)
+    counts = await _rollup_counts(
+        CONTENT_INTERACTIONS,
+        start,
+        end,
+        contentId,
+        DAY,
+    )
+    totals: Dict[str, Dict[str, int]] = {}
+    for (_, _, subject, action), count in counts.items():
+        per_action = totals.setdefault(subject, {})
+        per_action[action] = per_action.get(action, 0) + count
+    content = [
+        ContentEngagement(
+            contentId=subject,
+            views=per_action.get("View", 0),
+            likes=per_action.get("Like", 0),
+            dislikes=per_action.get("Dislike", 0),
+        )
+        for subject, per_action in totals.items()
+    ]
+    content.sort(key=lambda engagement: engagement.views, reverse=True)
+    return GetContentAnalyticsResponse(start=start, end=end, content=content)
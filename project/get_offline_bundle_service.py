@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import List, Optional
+
+from project.fast_json import dumps
+from project.get_content_service import schedule_index
+from project.get_ui_settings_service import get_ui_settings
+from project.offline_bundles import CompiledBundle, bundle_store
+from pydantic import BaseModel
+
+
+class BundleItem(BaseModel):
+    """
+    A scheduled content item in a kiosk's offline bundle, addressed by the hash of its content.
+    """
+
+    title: str
+    scheduledTime: datetime
+    endTime: Optional[datetime] = None
+    hash: str
+
+
+class BundleManifest(BaseModel):
+    """
+    Lists everything a kiosk needs to run offline. Kiosks fetch only the blobs whose hashes they do not hold yet.
+    """
+
+    kioskId: str
+    version: str
+    items: List[BundleItem]
+    settingsHash: Optional[str] = None
+
+
+async def compile_bundle(kioskId: str, userId: Optional[str] = None) -> CompiledBundle:
+    """
+    Returns the offline bundle of a kiosk, recompiling it only if its schedule or settings changed.
+
+    Args:
+        kioskId (str): The kiosk the bundle is for.
+        userId (Optional[str]): The user whose UI settings should be included.
+
+    Returns:
+        CompiledBundle: The kiosk's current bundle.
+    """
+    schedule = await schedule_index.get_schedule(kioskId)
+    settings = None
+    if userId:
+        settings = dumps((await get_ui_settings(userId)).dict())
+    return bundle_store.compile(kioskId, schedule, settings, userId)
+
+
+async def get_bundle_blob(
+    hash: str, kioskId: Optional[str] = None, userId: Optional[str] = None
+) -> Optional[bytes]:
+    """
+    Fetches a gzip compressed blob by its content hash.
+
+    Blobs are held per instance. When this instance does not hold the blob and
+    the kiosk whose manifest listed it is given, that kiosk's bundle is
+    recompiled here and the blob looked up again.
+
+    Args:
+        hash (str): The SHA-256 listed in a bundle manifest.
+        kioskId (Optional[str]): The kiosk whose manifest listed the blob.
+        userId (Optional[str]): The user the manifest was fetched for.
+
+    Returns:
+        Optional[bytes]: The compressed JSON document, or None if no current bundle references it.
+    """
+    blob = bundle_store.blobs.get(hash)
+    if blob is None and kioskId:
+        await compile_bundle(kioskId, userId)
+        blob = bundle_store.blobs.get(hash)
+    return blob
@@ -1,10 +1,33 @@
+import base64
+import csv
+import io
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, Callable, List, Optional, Tuple
 
 import prisma
+import prisma.enums
 import prisma.models
+from project.content_schedule_index import as_utc
+from project.fast_json import dumps
+from project.interaction_archive import interaction_archive, newest_first
+from project.interaction_rollups import DEVICE_INTERACTIONS
+from project.single_flight import single_flight
 from pydantic import BaseModel
 
+DEFAULT_PAGE_SIZE = 100
+
+MAX_PAGE_SIZE = 1000
+
+EXPORT_BATCH_SIZE = 1000
+
+CSV_COLUMNS = ["timestamp", "user_id", "device_id", "action", "details"]
+
+
+class InvalidAuditLogQueryError(ValueError):
+    """
+    Raised when an audit-log query has a malformed cursor or an unknown filter value.
+    """
+
 
 class SecurityAuditLog(BaseModel):
     """
@@ -13,38 +36,304 @@ class SecurityAuditLog(BaseModel):
 
     timestamp: datetime
     user_id: str
+    device_id: str
     action: str
     details: str
 
 
 class GetSecurityAuditLogsResponse(BaseModel):
     """
-    Provides a list of all security-related activities logged in the system.
+    Provides one page of security-related activities logged in the system, newest first.
+
+    `nextCursor` is set when more entries match the filters and should be passed back
+    as `cursor` to fetch the following page.
     """
 
     logs: List[SecurityAuditLog]
+    nextCursor: Optional[str] = None
+
+
+def encode_cursor(interaction: prisma.models.DeviceInteraction) -> str:
+    """
+    Encodes the keyset position of a row as an opaque cursor.
+    """
+    raw = f"{interaction.createdAt.isoformat()}|{interaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Raises:
+        InvalidAuditLogQueryError: If the cursor is malformed.
+    """
+    try:
+        created_at, interaction_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        )
+        return datetime.fromisoformat(created_at), interaction_id
+    except Exception as e:
+        raise InvalidAuditLogQueryError(f"Invalid cursor: {cursor}") from e
+
+
+def validate_action(action: Optional[str]) -> None:
+    """
+    Checks that an action filter names a `DeviceAction`.
+
+    Raises:
+        InvalidAuditLogQueryError: If the action is unknown.
+    """
+    if action and action not in prisma.enums.DeviceAction.__members__:
+        raise InvalidAuditLogQueryError(f"Unknown device action: {action}")
+
+
+def build_where(
+    deviceId: Optional[str] = None,
+    userId: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    Builds the DeviceInteraction filter for the given criteria and keyset position.
+
+    Raises:
+        InvalidAuditLogQueryError: If the action is unknown or the cursor is malformed.
+    """
+    validate_action(action)
+    where: dict = {}
+    if deviceId:
+        where["deviceId"] = deviceId
+    if userId:
+        where["userId"] = userId
+    if action:
+        where["action"] = action
+    created_at: dict = {}
+    if start:
+        created_at["gte"] = start
+    if end:
+        created_at["lt"] = end
+    if created_at:
+        where["createdAt"] = created_at
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        where["OR"] = [
+            {"createdAt": {"lt": cursor_created_at}},
+            {"createdAt": cursor_created_at, "id": {"lt": cursor_id}},
+        ]
+    return where
+
+
+def audit_log_from_row(interaction: prisma.models.DeviceInteraction) -> SecurityAuditLog:
+    """
+    Builds the audit log entry for a single DeviceInteraction row.
+    """
+    return SecurityAuditLog(
+        timestamp=interaction.createdAt,
+        user_id=interaction.userId if interaction.userId else "Unknown",
+        device_id=interaction.deviceId,
+        action=interaction.action,
+        details=interaction.description or "No details provided.",
+    )
+
+
+def audit_log_record(interaction: prisma.models.DeviceInteraction) -> dict:
+    """
+    Builds the plain JSON-ready form of an audit log entry, skipping model validation.
+
+    The keys and values match `SecurityAuditLog`, so the encoded output is the same.
+    """
+    return {
+        "timestamp": interaction.createdAt,
+        "user_id": interaction.userId if interaction.userId else "Unknown",
+        "device_id": interaction.deviceId,
+        "action": interaction.action,
+        "details": interaction.description or "No details provided.",
+    }
+
+
+def archive_filter(
+    deviceId: Optional[str] = None,
+    userId: Optional[str] = None,
+    action: Optional[str] = None,
+) -> Callable[[object], bool]:
+    """
+    Builds the predicate applied to archived rows, matching `build_where` on everything but time.
+    """
+    action = str(getattr(action, "value", action)) if action else None
+
+    def matches(interaction) -> bool:
+        return (
+            (not deviceId or interaction.deviceId == deviceId)
+            and (not userId or interaction.userId == userId)
+            and (not action or interaction.action == action)
+        )
+
+    return matches
+
+
+async def fetch_page(
+    limit: int,
+    deviceId: Optional[str] = None,
+    userId: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[prisma.models.DeviceInteraction], bool]:
+    """
+    Fetches one keyset page, newest first, and reports whether more rows follow.
+
+    Rows are read from the live table and from the archive segments and merged
+    on (`createdAt`, `id`), so callers page across both without noticing where
+    one ends. When the live table fills the page, the archive is only searched
+    above the oldest live row, which skips every segment outside that window.
+    """
+    rows = await prisma.models.DeviceInteraction.prisma().find_many(
+        where=build_where(deviceId, userId, action, start, end, cursor),
+        order=[{"createdAt": "desc"}, {"id": "desc"}],
+        take=limit + 1,
+    )
+    archive_start = start
+    if len(rows) > limit:
+        oldest = as_utc(rows[limit].createdAt)
+        archive_start = oldest if start is None else max(as_utc(start), oldest)
+    archived = await interaction_archive.scan(
+        DEVICE_INTERACTIONS,
+        archive_filter(deviceId, userId, action),
+        start=archive_start,
+        end=end,
+        before=decode_cursor(cursor) if cursor else None,
+        limit=limit + 1,
+    )
+    if archived:
+        # A batch being archived is briefly in both places; keep one copy.
+        merged = {row.id: row for row in archived}
+        merged.update((row.id, row) for row in rows)
+        rows = sorted(merged.values(), key=newest_first, reverse=True)
+    return rows[:limit], len(rows) > limit
 
 
-async def get_security_audit_logs() -> GetSecurityAuditLogsResponse:
+async def get_security_audit_logs(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    deviceId: Optional[str] = None,
+    userId: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> GetSecurityAuditLogsResponse:
     """
-    Retrieves a log of all security-related activities.
+    Retrieves a page of security-related activities.
 
-    This function queries the DeviceInteraction and User tables to construct a detailed log
-    of security-related activities, focusing on device and authentication actions.
+    Pages are read with keyset pagination on (`createdAt`, `id`), so the cost of a
+    page does not depend on how deep into the log it is.
+
+    Args:
+        cursor (Optional[str]): The `nextCursor` of the previous page, or None for the first page.
+        limit (int): The maximum number of entries to return, capped at `MAX_PAGE_SIZE`.
+        deviceId (Optional[str]): Only return entries for this device.
+        userId (Optional[str]): Only return entries for this user.
+        action (Optional[str]): Only return entries with this device action.
+        start (Optional[datetime]): Only return entries created at or after this time.
+        end (Optional[datetime]): Only return entries created before this time.
+
+    Returns:
+        GetSecurityAuditLogsResponse: An object containing a page of recorded security-related activities.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    device_interactions, has_more = await fetch_page(
+        limit, deviceId, userId, action, start, end, cursor
+    )
+    logs = [audit_log_from_row(interaction) for interaction in device_interactions]
+    next_cursor = encode_cursor(device_interactions[-1]) if has_more else None
+    return GetSecurityAuditLogsResponse(logs=logs, nextCursor=next_cursor)
+
+
+@single_flight
+async def get_security_audit_logs_json(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    deviceId: Optional[str] = None,
+    userId: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> bytes:
+    """
+    Retrieves a page of security-related activities as an encoded `GetSecurityAuditLogsResponse`.
+
+    Rows go straight from the database to JSON bytes without building a model per
+    row. Arguments are the same as for `get_security_audit_logs`.
 
     Returns:
-        GetSecurityAuditLogsResponse: An object containing a list of all recorded security-related activities.
+        bytes: The JSON encoded response body.
     """
-    device_interactions = await prisma.models.DeviceInteraction.prisma().find_many(
-        include={"User": True}
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    device_interactions, has_more = await fetch_page(
+        limit, deviceId, userId, action, start, end, cursor
     )
-    logs = [
-        SecurityAuditLog(
-            timestamp=interaction.createdAt,
-            user_id=interaction.userId if interaction.userId else "Unknown",
-            action=interaction.action,
-            details=interaction.description or "No details provided.",
+    return dumps(
+        {
+            "logs": [audit_log_record(interaction) for interaction in device_interactions],
+            "nextCursor": encode_cursor(device_interactions[-1]) if has_more else None,
+        }
+    )
+
+
+async def export_security_audit_logs(
+    format: str = "ndjson",
+    deviceId: Optional[str] = None,
+    userId: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Streams every matching security-related activity as NDJSON or CSV.
+
+    Rows are read in keyset batches and encoded batch by batch, so memory use stays
+    flat regardless of the size of the table.
+
+    Args:
+        format (str): Either "ndjson" or "csv".
+        deviceId (Optional[str]): Only export entries for this device.
+        userId (Optional[str]): Only export entries for this user.
+        action (Optional[str]): Only export entries with this device action.
+        start (Optional[datetime]): Only export entries created at or after this time.
+        end (Optional[datetime]): Only export entries created before this time.
+        batch_size (int): The number of rows read per database round trip.
+
+    Yields:
+        bytes: Encoded chunks of the export, one per batch.
+    """
+    if format not in ("ndjson", "csv"):
+        raise ValueError(f"Unsupported export format: {format}")
+    if format == "csv":
+        yield (",".join(CSV_COLUMNS) + "\r\n").encode()
+    cursor: Optional[str] = None
+    while True:
+        rows, has_more = await fetch_page(
+            batch_size, deviceId, userId, action, start, end, cursor
         )
-        for interaction in device_interactions
-    ]
-    return GetSecurityAuditLogsResponse(logs=logs)
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for interaction in rows:
+                record = audit_log_record(interaction)
+                record["timestamp"] = record["timestamp"].isoformat()
+                record["action"] = getattr(record["action"], "value", record["action"])
+                writer.writerow([record[column] for column in CSV_COLUMNS])
+            chunk = buffer.getvalue().encode()
+        else:
+            chunk = b"".join(
+                dumps(audit_log_record(interaction)) + b"\n" for interaction in rows
+            )
+        if rows:
+            yield chunk
+        if not has_more:
+            return
+        cursor = encode_cursor(rows[-1])
@@ -1,5 +1,11 @@
+import os
+from typing import Dict, List
+
 import prisma
 import prisma.models
+from project.data_loader import BatchLoader
+from project.single_flight import single_flight
+from project.ttl_cache import TTLCache
 from pydantic import BaseModel
 
 
@@ -14,28 +20,93 @@ class GetUISettingsResponse(BaseModel):
     accessibility_compliance: bool
 
 
-async def get_ui_settings(userId: str) -> GetUISettingsResponse:
+ui_settings_cache: TTLCache[str, GetUISettingsResponse] = TTLCache(
+    maxsize=int(os.getenv("UI_SETTINGS_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("UI_SETTINGS_CACHE_TTL_SECONDS", "300")),
+)
+
+
+async def load_user_profiles(
+    userIds: List[str],
+) -> Dict[str, prisma.models.UserProfile]:
     """
-    Fetches the current UI settings for a specified user.
+    Fetches the profiles of many users with a single query, keyed by user id.
+    """
+    profiles = await prisma.models.UserProfile.prisma().find_many(
+        where={"userId": {"in": userIds}}
+    )
+    return {profile.userId: profile for profile in profiles}
+
+
+user_profile_loader: BatchLoader[str, prisma.models.UserProfile] = BatchLoader(
+    load_user_profiles
+)
+
+
+def ui_settings_from_profile(
+    user_profile: prisma.models.UserProfile,
+) -> GetUISettingsResponse:
+    """
+    Builds the UI settings response from a stored user profile.
 
     Args:
-        userId (str): The unique identifier of the user whose UI settings are being fetched.
+        user_profile (prisma.models.UserProfile): The profile holding the user's settings.
 
     Returns:
         GetUISettingsResponse: Model representing the user's UI settings, including theme, layout options, and language.
     """
-    user_profile = await prisma.models.UserProfile.prisma().find_unique(
-        where={"userId": userId}
+    return GetUISettingsResponse(
+        theme=user_profile.theme,
+        layout=user_profile.layout,
+        language=user_profile.language,
+        accessibility_compliance=True,
     )
+
+
+@single_flight
+async def load_ui_settings(userId: str) -> GetUISettingsResponse:
+    """
+    Loads a user's UI settings from the database and stores them in `ui_settings_cache`.
+
+    Concurrent loads of the same user share one execution, and loads of different
+    users issued together are resolved by one `user_profile_loader` query. The
+    profile is not cached if the user's settings were updated or invalidated
+    while it was being read, since it may predate the update.
+
+    Args:
+        userId (str): The unique identifier of the user whose UI settings are being loaded.
+
+    Returns:
+        GetUISettingsResponse: Model representing the user's UI settings, including theme, layout options, and language.
+    """
+    ui_settings_cache.begin_load(userId)
+    try:
+        user_profile = await user_profile_loader.load(userId)
+    finally:
+        unchanged = ui_settings_cache.end_load(userId)
     if user_profile:
-        theme = "default"
-        layout = "default"
-        accessibility_compliance = True
-        return GetUISettingsResponse(
-            theme=theme,
-            layout=layout,
-            language=user_profile.language,
-            accessibility_compliance=accessibility_compliance,
-        )
+        settings = ui_settings_from_profile(user_profile)
+        if unchanged:
+            ui_settings_cache.put(userId, settings)
+        return settings
     else:
         raise Exception(f"User with ID {userId} does not have a profile.")
+
+
+async def get_ui_settings(userId: str) -> GetUISettingsResponse:
+    """
+    Fetches the current UI settings for a specified user.
+
+    Settings are read through `ui_settings_cache`; the database is only queried on a
+    miss or after the cached entry expired.
+
+    Args:
+        userId (str): The unique identifier of the user whose UI settings are being fetched.
+
+    Returns:
+        GetUISettingsResponse: Model representing the user's UI settings, including theme, layout options, and language.
+    """
+    cached = ui_settings_cache.get(userId)
+    if cached is not None:
+        return cached
+    return await load_ui_settings(userId)
@@ -0,0 +1,58 @@
+from typing import Optional
+
+from project.compression import BROTLI, GZIP, ZSTD
+
+# Content codings whose variants carry their own ETag, e.g. "abc" and "abc-gzip".
+VARIANT_ENCODINGS = (GZIP, BROTLI, ZSTD)
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    Returns the strong ETag of one content coding of a representation.
+
+    Identity and compressed bodies differ byte for byte, so each gets its own
+    ETag: the representation's quoted ETag with the coding appended.
+    """
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def matched_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """
+    Evaluates an If-None-Match request header against the current ETag.
+
+    Candidates match regardless of the content coding suffix they carry, so a
+    client holding any variant of the current representation gets a 304.
+
+    Args:
+        if_none_match (Optional[str]): The raw header value, possibly a comma separated list or `*`.
+        etag (str): The quoted ETag of the current representation, without coding suffix.
+
+    Returns:
+        Optional[str]: The ETag of the variant the client holds, or None if a 304 cannot be sent.
+    """
+    if not if_none_match:
+        return None
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*":
+            return etag
+        base = candidate
+        for encoding in VARIANT_ENCODINGS:
+            suffix = f'-{encoding}"'
+            if candidate.endswith(suffix):
+                base = candidate[: -len(suffix)] + '"'
+                break
+        if base == etag:
+            return candidate
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Returns True if the client already holds a variant of the current representation.
+    """
+    return matched_etag(if_none_match, etag) is not None
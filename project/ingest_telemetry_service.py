@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import List, Optional
+
+import prisma
+import prisma.enums
+from project.telemetry_ingest import (
+    CONTENT_INTERACTION,
+    DEVICE_INTERACTION,
+    event_time,
+    telemetry_queue,
+)
+from pydantic import BaseModel
+
+
+class ContentInteractionEvent(BaseModel):
+    """
+    A kiosk user's reaction to a content item.
+    """
+
+    contentId: str
+    userId: Optional[str] = None
+    action: prisma.enums.Action
+    createdAt: Optional[datetime] = None
+
+
+class DeviceInteractionEvent(BaseModel):
+    """
+    An action performed on a kiosk device.
+    """
+
+    deviceId: str
+    userId: Optional[str] = None
+    action: prisma.enums.DeviceAction
+    description: Optional[str] = None
+    createdAt: Optional[datetime] = None
+
+
+class IngestTelemetryRequest(BaseModel):
+    """
+    A batch of interaction events reported by a kiosk.
+    """
+
+    contentInteractions: List[ContentInteractionEvent] = []
+    deviceInteractions: List[DeviceInteractionEvent] = []
+
+
+class IngestTelemetryResponse(BaseModel):
+    """
+    Confirms that the events were queued for writing, with the current queue depth.
+    """
+
+    accepted: int
+    queueDepth: int
+
+
+async def ingest_telemetry(batch: IngestTelemetryRequest) -> IngestTelemetryResponse:
+    """
+    Queues a batch of kiosk interaction events for asynchronous, batched writing.
+
+    Events without a timestamp are stamped with the time they were received.
+
+    Args:
+        batch (IngestTelemetryRequest): The content and device interaction events to record.
+
+    Returns:
+        IngestTelemetryResponse: The number of events accepted and the resulting queue depth.
+
+    Raises:
+        TelemetryQueueFullError: If the queue cannot take the whole batch.
+    """
+    events = [
+        (
+            CONTENT_INTERACTION,
+            {
+                "contentId": event.contentId,
+                "userId": event.userId,
+                "action": event.action,
+                "createdAt": event_time(event.createdAt),
+            },
+        )
+        for event in batch.contentInteractions
+    ]
+    events.extend(
+        (
+            DEVICE_INTERACTION,
+            {
+                "deviceId": event.deviceId,
+                "userId": event.userId,
+                "action": event.action,
+                "description": event.description,
+                "createdAt": event_time(event.createdAt),
+            },
+        )
+        for event in batch.deviceInteractions
+    )
+    accepted = telemetry_queue.enqueue(events)
+    return IngestTelemetryResponse(accepted=accepted, queueDepth=len(telemetry_queue))
@@ -0,0 +1,530 @@
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from bisect import insort
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import prisma
+import prisma.models
+from project.content_schedule_index import as_utc
+from project.fast_json import dumps
+from project.interaction_rollups import CONTENT_INTERACTIONS, DEVICE_INTERACTIONS
+from project.invalidation_bus import ARCHIVE_TOPIC, invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+# Archival is disabled unless a directory on persistent storage is configured.
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+
+ARCHIVE_BATCH_TIMEOUT_SECONDS = float(os.getenv("ARCHIVE_BATCH_TIMEOUT_SECONDS", "60"))
+
+BLOCK_ROWS = 1024
+
+# Only one worker of the deployment archives at a time.
+ARCHIVE_LOCK = "SELECT pg_try_advisory_xact_lock(hashtext('interaction_archive')) AS locked"
+
+MAGIC = b"K4SEG001"
+
+# Block index entry: offset, compressed length, min and max createdAt in microseconds.
+BLOCK = struct.Struct("<QIqq")
+
+# Trailer: index offset, block count, min and max createdAt, row count, magic.
+TRAILER = struct.Struct("<QIqqQ8s")
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# The columns kept for each archived table.
+ARCHIVED_TABLES: Dict[str, Tuple[str, ...]] = {
+    DEVICE_INTERACTIONS: (
+        "id",
+        "deviceId",
+        "userId",
+        "action",
+        "description",
+        "createdAt",
+    ),
+    CONTENT_INTERACTIONS: ("id", "contentId", "userId", "action", "createdAt"),
+}
+
+Keyset = Tuple[datetime, str]
+
+
+def to_micros(at: datetime) -> int:
+    delta = as_utc(at) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def archived_record(row, columns: Sequence[str]) -> dict:
+    record = {}
+    for column in columns:
+        value = getattr(row, column)
+        record[column] = getattr(value, "value", value)
+    return record
+
+
+def archived_row(record: dict) -> SimpleNamespace:
+    """
+    Rebuilds a row from an archived record, with the same attributes as the Prisma model.
+    """
+    record["createdAt"] = datetime.fromisoformat(record["createdAt"])
+    return SimpleNamespace(**record)
+
+
+def newest_first(row) -> Keyset:
+    return as_utc(row.createdAt), row.id
+
+
+class Segment:
+    """
+    One immutable, compressed segment file of archived rows.
+
+    Rows are sorted newest first and split into zlib-compressed blocks of
+    `BLOCK_ROWS` newline-delimited JSON records. A footer indexes every block
+    with its byte range and min/max `createdAt`, and the segment's own min/max
+    are repeated in its file name, so a time-range query can skip whole files
+    without opening them and whole blocks without decompressing them. Files are
+    memory-mapped for scanning, so only the blocks actually read are paged in.
+    """
+
+    __slots__ = ("path", "min_micros", "max_micros")
+
+    def __init__(self, path: str, min_micros: int, max_micros: int) -> None:
+        self.path = path
+        self.min_micros = min_micros
+        self.max_micros = max_micros
+
+    @classmethod
+    def from_path(cls, path: str) -> Optional["Segment"]:
+        name = os.path.basename(path)
+        if not name.endswith(".seg"):
+            return None
+        try:
+            low, high, _ = name[:-4].split("_", 2)
+            return cls(path, int(low), int(high))
+        except ValueError:
+            return None
+
+    def overlaps(self, low: Optional[int], high: Optional[int]) -> bool:
+        return (low is None or self.max_micros >= low) and (
+            high is None or self.min_micros < high
+        )
+
+    def scan(
+        self,
+        low: Optional[int],
+        high: Optional[int],
+        before: Optional[Keyset],
+        matches: Callable[[SimpleNamespace], bool],
+        limit: int,
+    ) -> List[SimpleNamespace]:
+        """
+        Returns up to `limit` matching rows in [low, high), newest first, strictly
+        older than the `before` keyset position.
+        """
+        found: List[SimpleNamespace] = []
+        with open(self.path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped:
+            view = memoryview(mapped)
+            try:
+                index_offset, blocks, _, _, _, magic = TRAILER.unpack_from(
+                    view, len(view) - TRAILER.size
+                )
+                if magic != MAGIC:
+                    raise ValueError(f"Not an archive segment: {self.path}")
+                for position in range(blocks):
+                    offset, length, block_min, block_max = BLOCK.unpack_from(
+                        view, index_offset + position * BLOCK.size
+                    )
+                    if high is not None and block_min >= high:
+                        continue
+                    if low is not None and block_max < low:
+                        break
+                    for line in zlib.decompress(view[offset : offset + length]).split(
+                        b"\n"
+                    ):
+                        row = archived_row(json.loads(line))
+                        micros = to_micros(row.createdAt)
+                        if high is not None and micros >= high:
+                            continue
+                        if low is not None and micros < low:
+                            return found
+                        if before is not None and newest_first(row) >= before:
+                            continue
+                        if matches(row):
+                            found.append(row)
+                            if len(found) >= limit:
+                                return found
+            finally:
+                view.release()
+        return found
+
+
+def write_segment(directory: str, records: List[dict]) -> Segment:
+    """
+    Writes rows to a new segment file and returns it.
+
+    The file name is derived from the rows' time range and ids, so writing the
+    same batch twice (say, after a crash between writing it and deleting the
+    rows from the database) replaces the file instead of duplicating the rows.
+    The rows are first written to a uniquely named temporary file in the same
+    directory, so concurrent writers never share a partial file.
+    """
+    records.sort(key=lambda record: (record["createdAt"], record["id"]), reverse=True)
+    times = [to_micros(record["createdAt"]) for record in records]
+    digest = hashlib.blake2b(digest_size=8)
+    for record in records:
+        digest.update(record["id"].encode())
+    name = f"{times[-1]}_{times[0]}_{digest.hexdigest()}.seg"
+    path = os.path.join(directory, name)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(prefix=name, suffix=".tmp", dir=directory)
+    index = []
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            for start in range(0, len(records), BLOCK_ROWS):
+                block = zlib.compress(
+                    b"\n".join(
+                        dumps(record) for record in records[start : start + BLOCK_ROWS]
+                    )
+                )
+                block_times = times[start : start + BLOCK_ROWS]
+                index.append(
+                    BLOCK.pack(file.tell(), len(block), block_times[-1], block_times[0])
+                )
+                file.write(block)
+            index_offset = file.tell()
+            file.write(b"".join(index))
+            file.write(
+                TRAILER.pack(
+                    index_offset, len(index), times[-1], times[0], len(records), MAGIC
+                )
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+    return Segment(path, times[-1], times[0])
+
+
+class InteractionArchive:
+    """
+    Moves old interaction rows from the database into local segment files.
+
+    Rows older than `max_age` are read oldest first in batches, written to
+    one segment per table and UTC day (``<root>/<table>/<YYYY-MM-DD>/``), and
+    deleted from the database only once their segment is on disk. Each batch
+    runs in a transaction holding an advisory lock, so only one worker
+    archives at a time and the others skip the run. Segments are never
+    modified after they are written. Every worker keeps the list of segments
+    in memory, sorted by newest row, and adds the ones another worker
+    announces over the invalidation bus; the directory must be shared by all
+    workers and must outlive them.
+
+    Archival is disabled, and archived scans find nothing, unless `root` is
+    set. Rows are deleted from the database once archived, so `start` refuses
+    a directory that is not writable or, on Cloud Run, whose filesystem is
+    the instance's in-memory one rather than a mounted volume.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = ARCHIVE_DIR,
+        max_age: timedelta = timedelta(days=ARCHIVE_AFTER_DAYS),
+        interval: float = ARCHIVE_INTERVAL_SECONDS,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+    ) -> None:
+        self.root = root
+        self.max_age = max_age
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archived = 0
+        self.segments: Dict[str, List[Tuple[int, str, Segment]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def _list(self, table: str) -> List[Segment]:
+        segments: List[Segment] = []
+        for directory, _, files in os.walk(os.path.join(self.root, table)):
+            for file in files:
+                segment = Segment.from_path(os.path.join(directory, file))
+                if segment is not None:
+                    segments.append(segment)
+        return segments
+
+    def refresh(self, table: Optional[str] = None) -> None:
+        """
+        Re-reads the list of segments from disk. Blocks, so it runs in a thread.
+        """
+        tables = [table] if table in ARCHIVED_TABLES else list(ARCHIVED_TABLES)
+        for name in tables:
+            self.segments[name] = sorted(
+                (segment.max_micros, segment.path, segment) for segment in self._list(name)
+            )
+
+    def reload(self, table: Optional[str] = None) -> None:
+        """
+        Picks up segments written by another worker. Used as an invalidation handler.
+
+        The directory is listed in a thread and the new segments added in the
+        background; scans keep using the current listing meanwhile.
+        """
+        if not self.enabled:
+            return
+        task = asyncio.get_running_loop().create_task(self._reload(table))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reload(self, table: Optional[str]) -> None:
+        tables = [table] if table in ARCHIVED_TABLES else list(ARCHIVED_TABLES)
+        try:
+            for name in tables:
+                self._add(name, await asyncio.to_thread(self._list, name))
+        except Exception:
+            logger.exception("Failed to reload archive segments")
+
+    def _add(self, table: str, segments: List[Segment]) -> None:
+        # Scans iterate the listing from other threads, so it is replaced, never mutated.
+        listing = list(self.segments.get(table, []))
+        known = {path for _, path, _ in listing}
+        for segment in segments:
+            if segment.path not in known:
+                insort(listing, (segment.max_micros, segment.path, segment))
+        self.segments[table] = listing
+
+    def _write(self, table: str, records: List[dict]) -> List[Segment]:
+        by_day: Dict[str, List[dict]] = {}
+        for record in records:
+            day = as_utc(record["createdAt"]).strftime("%Y-%m-%d")
+            by_day.setdefault(day, []).append(record)
+        return [
+            write_segment(os.path.join(self.root, table, day), day_records)
+            for day, day_records in by_day.items()
+        ]
+
+    def _discard(self, segments: List[Segment]) -> None:
+        for segment in segments:
+            try:
+                os.remove(segment.path)
+            except OSError:
+                logger.warning("Failed to remove uncommitted segment %s", segment.path)
+
+    async def archive_table(self, table: str, cutoff: datetime) -> int:
+        """
+        Archives every row of `table` created before `cutoff`. Returns the number of rows moved.
+
+        Each batch's segments are only listed for scans, here and on the other
+        workers, once the transaction deleting its rows has committed; if it
+        rolls back, the segments are removed again and the rows stay live.
+        """
+        columns = ARCHIVED_TABLES[table]
+        moved = 0
+        while True:
+            written: List[Segment] = []
+            try:
+                async with prisma.get_client().tx(
+                    timeout=timedelta(seconds=ARCHIVE_BATCH_TIMEOUT_SECONDS)
+                ) as transaction:
+                    locked = await transaction.query_raw(ARCHIVE_LOCK)
+                    if not locked or not locked[0]["locked"]:
+                        logger.info("Another worker is archiving %s, skipping", table)
+                        return moved
+                    actions = getattr(transaction, table.lower())
+                    rows = await actions.find_many(
+                        where={"createdAt": {"lt": cutoff}},
+                        order=[{"createdAt": "asc"}, {"id": "asc"}],
+                        take=self.batch_size,
+                    )
+                    if not rows:
+                        break
+                    records = [archived_record(row, columns) for row in rows]
+                    written = await asyncio.to_thread(self._write, table, records)
+                    await actions.delete_many(
+                        where={"id": {"in": [row.id for row in rows]}}
+                    )
+            except BaseException:
+                if written:
+                    await asyncio.to_thread(self._discard, written)
+                raise
+            self._add(table, written)
+            moved += len(rows)
+            invalidation_bus.publish(ARCHIVE_TOPIC, table)
+            if len(rows) < self.batch_size:
+                break
+        return moved
+
+    async def archive(self, now: Optional[datetime] = None) -> int:
+        """
+        Archives the rows of every archived table older than `max_age`.
+        """
+        now = as_utc(now) if now else datetime.now(timezone.utc)
+        moved = 0
+        for table in ARCHIVED_TABLES:
+            moved += await self.archive_table(table, now - self.max_age)
+        self.archived += moved
+        return moved
+
+    def _candidates(
+        self, table: str, low: Optional[int], high: Optional[int]
+    ) -> Iterator[Segment]:
+        for max_micros, _, segment in reversed(self.segments.get(table, [])):
+            if low is not None and max_micros < low:
+                continue
+            if segment.overlaps(low, high):
+                yield segment
+
+    def _bounds(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        before: Optional[Keyset],
+    ) -> Tuple[Optional[int], Optional[int]]:
+        low = to_micros(start) if start else None
+        high = to_micros(end) if end else None
+        if before is not None:
+            # Rows at the cursor's own timestamp may still follow it by id.
+            before_micros = to_micros(before[0]) + 1
+            high = before_micros if high is None else min(high, before_micros)
+        return low, high
+
+    def _scan(
+        self,
+        candidates: List[Segment],
+        matches: Callable[[SimpleNamespace], bool],
+        low: Optional[int],
+        high: Optional[int],
+        before: Optional[Keyset],
+        limit: int,
+    ) -> List[SimpleNamespace]:
+        found: List[SimpleNamespace] = []
+        seen: Set[str] = set()
+        for segment in candidates:
+            if len(found) >= limit:
+                found.sort(key=newest_first, reverse=True)
+                del found[limit:]
+                if segment.max_micros < to_micros(found[-1].createdAt):
+                    break
+            try:
+                rows = segment.scan(low, high, before, matches, limit)
+            except FileNotFoundError:
+                # Discarded after its archive transaction rolled back; the rows are live.
+                continue
+            # A batch archived again after a failed delete is in two segments.
+            for row in rows:
+                if row.id not in seen:
+                    seen.add(row.id)
+                    found.append(row)
+        found.sort(key=newest_first, reverse=True)
+        return found[:limit]
+
+    async def scan(
+        self,
+        table: str,
+        matches: Callable[[SimpleNamespace], bool],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        before: Optional[Keyset] = None,
+        limit: int = 100,
+    ) -> List[SimpleNamespace]:
+        """
+        Reads archived rows newest first, like a keyset page over the live table.
+
+        Segments outside [start, end) or newer than the `before` position are
+        skipped by name; the scan stops as soon as no remaining segment can hold
+        a row newer than the oldest of the `limit` rows found.
+
+        Args:
+            table (str): One of `ARCHIVED_TABLES`.
+            matches (Callable[[SimpleNamespace], bool]): Filters rows on their other columns.
+            start (Optional[datetime]): Only rows created at or after this time.
+            end (Optional[datetime]): Only rows created before this time.
+            before (Optional[Keyset]): Only rows strictly older than this (createdAt, id) position.
+            limit (int): The maximum number of rows to return.
+
+        Returns:
+            List[SimpleNamespace]: Rows with the same attributes as the table's model.
+        """
+        if before is not None:
+            before = (as_utc(before[0]), before[1])
+        low, high = self._bounds(start, end, before)
+        candidates = list(self._candidates(table, low, high))
+        if not candidates:
+            return []
+        return await asyncio.to_thread(
+            self._scan, candidates, matches, low, high, before, limit
+        )
+
+    def __len__(self) -> int:
+        return sum(len(listing) for listing in self.segments.values())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                moved = await self.archive()
+                if moved:
+                    logger.info("Archived %d interaction rows", moved)
+            except Exception:
+                logger.exception("Failed to archive interaction rows")
+
+    def _check_root(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        if not os.access(self.root, os.W_OK):
+            raise RuntimeError(f"ARCHIVE_DIR {self.root} is not writable")
+        if os.getenv("K_SERVICE"):
+            # Cloud Run: only mounted volumes survive the instance.
+            path = os.path.realpath(self.root)
+            while not os.path.ismount(path):
+                path = os.path.dirname(path)
+            if path == "/":
+                raise RuntimeError(
+                    f"ARCHIVE_DIR {self.root} is on the instance's in-memory filesystem; "
+                    "mount a persistent volume for it"
+                )
+
+    async def start(self) -> None:
+        if not self.enabled:
+            logger.info("ARCHIVE_DIR is not set, interaction archival is disabled")
+            return
+        await asyncio.to_thread(self._check_root)
+        await asyncio.to_thread(self.refresh)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+interaction_archive = InteractionArchive()
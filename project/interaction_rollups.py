@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import prisma
+import prisma.models
+from prisma import Prisma
+from project.content_schedule_index import as_utc
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FLUSH_SECONDS = float(os.getenv("ROLLUP_FLUSH_SECONDS", "10"))
+
+ROLLUP_COMPACT_SECONDS = float(os.getenv("ROLLUP_COMPACT_SECONDS", "3600"))
+
+HOURLY_RETENTION_DAYS = int(os.getenv("ROLLUP_HOURLY_RETENTION_DAYS", "14"))
+
+COMPACT_BATCH_SIZE = 10000
+
+# Serialises compaction and backfill across workers for one transaction.
+ROLLUP_LOCK = "SELECT pg_advisory_xact_lock(hashtext('interaction_rollups'))"
+
+HOUR = "Hour"
+
+DAY = "Day"
+
+DEVICE_INTERACTIONS = "DeviceInteraction"
+
+CONTENT_INTERACTIONS = "ContentInteraction"
+
+RollupKey = Tuple[str, str, datetime, str, str]
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    """
+    Truncates a timestamp to the start of its hour or day bucket, in UTC.
+    """
+    at = as_utc(at)
+    if granularity == DAY:
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+class InteractionRollups:
+    """
+    Time-bucketed interaction counts maintained as interactions are written.
+
+    Writers call `record_device` / `record_content`, which only bump an
+    in-memory counter. A background task periodically adds the pending deltas
+    to hourly `InteractionRollup` rows with atomic increments, so several
+    workers can flush concurrently. Hourly rows older than the retention window
+    are compacted into daily rows. Dashboards read only the rollup table plus
+    this worker's unflushed deltas, never the raw interaction tables.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = ROLLUP_FLUSH_SECONDS,
+        compact_interval: float = ROLLUP_COMPACT_SECONDS,
+        hourly_retention: timedelta = timedelta(days=HOURLY_RETENTION_DAYS),
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.hourly_retention = hourly_retention
+        self.pending: Dict[RollupKey, int] = {}
+        self._tasks: list = []
+
+    def record(self, source: str, subjectId: str, action: str, at: datetime) -> None:
+        key = (
+            source,
+            HOUR,
+            bucket_start(at, HOUR),
+            subjectId,
+            str(getattr(action, "value", action)),
+        )
+        self.pending[key] = self.pending.get(key, 0) + 1
+
+    def record_device(self, deviceId: str, action: str, at: datetime) -> None:
+        self.record(DEVICE_INTERACTIONS, deviceId, action, at)
+
+    def record_content(self, contentId: str, action: str, at: datetime) -> None:
+        self.record(CONTENT_INTERACTIONS, contentId, action, at)
+
+    def pending_counts(self, source: str) -> Iterable[Tuple[RollupKey, int]]:
+        return [(key, count) for key, count in self.pending.items() if key[0] == source]
+
+    async def _increment(self, deltas: Dict[RollupKey, int]) -> None:
+        async with prisma.get_client().batch_() as batcher:
+            for (source, granularity, start, subjectId, action), count in deltas.items():
+                batcher.interactionrollup.upsert(
+                    where={
+                        "source_granularity_bucketStart_subjectId_action": {
+                            "source": source,
+                            "granularity": granularity,
+                            "bucketStart": start,
+                            "subjectId": subjectId,
+                            "action": action,
+                        }
+                    },
+                    data={
+                        "create": {
+                            "source": source,
+                            "granularity": granularity,
+                            "bucketStart": start,
+                            "subjectId": subjectId,
+                            "action": action,
+                            "count": count,
+                        },
+                        "update": {"count": {"increment": count}},
+                    },
+                )
+
+    async def flush(self) -> int:
+        """
+        Adds the pending deltas to the rollup table. Returns the number of buckets written.
+
+        Deltas are put back if the write fails, so no counts are lost.
+        """
+        if not self.pending:
+            return 0
+        deltas, self.pending = self.pending, {}
+        try:
+            await self._increment(deltas)
+        except Exception:
+            for key, count in deltas.items():
+                self.pending[key] = self.pending.get(key, 0) + count
+            raise
+        return len(deltas)
+
+    async def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Folds hourly rows older than the retention window into daily rows.
+
+        Each call moves up to `COMPACT_BATCH_SIZE` hourly rows in one statement
+        that deletes them and adds exactly the deleted counts to the daily rows,
+        so a flush that increments one of them first is either included or
+        waits for the row lock and lands in a new hourly row. Compactions are
+        serialised across workers with a transaction-scoped advisory lock.
+
+        Returns:
+            int: The number of daily rows written, zero once nothing is left to compact.
+        """
+        now = as_utc(now) if now else datetime.now(timezone.utc)
+        cutoff = bucket_start(now - self.hourly_retention, DAY)
+        async with prisma.get_client().tx(timeout=timedelta(seconds=30)) as transaction:
+            await transaction.execute_raw(ROLLUP_LOCK)
+            return await transaction.execute_raw(
+                f"""
+                WITH "hourly" AS (
+                    DELETE FROM "InteractionRollup"
+                    WHERE "id" IN (
+                        SELECT "id" FROM "InteractionRollup"
+                        WHERE "granularity" = '{HOUR}'::"RollupGranularity"
+                            AND "bucketStart" < $1::timestamp(3)
+                        LIMIT $2
+                        FOR UPDATE
+                    )
+                    RETURNING "source", "bucketStart", "subjectId", "action", "count"
+                )
+                INSERT INTO "InteractionRollup"
+                    ("source", "granularity", "bucketStart", "subjectId", "action", "count", "updatedAt")
+                SELECT "source", '{DAY}'::"RollupGranularity",
+                    date_trunc('day', "bucketStart"), "subjectId", "action", SUM("count"), NOW()
+                FROM "hourly"
+                GROUP BY 1, 3, 4, 5
+                ON CONFLICT ("source", "granularity", "bucketStart", "subjectId", "action")
+                DO UPDATE SET "count" = "InteractionRollup"."count" + EXCLUDED."count",
+                    "updatedAt" = NOW()
+                """,
+                cutoff,
+                COMPACT_BATCH_SIZE,
+            )
+
+    async def backfill(self, start: datetime, end: datetime) -> int:
+        """
+        Builds hourly rollups for existing raw interactions in [start, end).
+
+        This is a one-off scan for data written before rollups were maintained,
+        run with `python -m project.interaction_rollups backfill`; run it once
+        per range, as counts are added to any existing buckets. It
+        holds the same advisory lock as `compact`, so the two never interleave.
+
+        Returns:
+            int: The number of buckets written.
+        """
+        written = 0
+        async with prisma.get_client().tx(timeout=timedelta(minutes=10)) as transaction:
+            await transaction.execute_raw(ROLLUP_LOCK)
+            for source, table, subject in (
+                (DEVICE_INTERACTIONS, "DeviceInteraction", "deviceId"),
+                (CONTENT_INTERACTIONS, "ContentInteraction", "contentId"),
+            ):
+                written += await transaction.execute_raw(
+                    f"""
+                    INSERT INTO "InteractionRollup"
+                        ("source", "granularity", "bucketStart", "subjectId", "action", "count", "updatedAt")
+                    SELECT '{source}'::"RollupSource", '{HOUR}'::"RollupGranularity",
+                        date_trunc('hour', "createdAt"), "{subject}", "action"::text, COUNT(*), NOW()
+                    FROM "{table}"
+                    WHERE "createdAt" >= $1::timestamp(3) AND "createdAt" < $2::timestamp(3)
+                    GROUP BY 3, 4, 5
+                    ON CONFLICT ("source", "granularity", "bucketStart", "subjectId", "action")
+                    DO UPDATE SET "count" = "InteractionRollup"."count" + EXCLUDED."count",
+                        "updatedAt" = NOW()
+                    """,
+                    as_utc(start),
+                    as_utc(end),
+                )
+        return written
+
+    async def _run_flush(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush interaction rollups")
+
+    async def _run_compact(self) -> None:
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                while await self.compact():
+                    pass
+            except Exception:
+                logger.exception("Failed to compact interaction rollups")
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._run_flush()),
+            asyncio.create_task(self._run_compact()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to flush interaction rollups on shutdown")
+
+
+interaction_rollups = InteractionRollups()
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintains interaction rollups.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser(
+        "backfill", help="Count the raw interactions in [start, end) into hourly rollups."
+    )
+    backfill.add_argument("--start", type=datetime.fromisoformat, required=True)
+    backfill.add_argument("--end", type=datetime.fromisoformat, required=True)
+    backfill.add_argument(
+        "--step-days",
+        type=int,
+        default=1,
+        help="Days backfilled per transaction, to keep each one short.",
+    )
+    args = parser.parse_args(argv)
+
+    start, end = as_utc(args.start), as_utc(args.end)
+    if end <= start:
+        parser.error("--end must be after --start")
+    client = Prisma(auto_register=True)
+    await client.connect()
+    try:
+        while start < end:
+            until = min(start + timedelta(days=args.step_days), end)
+            written = await interaction_rollups.backfill(start, until)
+            print(f"{start.isoformat()} .. {until.isoformat()}: {written} buckets")
+            start = until
+    finally:
+        await client.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
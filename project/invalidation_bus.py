@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "none")
+
+INVALIDATION_BUS_PATH = os.getenv("INVALIDATION_BUS_PATH", "/tmp/k4-invalidation")
+
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "k4_invalidation")
+
+INVALIDATION_PEER_RESCAN_SECONDS = float(
+    os.getenv("INVALIDATION_PEER_RESCAN_SECONDS", "30")
+)
+
+JOIN_PREFIX = b"\0join:"
+
+CONTENT_TOPIC = "content"
+
+UI_SETTINGS_TOPIC = "ui_settings"
+
+USER_PERMISSIONS_TOPIC = "user_permissions"
+
+POLICY_TOPIC = "policy"
+
+ARCHIVE_TOPIC = "archive"
+
+Handler = Callable[[str], None]
+
+
+class InvalidationBackend:
+    """
+    Transport delivering encoded invalidation messages to the other workers.
+    """
+
+    async def start(self, deliver: Callable[[bytes], None]) -> None:
+        pass
+
+    async def send(self, message: bytes) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class UnixSocketBackend(InvalidationBackend):
+    """
+    Single-host transport over Unix datagram sockets.
+
+    Every worker binds one socket in a shared directory and sends each message
+    to all the other sockets it knows of. The directory is only listed at
+    start-up and every `rescan_interval` seconds; a starting worker announces
+    its socket to the existing ones so they pick it up immediately. Sockets
+    left behind by dead workers are removed the first time a send to them fails.
+    """
+
+    def __init__(
+        self,
+        directory: str = INVALIDATION_BUS_PATH,
+        rescan_interval: float = INVALIDATION_PEER_RESCAN_SECONDS,
+    ) -> None:
+        self.directory = directory
+        self.rescan_interval = rescan_interval
+        self.path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self.peers: Set[str] = set()
+        self._scanned = 0.0
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._sender: Optional[socket.socket] = None
+
+    def _scan(self) -> None:
+        self.peers = {
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".sock")
+        }
+        self.peers.discard(self.path)
+        self._scanned = time.monotonic()
+
+    def _received(self, data: bytes, deliver: Callable[[bytes], None]) -> None:
+        if data.startswith(JOIN_PREFIX):
+            peer = data[len(JOIN_PREFIX) :].decode()
+            if os.path.dirname(peer) == self.directory and peer != self.path:
+                self.peers.add(peer)
+            return
+        deliver(data)
+
+    async def start(self, deliver: Callable[[bytes], None]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        backend = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data: bytes, addr) -> None:
+                backend._received(data, deliver)
+
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            Protocol, local_addr=self.path, family=socket.AF_UNIX
+        )
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        await asyncio.to_thread(self._scan)
+        await self.send(JOIN_PREFIX + self.path.encode())
+
+    async def send(self, message: bytes) -> None:
+        if self._sender is None:
+            return
+        if time.monotonic() - self._scanned > self.rescan_interval:
+            await asyncio.to_thread(self._scan)
+        for peer in list(self.peers):
+            try:
+                self._sender.sendto(message, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self.peers.discard(peer)
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                logger.warning("Invalidation socket %s is full, dropping message", peer)
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class PostgresNotifyBackend(InvalidationBackend):
+    """
+    Multi-host transport over Postgres LISTEN/NOTIFY.
+
+    Prisma cannot LISTEN, so this backend keeps one dedicated asyncpg
+    connection per worker. A connection runs one query at a time, so sends are
+    serialised with a lock.
+    """
+
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        channel: str = INVALIDATION_CHANNEL,
+    ) -> None:
+        self.dsn = dsn or os.getenv("DATABASE_URL", "")
+        self.channel = channel
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    async def start(self, deliver: Callable[[bytes], None]) -> None:
+        try:
+            import asyncpg
+        except ImportError as e:
+            raise RuntimeError(
+                "INVALIDATION_BUS=postgres requires the asyncpg package"
+            ) from e
+        self._connection = await asyncpg.connect(self.dsn)
+        await self._connection.add_listener(
+            self.channel, lambda connection, pid, channel, payload: deliver(payload.encode())
+        )
+
+    async def send(self, message: bytes) -> None:
+        async with self._lock:
+            if self._connection is not None:
+                await self._connection.execute(
+                    "SELECT pg_notify($1, $2)", self.channel, message.decode()
+                )
+
+    async def stop(self) -> None:
+        async with self._lock:
+            if self._connection is not None:
+                await self._connection.close()
+                self._connection = None
+
+
+class InvalidationBus:
+    """
+    Propagates keyed cache invalidations between the workers of a deployment.
+
+    Writers call `publish(topic, key)` after committing. The local caches were
+    already updated by the writer itself, so the message is only applied by the
+    other workers, each of which runs the handlers subscribed to the topic.
+
+    Args:
+        backend (InvalidationBackend): The transport; the default delivers nothing, for single-worker deployments.
+    """
+
+    def __init__(self, backend: Optional[InvalidationBackend] = None) -> None:
+        self.backend = backend or InvalidationBackend()
+        self.origin = uuid.uuid4().hex
+        self.handlers: Dict[str, List[Handler]] = {}
+        self.received = 0
+        self._pending: "set[asyncio.Task]" = set()
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self.handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, key: str) -> None:
+        """
+        Announces that the cached data of `key` under `topic` changed.
+        """
+        message = json.dumps({"o": self.origin, "t": topic, "k": key}).encode()
+        try:
+            task = asyncio.get_running_loop().create_task(self.backend.send(message))
+        except RuntimeError:
+            return
+        self._pending.add(task)
+        task.add_done_callback(self._sent)
+
+    def _sent(self, task: "asyncio.Task") -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to publish invalidation", exc_info=task.exception())
+
+    def deliver(self, message: bytes) -> None:
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation message")
+            return
+        if payload.get("o") == self.origin:
+            return
+        self.received += 1
+        for handler in self.handlers.get(payload.get("t"), ()):
+            try:
+                handler(payload.get("k"))
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", payload.get("t"))
+
+    async def start(self) -> None:
+        await self.backend.start(self.deliver)
+
+    async def stop(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        await self.backend.stop()
+
+
+def backend_from_env() -> InvalidationBackend:
+    if INVALIDATION_BUS == "unix":
+        return UnixSocketBackend()
+    if INVALIDATION_BUS == "postgres":
+        return PostgresNotifyBackend()
+    return InvalidationBackend()
+
+
+invalidation_bus = InvalidationBus(backend_from_env())
@@ -0,0 +1,50 @@
+import time
+from typing import Any
+
+from project.metrics import record_query
+from prisma import Prisma
+from prisma.client import Batch
+
+
+class MeteredBatch(Batch):
+    """
+    A batch recorded as one query when it is committed, since it is sent as one round trip.
+    """
+
+    async def commit(self) -> None:
+        started = time.perf_counter()
+        try:
+            await super().commit()
+        finally:
+            record_query(time.perf_counter() - started, "batch", "commit")
+
+
+class MeteredPrisma(Prisma):
+    """
+    Prisma client timing and counting every call it sends to the query engine.
+
+    Each call is recorded in `db_query_latency` and charged to the request being
+    handled, if any, through `current_request_stats`. The generated client
+    declares `__slots__`, so its methods cannot be replaced on an instance;
+    they are overridden here instead. Batches bypass `_execute` and are
+    recorded once per commit under the "batch" model. Transaction clients are
+    made by `_copy()`, which instantiates the client's own class, so they are
+    metered too.
+    """
+
+    __slots__ = ()
+
+    async def _execute(self, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await super()._execute(**kwargs)
+        finally:
+            model = kwargs.get("model")
+            record_query(
+                time.perf_counter() - started,
+                getattr(model, "__name__", "raw") if model else "raw",
+                str(kwargs.get("method", "unknown")),
+            )
+
+    def batch_(self) -> MeteredBatch:
+        return MeteredBatch(client=self)
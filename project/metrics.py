@@ -0,0 +1,278 @@
+import contextvars
+import logging
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram keyed by label values.
+
+    Observations only touch a list slot and two floats, so recording stays cheap
+    on the request path; cumulative counts are computed when rendering.
+    """
+
+    def __init__(
+        self, name: str, help: str, labelnames: Tuple[str, ...], buckets: Iterable[float]
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            # One slot per bucket, one for +Inf, then sum and count.
+            series = self._series[labelvalues] = [0.0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labelvalues, series in sorted(self._series.items()):
+            labels = tuple(zip(self.labelnames, labelvalues))
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{format_labels(labels, ('le', repr(float(bound))))} {cumulative:g}"
+                )
+            cumulative += series[len(self.buckets)]
+            lines.append(
+                f"{self.name}_bucket{format_labels(labels, ('le', '+Inf'))} {cumulative:g}"
+            )
+            lines.append(f"{self.name}_sum{format_labels(labels)} {series[-2]:g}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {series[-1]:g}")
+        return lines
+
+
+class Counter:
+    """
+    Prometheus-style monotonically increasing counter keyed by label values.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...]) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, *labelvalues: str) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(self._values.items()):
+            labels = tuple(zip(self.labelnames, labelvalues))
+            lines.append(f"{self.name}{format_labels(labels)} {value:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric of the process and renders them in Prometheus text format.
+
+    Besides histograms and counters, subsystems may register collectors:
+    callables returning the current (labels, value) pairs of a gauge, or of a
+    counter they already keep themselves, at scrape time.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[object] = []
+        self._collectors: List[
+            Tuple[str, str, str, Callable[[], Iterable[Tuple[Labels, float]]]]
+        ] = []
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...],
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...]) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+    ) -> None:
+        self._collectors.append(("gauge", name, help, collect))
+
+    def counter_collector(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+    ) -> None:
+        """
+        Registers a counter whose values are kept, and only ever increased, by the caller.
+        """
+        self._collectors.append(("counter", name, help, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())  # type: ignore[attr-defined]
+        for kind, name, help, collect in self._collectors:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            try:
+                for labels, value in collect():
+                    lines.append(f"{name}{format_labels(labels)} {value:g}")
+            except Exception:
+                logger.exception("Failed to collect %s %s", kind, name)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route, method and status code.",
+    ("route", "method", "status"),
+)
+
+request_queries = registry.histogram(
+    "http_request_db_queries",
+    "Number of Prisma queries issued per HTTP request.",
+    ("route", "method"),
+    QUERY_COUNT_BUCKETS,
+)
+
+request_query_seconds = registry.histogram(
+    "http_request_db_query_seconds",
+    "Total time spent in Prisma queries per HTTP request.",
+    ("route", "method"),
+)
+
+db_query_latency = registry.histogram(
+    "db_query_duration_seconds",
+    "Latency of individual Prisma client calls by model and action.",
+    ("model", "action"),
+)
+
+
+class RequestStats:
+    """
+    Prisma query accounting for the request currently being handled.
+    """
+
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+current_request_stats: contextvars.ContextVar[Optional[RequestStats]] = (
+    contextvars.ContextVar("current_request_stats", default=None)
+)
+
+
+def record_query(elapsed: float, model: str, action: str) -> None:
+    db_query_latency.observe(elapsed, model, action)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and Prisma query usage per route.
+
+    Requests are labelled with the matched route template rather than the raw
+    path, so `/content/{kioskId}` is a single series however many kiosks poll.
+    Paths that do not match any route are grouped under "unmatched".
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._route_paths: Dict[Callable, str] = {}
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            path = "unmatched"
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            self._route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = "500"
+        started = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request_stats.reset(token)
+            route = self._route_label(scope)
+            method = scope["method"]
+            request_latency.observe(elapsed, route, method, status)
+            request_queries.observe(stats.queries, route, method)
+            request_query_seconds.observe(stats.query_seconds, route, method)
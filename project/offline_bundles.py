@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from project.content_schedule_index import KioskSchedule
+from project.fast_json import dumps
+
+BUNDLE_COMPRESSION_LEVEL = 6
+
+BUNDLE_STORE_MAX_BUNDLES = int(os.getenv("BUNDLE_STORE_MAX_BUNDLES", "5000"))
+
+BundleKey = Tuple[str, Optional[str]]
+
+
+def content_hash(encoded: bytes) -> str:
+    """
+    Returns the content address of an encoded blob.
+    """
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class CompiledBundle:
+    """
+    A kiosk's offline bundle: the manifest plus the addresses of the blobs it references.
+    """
+
+    def __init__(self, revision: int, settings_hash: Optional[str], manifest: dict) -> None:
+        self.revision = revision
+        self.settings_hash = settings_hash
+        self.manifest = manifest
+        self.hashes: Set[str] = {item["hash"] for item in manifest["items"]}
+        if settings_hash:
+            self.hashes.add(settings_hash)
+        self.encoded_manifest = dumps(manifest)
+        self.etag = f'"{manifest["version"]}"'
+        self.archive: Optional[bytes] = None
+
+
+class BundleStore:
+    """
+    Content-addressed store of compressed blobs and per-kiosk bundle manifests.
+
+    Every content item and settings document is stored once, gzip compressed,
+    under the SHA-256 of its JSON encoding; identical items on many kiosks share
+    one blob. A kiosk's bundle is only recompiled when its schedule revision or
+    its settings change, and only items not already stored are compressed.
+    Blobs are reference counted and dropped when no bundle uses them anymore.
+
+    At most `max_bundles` (kiosk, user) bundles are kept, least recently used
+    first out. The store is local to the process: a blob missing here, because
+    another instance compiled the bundle or it was evicted, is rebuilt by
+    recompiling the bundle that references it.
+    """
+
+    def __init__(
+        self,
+        compression_level: int = BUNDLE_COMPRESSION_LEVEL,
+        max_bundles: int = BUNDLE_STORE_MAX_BUNDLES,
+    ) -> None:
+        self.compression_level = compression_level
+        self.max_bundles = max_bundles
+        self.blobs: Dict[str, bytes] = {}
+        self._refs: Dict[str, int] = {}
+        self._bundles: "OrderedDict[BundleKey, CompiledBundle]" = OrderedDict()
+        self.compiles = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._bundles)
+
+    def _put(self, encoded: bytes) -> str:
+        digest = content_hash(encoded)
+        if digest not in self.blobs:
+            self.blobs[digest] = gzip.compress(encoded, self.compression_level)
+        return digest
+
+    def _retain(self, hashes: Set[str]) -> None:
+        for digest in hashes:
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+
+    def _release(self, hashes: Set[str]) -> None:
+        for digest in hashes:
+            remaining = self._refs.get(digest, 0) - 1
+            if remaining > 0:
+                self._refs[digest] = remaining
+            else:
+                self._refs.pop(digest, None)
+                self.blobs.pop(digest, None)
+
+    def compile(
+        self,
+        kioskId: str,
+        schedule: KioskSchedule,
+        settings: Optional[bytes] = None,
+        userId: Optional[str] = None,
+    ) -> CompiledBundle:
+        """
+        Returns the bundle of a kiosk, recompiling it only if its inputs changed.
+
+        Args:
+            kioskId (str): The kiosk the bundle is for.
+            schedule (KioskSchedule): The kiosk's full schedule, including future items.
+            settings (Optional[bytes]): The encoded UI settings to ship with the bundle.
+            userId (Optional[str]): The user whose settings are included.
+
+        Returns:
+            CompiledBundle: The current bundle.
+        """
+        settings_hash = content_hash(settings) if settings is not None else None
+        key = (kioskId, userId)
+        bundle = self._bundles.get(key)
+        if (
+            bundle is not None
+            and bundle.revision == schedule.revision
+            and bundle.settings_hash == settings_hash
+        ):
+            self._bundles.move_to_end(key)
+            return bundle
+        self.compiles += 1
+        items: List[dict] = []
+        for scheduled, encoded, entry in zip(
+            schedule.times, schedule.encoded, schedule.entries
+        ):
+            items.append(
+                {
+                    "title": entry.title,
+                    "scheduledTime": scheduled,
+                    "endTime": entry.endTime,
+                    "hash": self._put(encoded),
+                }
+            )
+        if settings is not None:
+            self._put(settings)
+        version = hashlib.sha256(
+            dumps({"items": [item["hash"] for item in items], "settings": settings_hash})
+        ).hexdigest()
+        manifest = {
+            "kioskId": kioskId,
+            "version": version,
+            "items": items,
+            "settingsHash": settings_hash,
+        }
+        compiled = CompiledBundle(schedule.revision, settings_hash, manifest)
+        self._retain(compiled.hashes)
+        if bundle is not None:
+            self._release(bundle.hashes)
+        self._bundles[key] = compiled
+        self._bundles.move_to_end(key)
+        while len(self._bundles) > self.max_bundles:
+            _, evicted = self._bundles.popitem(last=False)
+            self._release(evicted.hashes)
+            self.evictions += 1
+        return compiled
+
+    def archive(self, bundle: CompiledBundle) -> bytes:
+        """
+        Returns the whole bundle, manifest and blobs, as one gzip compressed JSON document.
+        """
+        if bundle.archive is None:
+            blobs = b",".join(
+                b'"' + digest.encode() + b'":' + gzip.decompress(self.blobs[digest])
+                for digest in sorted(bundle.hashes)
+            )
+            bundle.archive = gzip.compress(
+                b'{"manifest":'
+                + bundle.encoded_manifest
+                + b',"blobs":{'
+                + blobs
+                + b"}}",
+                self.compression_level,
+            )
+        return bundle.archive
+
+
+bundle_store = BundleStore()
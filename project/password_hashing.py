@@ -0,0 +1,80 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "2"))
+
+HASHING_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASHING_QUEUE_LIMIT", "64"))
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusyError(Exception):
+    """
+    Raised when too many password operations are already waiting for a worker.
+    """
+
+    def __init__(self, retry_after: int = 1) -> None:
+        super().__init__("Too many concurrent login attempts, please retry shortly.")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, size-limited thread pool.
+
+    bcrypt releases the GIL, so verifications run in parallel with the event
+    loop instead of stalling every other route on the worker. At most
+    `queue_limit` operations may be admitted (running or waiting); anything
+    beyond that is rejected immediately with `PasswordHasherBusyError`.
+
+    Args:
+        workers (int): The number of threads doing bcrypt work.
+        queue_limit (int): The maximum number of admitted operations.
+    """
+
+    def __init__(
+        self, workers: int = HASHING_WORKERS, queue_limit: int = HASHING_QUEUE_LIMIT
+    ) -> None:
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.rejected_total = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+
+    async def _submit(self, fn: Callable[..., T], *args: str) -> T:
+        if self.in_flight >= self.queue_limit:
+            self.rejected_total += 1
+            raise PasswordHasherBusyError()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verifies a password against its bcrypt hash without blocking the event loop.
+        """
+        return await self._submit(pwd_context.verify, plain_password, hashed_password)
+
+    async def hash(self, plain_password: str) -> str:
+        """
+        Hashes a password without blocking the event loop.
+        """
+        return await self._submit(pwd_context.hash, plain_password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
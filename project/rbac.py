@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import prisma
+import prisma.models
+from fastapi import Depends, HTTPException
+from project.sessions import Session, get_current_session
+from project.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+POLICY_SUBJECTS_MAX = int(os.getenv("POLICY_SUBJECTS_MAX", "10000"))
+
+POLICY_SUBJECT_TTL_SECONDS = float(os.getenv("POLICY_SUBJECT_TTL_SECONDS", "30"))
+
+# Key of the `RolePolicy` row recording that the policy lives in `RolePermission`.
+POLICY_ID = 1
+
+ROLES = ("MunicipalAdmin", "Technician", "Citizen")
+
+PERMISSIONS = (
+    "ViewContent",
+    "ManageContent",
+    "ManageUiSettings",
+    "ViewAuditLogs",
+    "ViewAnalytics",
+    "ManageDevices",
+    "ManageUsers",
+    "IngestTelemetry",
+)
+
+PERMISSION_BITS: Dict[str, int] = {
+    permission: 1 << bit for bit, permission in enumerate(PERMISSIONS)
+}
+
+DEFAULT_POLICY: Dict[str, Tuple[str, ...]] = {
+    "MunicipalAdmin": PERMISSIONS,
+    "Technician": (
+        "ViewContent",
+        "ManageContent",
+        "ViewAuditLogs",
+        "ViewAnalytics",
+        "ManageDevices",
+        "IngestTelemetry",
+    ),
+    "Citizen": ("ViewContent", "ManageUiSettings"),
+}
+
+
+def permission_mask(permissions: Iterable[str]) -> int:
+    """
+    Folds permission names into a bitset.
+
+    Raises:
+        ValueError: If a name is not a known permission.
+    """
+    mask = 0
+    for permission in permissions:
+        try:
+            mask |= PERMISSION_BITS[permission]
+        except KeyError:
+            raise ValueError(f"Unknown permission: {permission}") from None
+    return mask
+
+
+def permission_names(mask: int) -> List[str]:
+    return [permission for permission in PERMISSIONS if mask & PERMISSION_BITS[permission]]
+
+
+class CompiledPolicy:
+    """
+    An immutable role to permission bitset table.
+
+    A new table is compiled for every policy change and swapped in with a single
+    assignment, so a check sees either the old policy or the new one, never a
+    mix of both.
+    """
+
+    __slots__ = ("role_masks", "version")
+
+    def __init__(self, policy: Mapping[str, Iterable[str]], version: int) -> None:
+        self.role_masks: Dict[str, int] = {role: 0 for role in ROLES}
+        for role, permissions in policy.items():
+            if role not in self.role_masks:
+                raise ValueError(f"Unknown role: {role}")
+            self.role_masks[role] = permission_mask(permissions)
+        self.version = version
+
+    def as_dict(self) -> Dict[str, List[str]]:
+        return {role: permission_names(mask) for role, mask in self.role_masks.items()}
+
+
+class PolicyEngine:
+    """
+    Answers "may this subject do that" from memory.
+
+    The role policy is read from `RolePermission` rows, or is `DEFAULT_POLICY`
+    until the first change materialises it (recorded by the `RolePolicy` row,
+    so a policy granting nothing is not mistaken for the default), and is
+    compiled into one bitset per role. Each user's role and explicitly granted
+    permissions are read on their first check and kept for `subject_ttl`
+    seconds, or until an invalidation for that user arrives, so a check is
+    usually a dictionary lookup and a bitwise and. The expiry bounds how long
+    a change missed by the invalidation bus can go unnoticed.
+    """
+
+    def __init__(
+        self,
+        max_subjects: int = POLICY_SUBJECTS_MAX,
+        subject_ttl: float = POLICY_SUBJECT_TTL_SECONDS,
+    ) -> None:
+        self.policy = CompiledPolicy(DEFAULT_POLICY, 0)
+        self.subjects: TTLCache[str, Tuple[str, str, int]] = TTLCache(
+            max_subjects, subject_ttl
+        )
+        self._by_user: Dict[str, str] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    async def load(self) -> CompiledPolicy:
+        """
+        Compiles the policy stored in the database and makes it current.
+        """
+        materialised = await prisma.models.RolePolicy.prisma().find_unique(
+            where={"id": POLICY_ID}
+        )
+        rows = await prisma.models.RolePermission.prisma().find_many()
+        # Rows without the marker were stored before it existed.
+        if materialised is not None or rows:
+            policy: Dict[str, List[str]] = {}
+            for row in rows:
+                policy.setdefault(str(getattr(row.role, "value", row.role)), []).append(
+                    str(getattr(row.permission, "value", row.permission))
+                )
+        else:
+            policy = dict(DEFAULT_POLICY)
+        self.policy = CompiledPolicy(policy, self.policy.version + 1)
+        return self.policy
+
+    def reload(self, _key: Optional[str] = None) -> None:
+        """
+        Recompiles the policy in the background after another worker changed it.
+
+        Checks keep using the previous policy until the new one is swapped in.
+        """
+        task = asyncio.get_running_loop().create_task(self._reload())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reload(self) -> None:
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Failed to reload the permission policy")
+
+    def remember(self, user: prisma.models.User) -> Tuple[str, str, int]:
+        """
+        Caches the role and grants of a user, e.g. right after they were written.
+        """
+        self.forget(user.id)
+        grants = permission_mask(
+            str(getattr(permission, "value", permission))
+            for permission in (user.permissions or [])
+        )
+        entry = (user.id, str(getattr(user.role, "value", user.role)), grants)
+        self.subjects.put(user.email, entry)
+        self._by_user[user.id] = user.email
+        return entry
+
+    def forget(self, userId: str) -> None:
+        """
+        Drops the cached role and grants of a user. Used as an invalidation handler.
+        """
+        subject = self._by_user.pop(userId, None)
+        if subject is not None:
+            self.subjects.invalidate(subject)
+
+    def mask(self, role: str, grants: int = 0) -> int:
+        return self.policy.role_masks.get(role, 0) | grants
+
+    async def subject_mask(self, subject: str) -> int:
+        """
+        Returns the effective permission bitset of a session subject (the user's email).
+        """
+        entry = self.subjects.get(subject)
+        if entry is None:
+            user = await prisma.models.User.prisma().find_unique(
+                where={"email": subject}
+            )
+            if user is None:
+                return 0
+            entry = self.remember(user)
+        return self.mask(entry[1], entry[2])
+
+    async def allows(self, subject: str, permission: str) -> bool:
+        return bool(await self.subject_mask(subject) & PERMISSION_BITS[permission])
+
+    async def start(self) -> None:
+        await self.load()
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+policy_engine = PolicyEngine()
+
+
+def require_permission(permission: str) -> Callable[..., Awaitable[Session]]:
+    """
+    Builds a FastAPI dependency admitting only sessions whose user holds `permission`.
+
+    Args:
+        permission (str): One of `PERMISSIONS`.
+
+    Returns:
+        Callable[..., Awaitable[Session]]: The dependency, resolving to the caller's session.
+    """
+    if permission not in PERMISSION_BITS:
+        raise ValueError(f"Unknown permission: {permission}")
+
+    async def guard(session: Session = Depends(get_current_session)) -> Session:
+        if not await policy_engine.allows(session.subject, permission):
+            raise HTTPException(status_code=403, detail=f"Requires {permission}.")
+        return session
+
+    return guard
@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from project.content_events import content_events
+from project.content_schedule_index import KioskSchedule
+from project.fast_json import dumps
+from project.get_content_service import ContentDetails, schedule_index
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_MAX_SLEEP_SECONDS = float(os.getenv("SCHEDULE_MAX_SLEEP_SECONDS", "300"))
+
+PLAYLIST_EVENT = "playlist"
+
+
+class ScheduleEngine:
+    """
+    Flips each kiosk's playlist at the exact moment content starts or ends.
+
+    A heap holds the next transition of every loaded kiosk schedule, and a
+    single loop timer is armed for the earliest one. When it fires, the
+    snapshot and ETag of each due kiosk are rebuilt right away, so the next
+    poll is served warm, and kiosks connected to the event stream receive the
+    new playlist without polling. Heap entries are superseded rather than
+    removed: ``_next`` records the transition each kiosk is waiting for, and
+    popped entries that no longer match it are skipped.
+
+    The timer never sleeps longer than ``max_sleep`` seconds, so a wall-clock
+    adjustment is picked up within that bound.
+
+    Content events are only delivered to the streams of the worker that
+    published them. ``refresh`` is subscribed to content invalidations from the
+    other workers, and sends the reloaded playlist to the kiosks connected here.
+    """
+
+    def __init__(self, max_sleep: float = SCHEDULE_MAX_SLEEP_SECONDS) -> None:
+        self.max_sleep = max_sleep
+        self.flips = 0
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._next: Dict[str, datetime] = {}
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._armed_for: Optional[datetime] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = False
+        schedule_index.on_change(self.reschedule)
+
+    def __len__(self) -> int:
+        return len(self._next)
+
+    def reschedule(
+        self, kioskId: str, schedule: KioskSchedule[ContentDetails]
+    ) -> None:
+        """
+        Records the next transition of a kiosk after its schedule was loaded or changed.
+        """
+        upcoming = schedule.next_transition(datetime.now(timezone.utc))
+        if upcoming is None:
+            self._next.pop(kioskId, None)
+            return
+        if self._next.get(kioskId) == upcoming:
+            return
+        self._next[kioskId] = upcoming
+        heapq.heappush(self._heap, (upcoming, next(self._sequence), kioskId))
+        if self._running and (self._armed_for is None or upcoming < self._armed_for):
+            self._arm()
+
+    def _arm(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._armed_for = None
+        while self._heap and self._next.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return
+        when = self._heap[0][0]
+        delay = (when - datetime.now(timezone.utc)).total_seconds()
+        self._timer = asyncio.get_running_loop().call_later(
+            min(max(0.0, delay), self.max_sleep), self._fire
+        )
+        self._armed_for = when
+
+    def _fire(self) -> None:
+        self._timer = None
+        self._armed_for = None
+        now = datetime.now(timezone.utc)
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, kioskId = heapq.heappop(self._heap)
+            if self._next.get(kioskId) == when:
+                del self._next[kioskId]
+                due.append(kioskId)
+        for kioskId in due:
+            schedule = schedule_index.peek(kioskId)
+            if schedule is not None:
+                self._flip(kioskId, schedule, now)
+            elif content_events.subscriber_count(kioskId):
+                # The schedule was invalidated; reload it for the kiosks listening.
+                self._spawn_reload(kioskId)
+        self._arm()
+
+    def refresh(self, kioskId: str) -> None:
+        """
+        Sends the current playlist to the local streams of a kiosk whose content
+        was changed by another worker.
+        """
+        if content_events.subscriber_count(kioskId):
+            self._spawn_reload(kioskId)
+
+    def _spawn_reload(self, kioskId: str) -> None:
+        task = asyncio.get_running_loop().create_task(self._reload(kioskId))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reload(self, kioskId: str) -> None:
+        try:
+            schedule = await schedule_index.get_schedule(kioskId)
+        except Exception:
+            logger.exception("Failed to reload the schedule of kiosk %s", kioskId)
+            return
+        self._flip(kioskId, schedule, datetime.now(timezone.utc))
+
+    def _flip(
+        self, kioskId: str, schedule: KioskSchedule[ContentDetails], now: datetime
+    ) -> None:
+        self.flips += 1
+        etag = schedule.etag(now)
+        content_list = schedule.snapshot(now)
+        if content_events.subscriber_count(kioskId):
+            content_events.publish(
+                kioskId,
+                PLAYLIST_EVENT,
+                (
+                    b'{"contentList":'
+                    + content_list
+                    + b',"etag":'
+                    + dumps(etag)
+                    + b',"cursor":'
+                    + dumps(now)
+                    + b"}"
+                ).decode(),
+            )
+        self.reschedule(kioskId, schedule)
+
+    async def start(self) -> None:
+        self._running = True
+        self._arm()
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._armed_for = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+schedule_engine = ScheduleEngine()
@@ -1,30 +1,88 @@
 import logging
 from contextlib import asynccontextmanager
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
 
+import project.bulk_update_content_service
+import project.device_heartbeat_service
 import project.get_content_service
+import project.get_interaction_analytics_service
+import project.get_offline_bundle_service
 import project.get_security_audit_logs_service
 import project.get_ui_settings_service
+import project.ingest_telemetry_service
 import project.update_content_service
 import project.update_ui_settings_service
 import project.update_user_permissions_service
 import project.user_login_service
 import project.user_logout_service
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import Response
-from prisma import Prisma
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from project.compression import CompressionMiddleware, compressed_cache, precompressed
+from project.concurrency_limit import ConcurrencyLimitMiddleware, concurrency_limiter
+from project.content_events import content_events
+from project.device_fleet import device_fleet
+from project.fast_json import dumps
+from project.http_caching import matched_etag, variant_etag
+from project.interaction_archive import interaction_archive
+from project.interaction_rollups import interaction_rollups
+from project.invalidation_bus import (
+    ARCHIVE_TOPIC,
+    CONTENT_TOPIC,
+    POLICY_TOPIC,
+    UI_SETTINGS_TOPIC,
+    USER_PERMISSIONS_TOPIC,
+    invalidation_bus,
+)
+from project.metered_client import MeteredPrisma
+from project.metrics import MetricsMiddleware, registry
+from project.offline_bundles import bundle_store
+from project.password_hashing import PasswordHasherBusyError, password_hasher
+from project.rbac import policy_engine, require_permission
+from project.schedule_engine import schedule_engine
+from project.sessions import (
+    Session,
+    get_current_session,
+    revocation_list,
+    token_sweeper,
+)
+from project.single_flight import request_flights
+from project.startup import response_model_warmup, startup
+from project.telemetry_ingest import TelemetryQueueFullError, telemetry_queue
 
 logger = logging.getLogger(__name__)
 
-db_client = Prisma(auto_register=True)
+db_client = MeteredPrisma(auto_register=True)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await db_client.connect()
+    startup.begin()
+    await startup.timed("db.connect", db_client.connect())
+    await startup.timed("invalidation_bus.start", invalidation_bus.start())
+    await startup.timed("revocation_list.start", revocation_list.start())
+    await startup.timed("token_sweeper.start", token_sweeper.start())
+    await startup.timed("policy_engine.start", policy_engine.start())
+    await startup.timed("interaction_rollups.start", interaction_rollups.start())
+    await startup.timed("interaction_archive.start", interaction_archive.start())
+    await startup.timed("telemetry_queue.start", telemetry_queue.start())
+    await startup.timed("device_fleet.start", device_fleet.start())
+    await startup.timed("schedule_engine.start", schedule_engine.start())
+    startup.start_warmup()
     yield
+    await startup.stop()
+    await schedule_engine.stop()
+    await device_fleet.stop()
+    await telemetry_queue.stop()
+    await interaction_archive.stop()
+    await interaction_rollups.stop()
+    await policy_engine.stop()
+    await token_sweeper.stop()
+    await revocation_list.stop()
+    await invalidation_bus.stop()
     await db_client.disconnect()
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -34,6 +92,153 @@ app = FastAPI(
 )
 
 
+startup.add_warmup("response_models", response_model_warmup(app))
+
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ConcurrencyLimitMiddleware, limiter=concurrency_limiter)
+app.add_middleware(MetricsMiddleware)
+
+invalidation_bus.subscribe(
+    CONTENT_TOPIC, project.get_content_service.schedule_index.invalidate
+)
+invalidation_bus.subscribe(CONTENT_TOPIC, schedule_engine.refresh)
+invalidation_bus.subscribe(
+    UI_SETTINGS_TOPIC, project.get_ui_settings_service.ui_settings_cache.invalidate
+)
+invalidation_bus.subscribe(USER_PERMISSIONS_TOPIC, policy_engine.forget)
+invalidation_bus.subscribe(POLICY_TOPIC, policy_engine.reload)
+invalidation_bus.subscribe(ARCHIVE_TOPIC, interaction_archive.reload)
+
+registry.counter_collector(
+    "cache_hits_total",
+    "Hits of in-process caches.",
+    lambda: [
+        (
+            (("cache", "ui_settings"),),
+            project.get_ui_settings_service.ui_settings_cache.hits,
+        )
+    ],
+)
+registry.counter_collector(
+    "cache_misses_total",
+    "Misses of in-process caches.",
+    lambda: [
+        (
+            (("cache", "ui_settings"),),
+            project.get_ui_settings_service.ui_settings_cache.misses,
+        )
+    ],
+)
+registry.gauge(
+    "content_event_subscribers",
+    "Open server-sent event connections.",
+    lambda: [((), content_events.subscriber_count())],
+)
+registry.gauge(
+    "revoked_sessions",
+    "Unexpired tokens in the in-memory revocation list.",
+    lambda: [((), len(revocation_list))],
+)
+registry.counter_collector(
+    "expired_tokens_swept_total",
+    "Expired auth tokens deleted by this worker.",
+    lambda: [((), token_sweeper.swept)],
+)
+registry.gauge(
+    "interaction_rollup_pending_buckets",
+    "Rollup buckets with counts not yet flushed to the database.",
+    lambda: [((), len(interaction_rollups.pending))],
+)
+registry.gauge(
+    "archive_segments",
+    "Archived interaction segment files known to this worker.",
+    lambda: [((), len(interaction_archive))],
+)
+registry.counter_collector(
+    "archived_rows_total",
+    "Interaction rows moved from the database to archive segments by this worker.",
+    lambda: [((), interaction_archive.archived)],
+)
+registry.gauge(
+    "telemetry_queue_depth",
+    "Telemetry events waiting to be written.",
+    lambda: [((), len(telemetry_queue))],
+)
+registry.gauge(
+    "fleet_devices_pending_write",
+    "Devices whose heartbeat state is not yet written to the database.",
+    lambda: [((), len(device_fleet.dirty | device_fleet.expired))],
+)
+registry.gauge(
+    "schedule_engine_kiosks",
+    "Kiosks with an upcoming playlist transition.",
+    lambda: [((), len(schedule_engine))],
+)
+registry.counter_collector(
+    "schedule_engine_flips_total",
+    "Playlist transitions applied at their scheduled moment.",
+    lambda: [((), schedule_engine.flips)],
+)
+registry.gauge(
+    "rbac_cached_subjects",
+    "Users whose role and grants are cached by the policy engine.",
+    lambda: [((), len(policy_engine))],
+)
+registry.gauge(
+    "rbac_policy_version",
+    "Number of times the role policy was compiled on this worker.",
+    lambda: [((), policy_engine.policy.version)],
+)
+registry.counter_collector(
+    "invalidations_received_total",
+    "Cache invalidations received from other workers.",
+    lambda: [((), invalidation_bus.received)],
+)
+registry.gauge(
+    "concurrency_limit",
+    "Current adaptive concurrency limit.",
+    lambda: [((), concurrency_limiter.limit)],
+)
+registry.gauge(
+    "concurrency_in_flight",
+    "Requests currently admitted by the concurrency limiter.",
+    lambda: [((), concurrency_limiter.in_flight)],
+)
+registry.counter_collector(
+    "concurrency_shed_total",
+    "Requests rejected by the concurrency limiter, by priority.",
+    lambda: [
+        ((("priority", priority),), count)
+        for priority, count in concurrency_limiter.shed.items()
+    ],
+)
+registry.gauge(
+    "offline_bundles",
+    "Compiled offline bundles held by this worker.",
+    lambda: [((), len(bundle_store))],
+)
+registry.counter_collector(
+    "offline_bundle_evictions_total",
+    "Offline bundles evicted to keep the bundle store bounded.",
+    lambda: [((), bundle_store.evictions)],
+)
+registry.gauge(
+    "startup_phase_seconds",
+    "Duration of each start-up and warm-up phase of this worker.",
+    lambda: [((("phase", name),), seconds) for name, seconds in startup.phases.items()],
+)
+registry.gauge(
+    "ready",
+    "Whether this worker finished warming up and accepts traffic.",
+    lambda: [((), float(startup.ready))],
+)
+registry.gauge(
+    "password_hashing_in_flight",
+    "Password operations admitted to the hashing pool.",
+    lambda: [((), password_hasher.in_flight)],
+)
+
+
 @app.post("/auth/logout", response_model=project.user_logout_service.UserLogoutResponse)
 async def api_post_user_logout(
     token: str,
@@ -55,6 +260,14 @@ async def api_post_user_logout(
         )
 
 
+@app.get("/auth/session", response_model=Session)
+async def api_get_session(session: Session = Depends(get_current_session)) -> Session:
+    """
+    Validates the bearer token of the request and returns its session.
+    """
+    return session
+
+
 @app.post(
     "/content/{kioskId}/update",
     response_model=project.update_content_service.UpdateContentResponse,
@@ -66,15 +279,48 @@ async def api_post_update_content(
     contentType: str,
     scheduledTime: str,
     isActive: bool,
+    endTime: Optional[str] = None,
+    session: Session = Depends(require_permission("ManageContent")),
 ) -> project.update_content_service.UpdateContentResponse | Response:
     """
     Updates or adds new content to the schedule.
     """
     try:
         res = await project.update_content_service.update_content(
-            kioskId, title, contentBody, contentType, scheduledTime, isActive
+            kioskId, title, contentBody, contentType, scheduledTime, isActive, endTime
         )
         return res
+    except ValueError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.post(
+    "/content/bulk-import",
+    response_model=project.bulk_update_content_service.BulkUpdateContentResponse,
+)
+async def api_post_bulk_update_content(
+    items: List[project.bulk_update_content_service.ContentImportItem],
+    session: Session = Depends(require_permission("ManageContent")),
+) -> project.bulk_update_content_service.BulkUpdateContentResponse | Response:
+    """
+    Creates or updates scheduled content for many kiosks in one request.
+    """
+    try:
+        res = await project.bulk_update_content_service.bulk_update_content(items)
+        return res
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
@@ -91,7 +337,9 @@ async def api_post_update_content(
     response_model=project.update_user_permissions_service.UpdateUserPermissionsResponse,
 )
 async def api_put_update_user_permissions(
-    userId: str, newPermissions: List[str]
+    userId: str,
+    newPermissions: List[str],
+    session: Session = Depends(require_permission("ManageUsers")),
 ) -> project.update_user_permissions_service.UpdateUserPermissionsResponse | Response:
     """
     Updates user roles and permissions.
@@ -101,6 +349,92 @@ async def api_put_update_user_permissions(
             userId, newPermissions
         )
         return res
+    except ValueError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.put(
+    "/users/roles",
+    response_model=project.update_user_permissions_service.BulkUpdateUserRolesResponse,
+)
+async def api_put_bulk_update_user_roles(
+    assignments: List[project.update_user_permissions_service.UserRoleAssignment],
+    session: Session = Depends(require_permission("ManageUsers")),
+) -> project.update_user_permissions_service.BulkUpdateUserRolesResponse | Response:
+    """
+    Changes the roles of many users in one transaction.
+    """
+    try:
+        res = await project.update_user_permissions_service.bulk_update_user_roles(
+            assignments
+        )
+        return res
+    except ValueError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/policy/roles",
+    response_model=project.update_user_permissions_service.RolePolicyResponse,
+)
+async def api_get_role_policy(
+    session: Session = Depends(require_permission("ManageUsers")),
+) -> project.update_user_permissions_service.RolePolicyResponse:
+    """
+    Lists the permissions granted to every role.
+    """
+    return project.update_user_permissions_service.get_role_policy()
+
+
+@app.put(
+    "/policy/roles/{role}",
+    response_model=project.update_user_permissions_service.RolePolicyResponse,
+)
+async def api_put_role_policy(
+    role: str,
+    permissions: List[str],
+    session: Session = Depends(require_permission("ManageUsers")),
+) -> project.update_user_permissions_service.RolePolicyResponse | Response:
+    """
+    Replaces the permissions granted to a role.
+    """
+    try:
+        res = await project.update_user_permissions_service.update_role_policy(
+            role, permissions
+        )
+        return res
+    except ValueError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
@@ -117,7 +451,11 @@ async def api_put_update_user_permissions(
     response_model=project.update_ui_settings_service.UpdateUserUISettingsResponse,
 )
 async def api_put_update_ui_settings(
-    userId: str, theme: str, layout: str, language: str
+    userId: str,
+    theme: str,
+    layout: str,
+    language: str,
+    session: Session = Depends(require_permission("ManageUiSettings")),
 ) -> project.update_ui_settings_service.UpdateUserUISettingsResponse | Response:
     """
     Updates the UI settings based on user preferences.
@@ -148,6 +486,13 @@ async def api_post_user_login(
     try:
         res = await project.user_login_service.user_login(username, password)
         return res
+    except PasswordHasherBusyError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            media_type="application/json",
+        )
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
@@ -187,13 +532,44 @@ async def api_get_get_ui_settings(
     "/security/audit-logs",
     response_model=project.get_security_audit_logs_service.GetSecurityAuditLogsResponse,
 )
-async def api_get_get_security_audit_logs() -> project.get_security_audit_logs_service.GetSecurityAuditLogsResponse | Response:
+async def api_get_get_security_audit_logs(
+    cursor: Optional[str] = None,
+    limit: int = project.get_security_audit_logs_service.DEFAULT_PAGE_SIZE,
+    deviceId: Optional[str] = None,
+    userId: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: Literal["json", "ndjson", "csv"] = "json",
+    session: Session = Depends(require_permission("ViewAuditLogs")),
+) -> project.get_security_audit_logs_service.GetSecurityAuditLogsResponse | Response:
     """
-    Retrieves a log of all security-related activities.
+    Retrieves a log of security-related activities.
+
+    Returns one keyset-paginated page as JSON, or streams every matching entry when
+    `format` is "ndjson" or "csv".
     """
     try:
-        res = await project.get_security_audit_logs_service.get_security_audit_logs()
-        return res
+        project.get_security_audit_logs_service.validate_action(action)
+        if format != "json":
+            return StreamingResponse(
+                project.get_security_audit_logs_service.export_security_audit_logs(
+                    format, deviceId, userId, action, start, end
+                ),
+                media_type="text/csv" if format == "csv" else "application/x-ndjson",
+            )
+        body = (
+            await project.get_security_audit_logs_service.get_security_audit_logs_json(
+                cursor, limit, deviceId, userId, action, start, end
+            )
+        )
+        return Response(content=body, media_type="application/json")
+    except project.get_security_audit_logs_service.InvalidAuditLogQueryError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
@@ -210,13 +586,138 @@ async def api_get_get_security_audit_logs() -> project.get_security_audit_logs_s
 )
 async def api_get_get_content(
     kioskId: str,
+    response: Response,
+    since: Optional[datetime] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
 ) -> project.get_content_service.GetContentResponse | Response:
     """
     Retrieves scheduled content for a specific kiosk.
+
+    Answers 304 when the kiosk's If-None-Match matches the current ETag, and only
+    the changes since the cursor when `since` is given. Full snapshots are sent
+    in a compressed variant cached per ETag. Deltas carry no ETag and must not
+    be stored, since they are not the full representation the ETag names.
+    """
+    try:
+        if since is None:
+            etag, body = await project.get_content_service.get_content_snapshot(
+                kioskId
+            )
+            held = matched_etag(if_none_match, etag)
+            if held is not None:
+                return Response(status_code=304, headers={"ETag": held})
+            body, headers = precompressed(
+                ("content", kioskId, etag), body, accept_encoding
+            )
+            return Response(
+                content=body,
+                media_type="application/json",
+                headers={
+                    "ETag": variant_etag(etag, headers.get("Content-Encoding")),
+                    **headers,
+                },
+            )
+        etag = await project.get_content_service.get_content_etag(kioskId)
+        held = matched_etag(if_none_match, etag)
+        if held is not None:
+            return Response(status_code=304, headers={"ETag": held})
+        res = await project.get_content_service.get_content_changes(kioskId, since)
+        response.headers["Cache-Control"] = "no-store"
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/content/{kioskId}/lookahead",
+    response_model=project.get_content_service.GetContentLookaheadResponse,
+)
+async def api_get_content_lookahead(
+    kioskId: str, hours: int = 24
+) -> project.get_content_service.GetContentLookaheadResponse | Response:
+    """
+    Lists the content a kiosk will display over the next `hours` hours, so it can preload media.
+    """
+    try:
+        body = await project.get_content_service.get_content_lookahead_json(
+            kioskId, hours
+        )
+        return Response(content=body, media_type="application/json")
+    except ValueError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=400,
+            media_type="application/json",
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/content/{kioskId}/events")
+async def api_get_content_events(kioskId: str) -> StreamingResponse:
+    """
+    Streams content changes for a specific kiosk as server-sent events.
+    """
+    return StreamingResponse(
+        content_events.stream(kioskId),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/internal/cache-stats")
+async def api_get_cache_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Reports size and hit/miss counters of the in-process caches and batch loaders.
+    """
+    return {
+        "ui_settings": project.get_ui_settings_service.ui_settings_cache.stats(),
+        "user_profile_loader": project.get_ui_settings_service.user_profile_loader.stats(),
+        "user_loader": project.update_user_permissions_service.user_loader.stats(),
+        "content_bodies": project.get_content_service.content_bodies.stats(),
+        "request_flights": request_flights.stats(),
+        "compressed_variants": compressed_cache.stats(),
+        "policy_subjects": policy_engine.subjects.stats(),
+    }
+
+
+@app.post(
+    "/telemetry/ingest",
+    response_model=project.ingest_telemetry_service.IngestTelemetryResponse,
+    status_code=202,
+)
+async def api_post_ingest_telemetry(
+    batch: project.ingest_telemetry_service.IngestTelemetryRequest,
+    session: Session = Depends(require_permission("IngestTelemetry")),
+) -> project.ingest_telemetry_service.IngestTelemetryResponse | Response:
+    """
+    Accepts a batch of kiosk interaction events for asynchronous writing.
     """
     try:
-        res = await project.get_content_service.get_content(kioskId)
+        res = await project.ingest_telemetry_service.ingest_telemetry(batch)
         return res
+    except TelemetryQueueFullError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            media_type="application/json",
+        )
     except Exception as e:
         logger.exception("Error processing request")
         res = dict()
@@ -226,3 +727,249 @@ async def api_get_get_content(
             status_code=500,
             media_type="application/json",
         )
+
+
+@app.post(
+    "/devices/{deviceId}/heartbeat",
+    response_model=project.device_heartbeat_service.DeviceHeartbeatResponse,
+)
+async def api_post_device_heartbeat(
+    deviceId: str,
+    status: Literal["Online", "Offline", "Maintenance"] = "Online",
+    session: Session = Depends(require_permission("ManageDevices")),
+) -> project.device_heartbeat_service.DeviceHeartbeatResponse | Response:
+    """
+    Records a heartbeat from a kiosk device.
+    """
+    try:
+        res = await project.device_heartbeat_service.record_heartbeat(deviceId, status)
+        return res
+    except LookupError as e:
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=404,
+            media_type="application/json",
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/devices/fleet-status",
+    response_model=project.device_heartbeat_service.FleetStatusResponse,
+)
+async def api_get_fleet_status(
+    session: Session = Depends(require_permission("ManageDevices")),
+) -> project.device_heartbeat_service.FleetStatusResponse | Response:
+    """
+    Summarises device statuses and stale devices from the in-memory fleet view.
+    """
+    try:
+        res = await project.device_heartbeat_service.get_fleet_status()
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/kiosks/{kioskId}/bundle/manifest",
+    response_model=project.get_offline_bundle_service.BundleManifest,
+)
+async def api_get_bundle_manifest(
+    kioskId: str,
+    userId: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+) -> Response:
+    """
+    Returns the offline bundle manifest of a kiosk.
+    """
+    try:
+        bundle = await project.get_offline_bundle_service.compile_bundle(
+            kioskId, userId
+        )
+        held = matched_etag(if_none_match, bundle.etag)
+        if held is not None:
+            return Response(status_code=304, headers={"ETag": held})
+        body, headers = precompressed(
+            ("manifest", bundle.etag), bundle.encoded_manifest, accept_encoding
+        )
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={
+                "ETag": variant_etag(bundle.etag, headers.get("Content-Encoding")),
+                **headers,
+            },
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/kiosks/{kioskId}/bundle")
+async def api_get_bundle_archive(kioskId: str, userId: Optional[str] = None) -> Response:
+    """
+    Downloads the complete offline bundle of a kiosk as one gzip compressed JSON document.
+    """
+    try:
+        bundle = await project.get_offline_bundle_service.compile_bundle(
+            kioskId, userId
+        )
+        return Response(
+            content=bundle_store.archive(bundle),
+            media_type="application/json",
+            headers={
+                "Content-Encoding": "gzip",
+                "ETag": variant_etag(bundle.etag, "gzip"),
+            },
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/bundles/blobs/{hash}")
+async def api_get_bundle_blob(
+    hash: str, kioskId: Optional[str] = None, userId: Optional[str] = None
+) -> Response:
+    """
+    Downloads one content-addressed bundle blob.
+
+    Kiosks pass the kioskId and userId they fetched the manifest with, so any
+    instance can rebuild a blob it does not hold.
+    """
+    try:
+        blob = await project.get_offline_bundle_service.get_bundle_blob(
+            hash, kioskId, userId
+        )
+    except Exception as e:
+        logger.exception("Error processing request")
+        return Response(
+            content=jsonable_encoder({"error": str(e)}),
+            status_code=500,
+            media_type="application/json",
+        )
+    if blob is None:
+        return Response(
+            content=jsonable_encoder({"error": f"Blob {hash} not found."}),
+            status_code=404,
+            media_type="application/json",
+        )
+    return Response(
+        content=blob,
+        media_type="application/json",
+        headers={
+            "Content-Encoding": "gzip",
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{hash}"',
+        },
+    )
+
+
+@app.get(
+    "/analytics/devices",
+    response_model=project.get_interaction_analytics_service.GetDeviceAnalyticsResponse,
+)
+async def api_get_device_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    deviceId: Optional[str] = None,
+    granularity: Literal["Hour", "Day"] = "Hour",
+    session: Session = Depends(require_permission("ViewAnalytics")),
+) -> project.get_interaction_analytics_service.GetDeviceAnalyticsResponse | Response:
+    """
+    Reports device interactions per device, action and time bucket.
+    """
+    try:
+        res = await project.get_interaction_analytics_service.get_device_analytics(
+            start, end, deviceId, granularity
+        )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get(
+    "/analytics/content",
+    response_model=project.get_interaction_analytics_service.GetContentAnalyticsResponse,
+)
+async def api_get_content_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    contentId: Optional[str] = None,
+    session: Session = Depends(require_permission("ViewAnalytics")),
+) -> project.get_interaction_analytics_service.GetContentAnalyticsResponse | Response:
+    """
+    Reports views, likes and dislikes per content item.
+    """
+    try:
+        res = await project.get_interaction_analytics_service.get_content_analytics(
+            start, end, contentId
+        )
+        return res
+    except Exception as e:
+        logger.exception("Error processing request")
+        res = dict()
+        res["error"] = str(e)
+        return Response(
+            content=jsonable_encoder(res),
+            status_code=500,
+            media_type="application/json",
+        )
+
+
+@app.get("/ready")
+async def api_get_ready() -> Response:
+    """
+    Readiness probe. Answers 503 until the worker has warmed up, with the
+    start-up timing report in either case.
+    """
+    return Response(
+        content=dumps(startup.report()),
+        status_code=200 if startup.ready else 503,
+        media_type="application/json",
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_get_metrics() -> PlainTextResponse:
+    """
+    Exposes request, database and subsystem metrics in Prometheus text format.
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import prisma
+import prisma.models
+from fastapi import Header, HTTPException
+from jose import JWTError, jwt
+from project.user_login_service import ALGORITHM, SECRET_KEY
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+
+TOKEN_SWEEP_SECONDS = float(os.getenv("TOKEN_SWEEP_SECONDS", "300"))
+
+TOKEN_SWEEP_BATCH_SIZE = int(os.getenv("TOKEN_SWEEP_BATCH_SIZE", "1000"))
+
+
+class InvalidSessionError(Exception):
+    """
+    Raised when a token is malformed, badly signed, expired or revoked.
+    """
+
+
+class Session(BaseModel):
+    """
+    The claims of a validated access token.
+    """
+
+    subject: str
+    expiresAt: datetime
+
+
+def token_fingerprint(token: str) -> bytes:
+    """
+    Returns the key under which a token is tracked in the revocation list.
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+class RevocationList:
+    """
+    In-memory set of revoked access tokens.
+
+    The set is loaded from revoked `AuthToken` rows at startup and refreshed
+    incrementally every `refresh_interval` seconds, so a logout handled by any
+    worker takes effect everywhere within that delay. Logouts handled by this
+    worker take effect immediately. Entries are forgotten once the token has
+    expired, since the signature check rejects it from then on.
+    """
+
+    def __init__(self, refresh_interval: float = REVOCATION_REFRESH_SECONDS) -> None:
+        self.refresh_interval = refresh_interval
+        self._revoked: Dict[bytes, datetime] = {}
+        self._synced_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, token: str) -> bool:
+        return token_fingerprint(token) in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def revoke(self, token: str, expiresAt: datetime) -> None:
+        self._revoked[token_fingerprint(token)] = expiresAt
+
+    def prune(self, now: datetime) -> None:
+        self._revoked = {
+            fingerprint: expiresAt
+            for fingerprint, expiresAt in self._revoked.items()
+            if expiresAt > now
+        }
+
+    async def refresh(self) -> None:
+        """
+        Loads tokens revoked since the previous refresh.
+
+        Each refresh overlaps the previous one by one interval so revocations
+        committed late, or stamped by a worker with a slightly skewed clock, are
+        not missed.
+        """
+        now = datetime.now(timezone.utc)
+        where: dict = {"revokedAt": {"not": None}, "expiresAt": {"gt": now}}
+        if self._synced_until is not None:
+            where["revokedAt"] = {
+                "gt": self._synced_until - timedelta(seconds=self.refresh_interval)
+            }
+        rows = await prisma.models.AuthToken.prisma().find_many(where=where)
+        for row in rows:
+            self.revoke(row.token, row.expiresAt)
+        self._synced_until = now
+        self.prune(now)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh the token revocation list")
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+revocation_list = RevocationList()
+
+
+class TokenSweeper:
+    """
+    Deletes expired `AuthToken` rows in the background.
+
+    An expired token is rejected by its signature check and cannot be logged
+    out, so its row is no longer needed. Rows are deleted in batches of at
+    most `batch_size`, each a short statement served by the `expiresAt` index,
+    so a large backlog never holds locks for long. Rows locked by another
+    worker's sweep are skipped rather than waited on.
+    """
+
+    def __init__(
+        self,
+        interval: float = TOKEN_SWEEP_SECONDS,
+        batch_size: int = TOKEN_SWEEP_BATCH_SIZE,
+    ) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self.swept = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self, now: Optional[datetime] = None) -> int:
+        """
+        Deletes every token that expired before `now`. Returns the number of rows deleted.
+        """
+        now = now or datetime.now(timezone.utc)
+        deleted = 0
+        while True:
+            count = await prisma.get_client().execute_raw(
+                """
+                DELETE FROM "AuthToken"
+                WHERE "id" IN (
+                    SELECT "id" FROM "AuthToken"
+                    WHERE "expiresAt" < $1::timestamp(3)
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                now,
+                self.batch_size,
+            )
+            deleted += count
+            self.swept += count
+            if count < self.batch_size:
+                return deleted
+            await asyncio.sleep(0)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                deleted = await self.sweep()
+                if deleted:
+                    logger.info("Deleted %d expired tokens", deleted)
+            except Exception:
+                logger.exception("Failed to delete expired tokens")
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+token_sweeper = TokenSweeper()
+
+
+def validate_token(token: str) -> Session:
+    """
+    Validates an access token without touching the database.
+
+    Args:
+        token (str): The JWT issued by `user_login`.
+
+    Returns:
+        Session: The validated session claims.
+
+    Raises:
+        InvalidSessionError: If the signature or expiry is invalid, or the token was revoked.
+    """
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        raise InvalidSessionError(str(e)) from e
+    if token in revocation_list:
+        raise InvalidSessionError("Token has been revoked.")
+    return Session(
+        subject=claims["sub"],
+        expiresAt=datetime.fromtimestamp(claims["exp"], timezone.utc),
+    )
+
+
+async def get_current_session(authorization: Optional[str] = Header(None)) -> Session:
+    """
+    FastAPI dependency resolving the session of a `Authorization: Bearer` request.
+    """
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing bearer token.")
+    try:
+        return validate_token(authorization[7:].strip())
+    except InvalidSessionError as e:
+        raise HTTPException(status_code=401, detail=str(e))
@@ -0,0 +1,68 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Shares one in-flight computation between concurrent callers of the same key.
+
+    The first caller of a key starts the computation as its own task; callers
+    arriving before it finishes await the same task and receive the same
+    result or exception. The computation is shielded, so a caller that is
+    cancelled (for example because its client disconnected) does not cancel it
+    for the others. Nothing is kept once the computation completes.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _land(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        self._flights.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away.
+            task.exception()
+
+    def stats(self) -> Dict[str, float]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._flights)}
+
+
+request_flights = SingleFlight()
+
+
+def single_flight(
+    fn: Callable[..., Awaitable[T]],
+) -> Callable[..., Awaitable[T]]:
+    """
+    Decorates an async service function so identical concurrent calls share one execution.
+
+    Calls are identical when they target the same function with equal
+    arguments. Calls with unhashable arguments are executed normally.
+    """
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return await fn(*args, **kwargs)
+        return await request_flights.do(key, lambda: fn(*args, **kwargs))
+
+    return wrapper
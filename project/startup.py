@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import prisma
+import prisma.models
+import project.device_heartbeat_service
+import project.get_content_service
+import project.get_interaction_analytics_service
+import project.get_offline_bundle_service
+import project.get_security_audit_logs_service
+import project.get_ui_settings_service
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from project.password_hashing import password_hasher
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", "8"))
+
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+
+PROCESS_PHASE = "process.boot"
+
+
+def process_age() -> Optional[float]:
+    """
+    Returns the seconds elapsed since the process was started, or None where
+    the platform does not expose it (only Linux /proc is read).
+    """
+    try:
+        with open("/proc/self/stat") as stat:
+            # The command name may contain spaces; fields resume after its ")".
+            fields = stat.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime:
+            booted = float(uptime.read().split()[0])
+        return booted - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupSequence:
+    """
+    Times every step of a worker's start-up and warms it up before it reports ready.
+
+    Lifespan steps are awaited through `timed`, which records how long each
+    took. Warm-up steps run in the background once the app accepts
+    connections: they open the database pool, run a representative query
+    for each read route so the query engine and the in-process indexes are
+    hot, and build the response model schemas. `ready` only turns True once
+    they have all finished; a failing or slow step is recorded in the report
+    but does not keep the worker out of rotation for longer than `timeout`.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = WARMUP_ENABLED,
+        timeout: float = WARMUP_TIMEOUT_SECONDS,
+    ) -> None:
+        self.enabled = enabled
+        self.timeout = timeout
+        self.ready = False
+        self.phases: Dict[str, float] = {}
+        self.failures: Dict[str, str] = {}
+        self._warmups: List[Tuple[str, Callable[[], Awaitable[object]]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_warmup(self, name: str, fn: Callable[[], Awaitable[object]]) -> None:
+        """
+        Registers a warm-up step, run in registration order after start-up.
+        """
+        self._warmups.append((name, fn))
+
+    def begin(self) -> None:
+        """
+        Records the time spent before the lifespan hook runs: interpreter start,
+        imports and building the app.
+        """
+        age = process_age()
+        if age is not None:
+            self.phases[PROCESS_PHASE] = age
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    async def _warm_up(self) -> None:
+        for name, fn in self._warmups:
+            try:
+                await self.timed(f"warmup.{name}", fn())
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+                self.failures[name] = str(e)
+
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._warm_up(), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up did not finish within %.0fs", self.timeout)
+            self.failures["timeout"] = f"Warm-up exceeded {self.timeout}s"
+        self.phases["warmup"] = time.perf_counter() - started
+        self.ready = True
+        logger.info("Worker ready; start-up phases: %s", self.report()["phases"])
+
+    def start_warmup(self) -> None:
+        """
+        Runs the warm-up steps in the background, or marks the worker ready
+        right away when warm-up is disabled.
+        """
+        if not self.enabled:
+            self.ready = True
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self.ready = False
+
+    def report(self) -> Dict[str, object]:
+        """
+        Returns readiness, the duration of every phase in seconds, slowest
+        first, and the warm-up steps that failed.
+        """
+        return {
+            "ready": self.ready,
+            "phases": dict(
+                sorted(self.phases.items(), key=lambda phase: phase[1], reverse=True)
+            ),
+            "failures": dict(self.failures),
+        }
+
+
+async def warm_db_pool() -> None:
+    """
+    Opens several pooled connections at once so the first concurrent requests
+    do not each pay for a connection handshake.
+    """
+    client = prisma.get_client()
+    await asyncio.gather(
+        *(client.query_raw("SELECT 1") for _ in range(WARMUP_POOL_CONNECTIONS))
+    )
+
+
+async def warm_content_routes() -> None:
+    """
+    Loads the schedule of one kiosk and serves it the way the content, lookahead
+    and bundle routes do.
+    """
+    content = await prisma.models.Content.prisma().find_first(
+        where={"isActive": True}
+    )
+    if content is None:
+        return
+    kioskId = content.kioskId
+    await project.get_content_service.get_content_etag(kioskId)
+    await project.get_content_service.get_content_snapshot(kioskId)
+    await project.get_content_service.get_content_lookahead_json(kioskId, 24)
+    await project.get_content_service.get_content_changes(
+        kioskId, datetime.now(timezone.utc)
+    )
+    await project.get_offline_bundle_service.compile_bundle(kioskId)
+
+
+async def warm_ui_settings_routes() -> None:
+    profile = await prisma.models.UserProfile.prisma().find_first()
+    if profile is not None:
+        await project.get_ui_settings_service.get_ui_settings(profile.userId)
+
+
+async def warm_reporting_routes() -> None:
+    await project.get_security_audit_logs_service.get_security_audit_logs_json()
+    await project.get_interaction_analytics_service.get_device_analytics(
+        None, None, None, "Hour"
+    )
+    await project.get_interaction_analytics_service.get_content_analytics(
+        None, None, None
+    )
+    await project.device_heartbeat_service.get_fleet_status()
+
+
+async def warm_password_hasher() -> None:
+    """
+    Loads the hashing backend and starts the pool's first thread before the
+    first login does.
+    """
+    await password_hasher.hash("warm-up")
+
+
+def response_model_warmup(app: FastAPI) -> Callable[[], Awaitable[None]]:
+    """
+    Returns a warm-up step that builds the OpenAPI document and the JSON schema
+    of every response model, which pydantic otherwise builds on first use.
+    """
+
+    async def warm() -> None:
+        app.openapi()
+        for route in app.routes:
+            if isinstance(route, APIRoute) and route.response_model is not None:
+                schema = getattr(route.response_model, "schema", None)
+                if schema is not None:
+                    schema()
+
+    return warm
+
+
+startup = StartupSequence()
+startup.add_warmup("db_pool", warm_db_pool)
+startup.add_warmup("content", warm_content_routes)
+startup.add_warmup("ui_settings", warm_ui_settings_routes)
+startup.add_warmup("reporting", warm_reporting_routes)
+startup.add_warmup("password_hasher", warm_password_hasher)
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Tuple
+
+import prisma
+import prisma.errors
+import prisma.models
+from project.interaction_rollups import interaction_rollups
+from project.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INGEST_QUEUE_CAPACITY = int(os.getenv("INGEST_QUEUE_CAPACITY", "50000"))
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "1"))
+
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+
+INGEST_RETRY_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_BACKOFF_SECONDS", "0.5"))
+
+INGEST_RETRY_MAX_BACKOFF_SECONDS = float(
+    os.getenv("INGEST_RETRY_MAX_BACKOFF_SECONDS", "30")
+)
+
+CONTENT_INTERACTION = "ContentInteraction"
+
+DEVICE_INTERACTION = "DeviceInteraction"
+
+flush_latency = registry.histogram(
+    "telemetry_flush_duration_seconds",
+    "Time taken to write one batch of telemetry events.",
+    ("table",),
+)
+
+ingest_events = registry.counter(
+    "telemetry_events_total",
+    "Telemetry events by outcome (accepted, rejected, written, retried, failed).",
+    ("outcome",),
+)
+
+
+class TelemetryQueueFullError(Exception):
+    """
+    Raised when an ingest batch does not fit in the remaining queue capacity.
+    """
+
+    def __init__(self, retry_after: int = 1) -> None:
+        super().__init__("Telemetry queue is full, please retry shortly.")
+        self.retry_after = retry_after
+
+
+class TelemetryIngestQueue:
+    """
+    Bounded in-process queue of interaction events written in batches.
+
+    Requests only append to the queue. A background task writes queued events
+    with one `create_many` per table whenever `batch_size` events are waiting or
+    `flush_interval` seconds have passed, whichever comes first. A batch that
+    would overflow `capacity` is rejected as a whole so kiosks can retry it.
+
+    Rows that fail to be written for any reason other than their own content,
+    such as a lost connection or a timeout, are kept and written again after an
+    exponential backoff, up to `max_retries` times. They count against
+    `capacity` while they wait, so a database outage turns into rejected
+    ingests rather than unbounded memory.
+    """
+
+    def __init__(
+        self,
+        capacity: int = INGEST_QUEUE_CAPACITY,
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_interval: float = INGEST_FLUSH_SECONDS,
+        max_retries: int = INGEST_MAX_RETRIES,
+        retry_backoff: float = INGEST_RETRY_BACKOFF_SECONDS,
+    ) -> None:
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._events: Deque[Tuple[str, dict]] = deque()
+        self._retries: Deque[Tuple[str, List[dict], int]] = deque()
+        self._retrying = 0
+        self._retry_at = 0.0
+        self._ready = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._events) + self._retrying
+
+    def enqueue(self, events: List[Tuple[str, dict]]) -> int:
+        """
+        Queues a batch of (table, data) events, all or nothing.
+
+        Raises:
+            TelemetryQueueFullError: If the batch does not fit in the queue.
+        """
+        if len(self) + len(events) > self.capacity:
+            ingest_events.inc(len(events), "rejected")
+            raise TelemetryQueueFullError()
+        self._events.extend(events)
+        ingest_events.inc(len(events), "accepted")
+        if len(self._events) >= self.batch_size:
+            self._ready.set()
+        return len(events)
+
+    async def _write(self, table: str, rows: List[dict], attempt: int = 0) -> None:
+        """
+        Writes rows with one `create_many`.
+
+        When the database rejects the rows themselves, for example because one
+        event names a device that does not exist, the batch is split in halves
+        and retried, so only the offending rows are dropped. Any other failure
+        queues the rows for another attempt, unless they have used up their
+        retries or the queue is stopping.
+        """
+        started = time.perf_counter()
+        try:
+            await getattr(prisma.models, table).prisma().create_many(data=rows)
+        except prisma.errors.DataError as e:
+            flush_latency.observe(time.perf_counter() - started, table)
+            if len(rows) == 1:
+                ingest_events.inc(1, "failed")
+                logger.warning("Dropping %s event %s: %s", table, rows[0], e)
+                return
+            middle = len(rows) // 2
+            await self._write(table, rows[:middle], attempt)
+            await self._write(table, rows[middle:], attempt)
+            return
+        except Exception:
+            flush_latency.observe(time.perf_counter() - started, table)
+            if attempt < self.max_retries and not self._stopping:
+                self._retries.append((table, rows, attempt + 1))
+                self._retrying += len(rows)
+                self._retry_at = time.monotonic() + min(
+                    self.retry_backoff * 2**attempt, INGEST_RETRY_MAX_BACKOFF_SECONDS
+                )
+                ingest_events.inc(len(rows), "retried")
+                logger.warning(
+                    "Failed to write %d %s events, retrying (attempt %d)",
+                    len(rows),
+                    table,
+                    attempt + 1,
+                    exc_info=True,
+                )
+                return
+            ingest_events.inc(len(rows), "failed")
+            logger.exception("Failed to write %d %s events", len(rows), table)
+            return
+        flush_latency.observe(time.perf_counter() - started, table)
+        ingest_events.inc(len(rows), "written")
+        for row in rows:
+            if table == CONTENT_INTERACTION:
+                interaction_rollups.record_content(
+                    row["contentId"], row["action"], row["createdAt"]
+                )
+            else:
+                interaction_rollups.record_device(
+                    row["deviceId"], row["action"], row["createdAt"]
+                )
+
+    async def flush(self) -> int:
+        """
+        Writes up to one batch of queued events. Returns the number of events taken.
+
+        A batch waiting to be retried is written first once its backoff has
+        passed, or straight away when the queue is stopping. Until then nothing
+        else is written, so an unavailable database is not sent every queued batch.
+        """
+        self._ready.clear()
+        if self._retries:
+            if not self._stopping and time.monotonic() < self._retry_at:
+                return 0
+            table, rows, attempt = self._retries.popleft()
+            self._retrying -= len(rows)
+            await self._write(table, rows, attempt)
+            return len(rows)
+        batch = [
+            self._events.popleft()
+            for _ in range(min(self.batch_size, len(self._events)))
+        ]
+        if not batch:
+            return 0
+        by_table: dict = {CONTENT_INTERACTION: [], DEVICE_INTERACTION: []}
+        for table, data in batch:
+            by_table[table].append(data)
+        for table, rows in by_table.items():
+            if rows:
+                await self._write(table, rows)
+        return len(batch)
+
+    async def drain(self) -> None:
+        while await self.flush():
+            pass
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.drain()
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops the background flusher and writes everything still queued.
+
+        The flusher is not cancelled: it finishes the batch it is writing, so
+        events already taken off the queue are not lost.
+        """
+        self._stopping = True
+        self._ready.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.drain()
+
+
+telemetry_queue = TelemetryIngestQueue()
+
+
+def event_time(createdAt: Optional[datetime]) -> datetime:
+    return createdAt if createdAt else datetime.now(timezone.utc)
@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Optional, Set, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Size-bounded LRU cache whose entries also expire after a fixed time-to-live.
+
+    Hits and misses are counted so the cache's effectiveness can be reported.
+
+    Values read from the source of truth are stored between `begin_load` and
+    `end_load`: a key written or invalidated while a load of it is pending is
+    reported as changed, so the loader can drop what it read instead of
+    caching a value older than the write.
+
+    Args:
+        maxsize (int): The maximum number of entries kept before the least recently used is evicted.
+        ttl (float): The number of seconds an entry stays valid after it was stored.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self._loads: Dict[K, int] = {}
+        self._changed: Set[K] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        if key in self._loads:
+            self._changed.add(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        if key in self._loads:
+            self._changed.add(key)
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._changed.update(self._loads)
+        self._entries.clear()
+
+    def begin_load(self, key: K) -> None:
+        self._loads[key] = self._loads.get(key, 0) + 1
+
+    def end_load(self, key: K) -> bool:
+        """
+        Ends a load started with `begin_load` and returns whether the key was left
+        untouched while loads of it were pending.
+
+        The mark is kept until the last pending load of the key ends, so a load
+        overlapping a write is never reported as unchanged.
+        """
+        unchanged = key not in self._changed
+        pending = self._loads.pop(key, 1) - 1
+        if pending:
+            self._loads[key] = pending
+        else:
+            self._changed.discard(key)
+        return unchanged
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -3,6 +3,10 @@ from typing import Optional
 
 import prisma
 import prisma.models
+from project.content_events import content_events
+from project.content_schedule_index import as_utc
+from project.get_content_service import content_details_from_row, schedule_index
+from project.invalidation_bus import CONTENT_TOPIC, invalidation_bus
 from pydantic import BaseModel
 
 
@@ -22,6 +26,7 @@ async def update_content(
     contentType: str,
     scheduledTime: str,
     isActive: bool,
+    endTime: Optional[str] = None,
 ) -> UpdateContentResponse:
     """
     Updates or adds new content to the schedule.
@@ -33,15 +38,24 @@ async def update_content(
         contentType (str): The type of content being scheduled (e.g., Image, Video, NewsTicker).
         scheduledTime (str): The specific datetime when the content is scheduled to be displayed. It is expected in ISO 8601 format.
         isActive (bool): Flag indicating whether the content is active and should be displayed according to the schedule.
+        endTime (Optional[str]): The datetime, in ISO 8601 format, when the content stops being displayed. Content without an end time is displayed until it is deactivated.
 
     Returns:
         UpdateContentResponse: Response model confirming the content has been updated or added to the schedule, including the identifier of the updated or new content item.
+
+    Raises:
+        ValueError: If a timestamp is malformed or `endTime` is not after `scheduledTime`.
     """
     scheduledTime_datetime = datetime.fromisoformat(scheduledTime)
+    endTime_datetime = datetime.fromisoformat(endTime) if endTime else None
+    if endTime_datetime is not None and as_utc(endTime_datetime) <= as_utc(
+        scheduledTime_datetime
+    ):
+        raise ValueError("endTime must be after scheduledTime")
     existing_content: Optional[
         prisma.models.Content
     ] = await prisma.models.Content.prisma().find_unique(
-        where={"title": title, "kioskId": kioskId}
+        where={"kioskId_title": {"kioskId": kioskId, "title": title}}
     )
     if existing_content:
         updated_content = await prisma.models.Content.prisma().update(
@@ -50,9 +64,14 @@ async def update_content(
                 "contentBody": contentBody,
                 "contentType": contentType,
                 "scheduledTime": scheduledTime_datetime,
+                "endTime": endTime_datetime,
                 "isActive": isActive,
             },
         )
+        schedule_index.apply(updated_content)
+        content_events.publish(
+            kioskId, "content", content_details_from_row(updated_content).json()
+        )
         content_id = existing_content.id
         message = "Content updated successfully."
     else:
@@ -62,10 +81,16 @@ async def update_content(
                 "contentBody": contentBody,
                 "contentType": contentType,
                 "scheduledTime": scheduledTime_datetime,
+                "endTime": endTime_datetime,
                 "isActive": isActive,
                 "kioskId": kioskId,
             }
         )
+        schedule_index.apply(new_content)
+        content_events.publish(
+            kioskId, "content", content_details_from_row(new_content).json()
+        )
         content_id = new_content.id
         message = "New content added successfully."
+    invalidation_bus.publish(CONTENT_TOPIC, kioskId)
     return UpdateContentResponse(contentId=content_id, message=message)
@@ -2,6 +2,8 @@ from typing import Optional
 
 import prisma
 import prisma.models
+from project.get_ui_settings_service import ui_settings_cache, ui_settings_from_profile
+from project.invalidation_bus import UI_SETTINGS_TOPIC, invalidation_bus
 from pydantic import BaseModel
 
 
@@ -31,6 +33,9 @@ async def update_ui_settings(
     """
     Updates the UI settings based on user preferences.
 
+    Theme, layout and language are persisted on the user's profile and the new
+    settings are written through to `ui_settings_cache`.
+
     Args:
         userId (str): The identifier of the user whose UI settings are being updated.
         theme (str): The desired theme for the user interface.
@@ -41,18 +46,19 @@ async def update_ui_settings(
         UpdateUserUISettingsResponse: Response after updating the UI settings, reflecting the applied changes or an error state.
     """
     try:
-        user_profile = await prisma.models.UserProfile.prisma().find_unique(
-            where={"userId": userId}
+        updated_profile = await prisma.models.UserProfile.prisma().update(
+            where={"userId": userId},
+            data={"theme": theme, "layout": layout, "language": language},
         )
-        if not user_profile:
+        if not updated_profile:
+            ui_settings_cache.invalidate(userId)
             return UpdateUserUISettingsResponse(
                 success=False,
                 message="User profile not found",
                 updatedSettings=UserInterfaceSettings(theme="", layout="", language=""),
             )
-        updated_profile = await prisma.models.UserProfile.prisma().update(
-            where={"userId": userId}, data={"language": language}
-        )
+        ui_settings_cache.put(userId, ui_settings_from_profile(updated_profile))
+        invalidation_bus.publish(UI_SETTINGS_TOPIC, userId)
         return UpdateUserUISettingsResponse(
             success=True,
             message="UI settings updated successfully",
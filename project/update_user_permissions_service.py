@@ -1,9 +1,25 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import prisma
 import prisma.models
+from project.data_loader import BatchLoader
+from project.invalidation_bus import (
+    POLICY_TOPIC,
+    USER_PERMISSIONS_TOPIC,
+    invalidation_bus,
+)
+from project.rbac import (
+    DEFAULT_POLICY,
+    POLICY_ID,
+    ROLES,
+    permission_mask,
+    permission_names,
+    policy_engine,
+)
 from pydantic import BaseModel
 
+POLICY_LOCK = "SELECT pg_advisory_xact_lock(hashtext('role_policy'))"
+
 
 class UpdateUserPermissionsResponse(BaseModel):
     """
@@ -15,36 +31,209 @@ class UpdateUserPermissionsResponse(BaseModel):
     status: str
 
 
+class UserRoleAssignment(BaseModel):
+    """
+    A single user's new role, as part of a bulk role change.
+    """
+
+    userId: str
+    role: str
+
+
+class BulkUpdateUserRolesResponse(BaseModel):
+    """
+    Response model for a bulk role change, listing the users that do not exist.
+    """
+
+    updated: int
+    missing: List[str]
+
+
+class RolePolicyResponse(BaseModel):
+    """
+    The permissions granted to every role by the current policy.
+    """
+
+    version: int
+    roles: Dict[str, List[str]]
+
+
+async def load_users(userIds: List[str]) -> Dict[str, prisma.models.User]:
+    """
+    Fetches many users with a single query, keyed by id.
+    """
+    users = await prisma.models.User.prisma().find_many(where={"id": {"in": userIds}})
+    return {user.id: user for user in users}
+
+
+user_loader: BatchLoader[str, prisma.models.User] = BatchLoader(load_users)
+
+
+def split_permissions(entries: List[str]) -> Tuple[Optional[str], List[str]]:
+    """
+    Separates a role name from explicitly granted permissions.
+
+    Raises:
+        ValueError: If an entry is neither a role nor a permission, or several roles are given.
+    """
+    roles = [entry for entry in entries if entry in ROLES]
+    if len(roles) > 1:
+        raise ValueError(f"A user has a single role, got {', '.join(roles)}")
+    grants = permission_names(
+        permission_mask(entry for entry in entries if entry not in ROLES)
+    )
+    return (roles[0] if roles else None), grants
+
+
 async def update_user_permissions(
     userId: str, newPermissions: List[str]
 ) -> UpdateUserPermissionsResponse:
     """
     Updates user roles and permissions.
 
+    Each entry is either a role, which replaces the user's role, or a permission
+    granted to the user on top of their role. The permissions in the list replace
+    the user's previous explicit grants; when no role is listed the role is kept.
+
     Args:
     userId (str): The unique identifier of the user whose permissions are to be updated.
     newPermissions (List[str]): A list of new permissions to be applied to the user.
 
     Returns:
-    UpdateUserPermissionsResponse: Response model confirming the updated permissions of the user.
+    UpdateUserPermissionsResponse: Response model confirming the updated permissions of the user, listing everything the user may now do.
+
+    Raises:
+    ValueError: If an entry is unknown or more than one role is given.
 
     Example:
     update_user_permissions('123e4567-e89b-12d3-a456-426614174000', ['MunicipalAdmin'])
     """
-    user = await prisma.models.User.prisma().find_unique(where={"id": userId})
+    role, grants = split_permissions(newPermissions)
+    user = await user_loader.load(userId)
     if user is None:
         return UpdateUserPermissionsResponse(
             userId=userId, updatedPermissions=[], status="User not found"
         )
     try:
-        if newPermissions:
-            await prisma.models.User.prisma().update(
-                where={"id": userId}, data={"role": newPermissions[0]}
-            )
+        data: dict = {"permissions": grants}
+        if role is not None:
+            data["role"] = role
+        updated = await prisma.models.User.prisma().update(
+            where={"id": userId}, data=data
+        )
+        policy_engine.remember(updated)
+        invalidation_bus.publish(USER_PERMISSIONS_TOPIC, userId)
+        effective = policy_engine.mask(
+            str(getattr(updated.role, "value", updated.role)), permission_mask(grants)
+        )
         return UpdateUserPermissionsResponse(
-            userId=userId, updatedPermissions=newPermissions, status="Success"
+            userId=userId,
+            updatedPermissions=permission_names(effective),
+            status="Success",
         )
     except Exception as e:
         return UpdateUserPermissionsResponse(
             userId=userId, updatedPermissions=[], status=f"Update failed: {str(e)}"
         )
+
+
+async def bulk_update_user_roles(
+    assignments: List[UserRoleAssignment],
+) -> BulkUpdateUserRolesResponse:
+    """
+    Changes the role of many users in one transaction.
+
+    Users are grouped by their new role, so the transaction runs one lookup and
+    one update per distinct role regardless of how many users are changed.
+
+    Args:
+        assignments (List[UserRoleAssignment]): The users to change and their new roles. When a user is listed twice, the last entry wins.
+
+    Returns:
+        BulkUpdateUserRolesResponse: How many users were changed and which ids do not exist.
+
+    Raises:
+        ValueError: If a role is unknown.
+    """
+    latest: Dict[str, str] = {}
+    for assignment in assignments:
+        if assignment.role not in ROLES:
+            raise ValueError(f"Unknown role: {assignment.role}")
+        latest[assignment.userId] = assignment.role
+    by_role: Dict[str, List[str]] = {}
+    for userId, role in latest.items():
+        by_role.setdefault(role, []).append(userId)
+    async with prisma.get_client().tx() as transaction:
+        existing = {
+            user.id
+            for user in await transaction.user.find_many(
+                where={"id": {"in": list(latest)}}
+            )
+        }
+        for role, userIds in by_role.items():
+            await transaction.user.update_many(
+                where={"id": {"in": userIds}}, data={"role": role}
+            )
+    for userId in existing:
+        policy_engine.forget(userId)
+        invalidation_bus.publish(USER_PERMISSIONS_TOPIC, userId)
+    return BulkUpdateUserRolesResponse(
+        updated=len(existing),
+        missing=[userId for userId in latest if userId not in existing],
+    )
+
+
+def get_role_policy() -> RolePolicyResponse:
+    """
+    Returns the role policy currently compiled on this worker.
+    """
+    policy = policy_engine.policy
+    return RolePolicyResponse(version=policy.version, roles=policy.as_dict())
+
+
+async def update_role_policy(role: str, permissions: List[str]) -> RolePolicyResponse:
+    """
+    Replaces the permissions granted to a role.
+
+    The stored rows are replaced in one transaction, under an advisory lock
+    shared by all policy changes, then the policy is recompiled and swapped in
+    on this worker; other workers recompile when the change reaches them over
+    the invalidation bus.
+
+    Args:
+        role (str): The role to change.
+        permissions (List[str]): Every permission the role should grant.
+
+    Returns:
+        RolePolicyResponse: The new policy.
+
+    Raises:
+        ValueError: If the role or a permission is unknown.
+    """
+    if role not in ROLES:
+        raise ValueError(f"Unknown role: {role}")
+    permissions = permission_names(permission_mask(permissions))
+    async with prisma.get_client().tx() as transaction:
+        # Policy changes are serialised, so concurrent first changes cannot
+        # both materialise the default policy.
+        await transaction.execute_raw(POLICY_LOCK)
+        if await transaction.rolepolicy.find_unique(where={"id": POLICY_ID}) is None:
+            if not await transaction.rolepermission.count():
+                # The first change materialises the default policy for the other roles.
+                await transaction.rolepermission.create_many(
+                    data=[
+                        {"role": other, "permission": permission}
+                        for other, granted in DEFAULT_POLICY.items()
+                        if other != role
+                        for permission in granted
+                    ]
+                )
+            await transaction.rolepolicy.create(data={"id": POLICY_ID})
+        await transaction.rolepermission.delete_many(where={"role": role})
+        if permissions:
+            await transaction.rolepermission.create_many(
+                data=[{"role": role, "permission": p} for p in permissions]
+            )
+    await policy_engine.load()
+    invalidation_bus.publish(POLICY_TOPIC, role)
+    return get_role_policy()
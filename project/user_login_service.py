@@ -1,10 +1,11 @@
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 import prisma
 import prisma.models
 from jose import jwt
-from passlib.context import CryptContext
+from project.password_hashing import password_hasher, pwd_context
 from pydantic import BaseModel
 
 
@@ -19,8 +20,6 @@ class UserLoginResponse(BaseModel):
     userId: Optional[str] = None
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 SECRET_KEY = "MY_SUPER_SECRET_KEY"
 
 ALGORITHM = "HS256"
@@ -42,6 +41,23 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifies password against the hashed password on the password hashing pool.
+
+    Args:
+        plain_password (str): The plain text password to verify.
+        hashed_password (str): The hashed password to verify against.
+
+    Returns:
+        bool: True if the password matches, False otherwise.
+
+    Raises:
+        PasswordHasherBusyError: If the hashing pool is already saturated.
+    """
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Creates a JWT token that is used as the access token.
@@ -73,13 +89,24 @@ async def user_login(username: str, password: str) -> UserLoginResponse:
 
     Returns:
         UserLoginResponse: Model for the response after a user login attempt.
+
+    Raises:
+        PasswordHasherBusyError: If too many logins are already being verified.
     """
     user = await prisma.models.User.prisma().find_unique(where={"email": username})
-    if user is None or not verify_password(password, user.password):
+    if user is None or not await verify_password_async(password, user.password):
         return UserLoginResponse(success=False, message="Invalid username or password")
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "jti": str(uuid.uuid4())},
+        expires_delta=access_token_expires,
+    )
+    await prisma.models.AuthToken.prisma().create(
+        data={
+            "token": access_token,
+            "userId": user.id,
+            "expiresAt": datetime.now(timezone.utc) + access_token_expires,
+        }
     )
     return UserLoginResponse(
         success=True, message="Login successful", token=access_token, userId=user.id
@@ -1,7 +1,8 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
 import prisma
 import prisma.models
+from project.sessions import revocation_list
 from pydantic import BaseModel
 
 
@@ -19,8 +20,10 @@ async def user_logout(token: str) -> UserLogoutResponse:
     Terminates an existing user session.
 
     This function first looks up the provided session token in the `AuthToken` table. If found,
-    it deletes the token from the table, effectively ending the user session. If the token does
-    not exist or has already expired, it returns a response indicating failure to log out.
+    it marks the token as revoked and adds it to the in-memory revocation list, effectively ending
+    the user session. Other workers pick the revocation up on their next refresh. If the token does
+    not exist, has already expired or was already revoked, it returns a response indicating failure
+    to log out.
 
     Args:
         token (str): The session token or ID used for authenticating the request, to ensure that the session is rightfully terminated by its owner or a valid authority.
@@ -35,8 +38,12 @@ async def user_logout(token: str) -> UserLogoutResponse:
     auth_token = await prisma.models.AuthToken.prisma().find_unique(
         where={"token": token}
     )
-    if auth_token and auth_token.expiresAt > datetime.now():
-        await prisma.models.AuthToken.prisma().delete(where={"token": token})
+    now = datetime.now(timezone.utc)
+    if auth_token and auth_token.expiresAt > now and auth_token.revokedAt is None:
+        await prisma.models.AuthToken.prisma().update(
+            where={"token": token}, data={"revokedAt": now}
+        )
+        revocation_list.revoke(token, auth_token.expiresAt)
         return UserLogoutResponse(
             status="success", message="Session terminated successfully."
         )
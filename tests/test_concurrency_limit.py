@@ -0,0 +1,65 @@
+from project.concurrency_limit import CRITICAL, LOW, NORMAL, AdaptiveLimiter, route_priority
+
+
+def run_requests(limiter: AdaptiveLimiter, latency: float, count: int, concurrency: int):
+    for _ in range(count):
+        for _ in range(concurrency):
+            limiter.try_acquire(CRITICAL)
+        for _ in range(concurrency):
+            limiter.release(latency, "GET /content/{kioskId}")
+
+
+def test_limit_grows_while_latency_stays_at_baseline():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=1, max_limit=100)
+    run_requests(limiter, 0.01, 200, 8)
+    assert limiter.limit > 10
+
+
+def test_limit_shrinks_when_latency_rises():
+    limiter = AdaptiveLimiter(initial_limit=50, min_limit=1, max_limit=100)
+    run_requests(limiter, 0.01, 50, 10)
+    grown = limiter.limit
+    run_requests(limiter, 0.2, 200, 10)
+    assert limiter.limit < grown
+    assert limiter.limit >= limiter.min_limit
+
+
+def test_lower_priorities_are_shed_first():
+    limiter = AdaptiveLimiter(initial_limit=10)
+    for _ in range(4):
+        assert limiter.try_acquire(CRITICAL)
+    assert not limiter.try_acquire(LOW)
+    assert limiter.try_acquire(NORMAL)
+    for _ in range(3):
+        assert limiter.try_acquire(NORMAL)
+    assert not limiter.try_acquire(NORMAL)
+    assert limiter.try_acquire(CRITICAL)
+    assert limiter.shed == {CRITICAL: 0, NORMAL: 1, LOW: 1}
+
+
+def test_baselines_are_kept_per_route():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=1, max_limit=100)
+    for route, latency in (("cheap", 0.001), ("expensive", 0.1)):
+        for _ in range(20):
+            limiter.try_acquire(CRITICAL)
+            limiter.release(latency, route)
+    assert limiter.baselines["cheap"].latency == 0.001
+    assert limiter.baselines["expensive"].latency == 0.1
+    # Slow routes at their usual speed do not read as overload.
+    assert limiter.limit >= 10
+
+
+def test_unsampled_release_frees_the_slot():
+    limiter = AdaptiveLimiter(initial_limit=10)
+    limiter.try_acquire(CRITICAL)
+    limiter.release(None)
+    assert limiter.in_flight == 0
+    assert not limiter.baselines
+
+
+def test_route_priorities():
+    assert route_priority("GET", "/content/k1") == CRITICAL
+    assert route_priority("GET", "/analytics/content") == LOW
+    assert route_priority("GET", "/content/k1/events") is None
+    assert route_priority("GET", "/metrics") is None
+    assert route_priority("PUT", "/users/u1/permissions") == NORMAL
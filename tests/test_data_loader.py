@@ -0,0 +1,77 @@
+import asyncio
+from typing import Dict, List
+
+import pytest
+
+from project.data_loader import BatchLoader
+
+
+def test_coalesces_keys_loaded_in_the_same_tick():
+    calls: List[List[str]] = []
+
+    async def batch_fn(keys: List[str]) -> Dict[str, str]:
+        calls.append(keys)
+        return {key: key.upper() for key in keys if key != "missing"}
+
+    async def run():
+        loader: BatchLoader[str, str] = BatchLoader(batch_fn)
+        return await asyncio.gather(
+            loader.load("a"), loader.load("b"), loader.load("a"), loader.load("missing")
+        )
+
+    assert asyncio.run(run()) == ["A", "B", "A", None]
+    assert calls == [["a", "b", "missing"]]
+
+
+def test_cancelled_caller_does_not_fail_the_key_for_others():
+    release = None
+
+    async def batch_fn(keys: List[str]) -> Dict[str, str]:
+        await release.wait()
+        return {key: key.upper() for key in keys}
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        loader: BatchLoader[str, str] = BatchLoader(batch_fn)
+        first = asyncio.ensure_future(loader.load("a"))
+        second = asyncio.ensure_future(loader.load("a"))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        result = await second
+        assert not loader._tasks
+        return result
+
+    assert asyncio.run(run()) == "A"
+
+
+def test_batch_errors_reach_every_caller():
+    async def batch_fn(keys: List[str]) -> Dict[str, str]:
+        raise LookupError("database unavailable")
+
+    async def run():
+        loader: BatchLoader[str, str] = BatchLoader(batch_fn)
+        return await asyncio.gather(
+            loader.load("a"), loader.load("b"), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, LookupError) for result in results)
+
+
+def test_full_batches_dispatch_immediately():
+    calls: List[List[int]] = []
+
+    async def batch_fn(keys: List[int]) -> Dict[int, int]:
+        calls.append(keys)
+        return {key: key for key in keys}
+
+    async def run():
+        loader: BatchLoader[int, int] = BatchLoader(batch_fn, max_batch_size=2)
+        return await asyncio.gather(*(loader.load(key) for key in range(5)))
+
+    assert asyncio.run(run()) == [0, 1, 2, 3, 4]
+    assert calls == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,21 @@
+from project.http_caching import etag_matches, matched_etag, variant_etag
+
+
+def test_variant_etag_appends_coding():
+    assert variant_etag('"abc"', None) == '"abc"'
+    assert variant_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert variant_etag('"abc"', "br") == '"abc-br"'
+
+
+def test_matched_etag_accepts_any_variant_of_the_current_representation():
+    assert matched_etag('"abc"', '"abc"') == '"abc"'
+    assert matched_etag('"abc-gzip"', '"abc"') == '"abc-gzip"'
+    assert matched_etag('"old", W/"abc-zstd"', '"abc"') == '"abc-zstd"'
+    assert matched_etag("*", '"abc"') == '"abc"'
+
+
+def test_matched_etag_rejects_other_representations():
+    assert matched_etag(None, '"abc"') is None
+    assert matched_etag('"abd-gzip"', '"abc"') is None
+    assert matched_etag('"abc-deflate"', '"abc"') is None
+    assert not etag_matches('"old"', '"abc"')
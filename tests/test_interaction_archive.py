@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    from project import interaction_archive
+    from project.interaction_archive import (
+        ARCHIVED_TABLES,
+        DEVICE_INTERACTIONS,
+        InteractionArchive,
+        Segment,
+        archived_record,
+        newest_first,
+        write_segment,
+    )
+except (ImportError, RuntimeError) as e:  # the Prisma client has not been generated
+    pytest.skip(str(e), allow_module_level=True)
+
+BASE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def interactions(count: int, start: int = 0):
+    return [
+        SimpleNamespace(
+            id=f"{index:06d}",
+            deviceId="kiosk-a" if index % 3 else "kiosk-b",
+            userId=None,
+            action="Reboot",
+            description="",
+            createdAt=BASE + timedelta(minutes=index),
+        )
+        for index in range(start, start + count)
+    ]
+
+
+def records(rows):
+    return [archived_record(row, ARCHIVED_TABLES[DEVICE_INTERACTIONS]) for row in rows]
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(interaction_archive, "BLOCK_ROWS", 16)
+
+
+def test_segment_round_trip(tmp_path, small_blocks):
+    rows = interactions(100)
+    segment = write_segment(str(tmp_path), records(rows))
+    assert Segment.from_path(segment.path).max_micros == segment.max_micros
+    assert not [path for path in tmp_path.iterdir() if path.suffix == ".tmp"]
+
+    found = segment.scan(None, None, None, lambda row: True, 1000)
+    expected = sorted(rows, key=newest_first, reverse=True)
+    assert [row.id for row in found] == [row.id for row in expected]
+    assert found[0].createdAt == expected[0].createdAt
+    assert found[0].deviceId == expected[0].deviceId
+
+
+def test_segment_scan_filters_range_cursor_and_limit(tmp_path, small_blocks):
+    rows = interactions(100)
+    segment = write_segment(str(tmp_path), records(rows))
+    low = interaction_archive.to_micros(BASE + timedelta(minutes=20))
+    high = interaction_archive.to_micros(BASE + timedelta(minutes=60))
+    before = (BASE + timedelta(minutes=50), "000050")
+
+    found = segment.scan(low, high, before, lambda row: row.deviceId == "kiosk-a", 10)
+    expected = [
+        row.id
+        for row in sorted(rows, key=newest_first, reverse=True)
+        if 20 <= int(row.id) < 50 and row.deviceId == "kiosk-a"
+    ][:10]
+    assert [row.id for row in found] == expected
+
+
+def test_rewriting_a_batch_replaces_its_segment(tmp_path):
+    batch = records(interactions(10))
+    first = write_segment(str(tmp_path), list(batch))
+    second = write_segment(str(tmp_path), list(batch))
+    assert first.path == second.path
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_archive_scan_pages_across_segments_without_duplicates(tmp_path):
+    rows = interactions(60)
+    directory = tmp_path / DEVICE_INTERACTIONS / "2026-01-01"
+    write_segment(str(directory), records(rows[:40]))
+    # The same rows archived again in a differently shaped batch.
+    write_segment(str(directory), records(rows[30:]))
+    archive = InteractionArchive(root=str(tmp_path))
+    archive.refresh()
+
+    async def page_through():
+        found, before = [], None
+        while True:
+            page = await archive.scan(
+                DEVICE_INTERACTIONS, lambda row: True, before=before, limit=7
+            )
+            found.extend(page)
+            if len(page) < 7:
+                return found
+            before = (page[-1].createdAt, page[-1].id)
+
+    found = asyncio.run(page_through())
+    expected = sorted(rows, key=newest_first, reverse=True)
+    assert [row.id for row in found] == [row.id for row in expected]
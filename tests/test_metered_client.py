@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+try:
+    from project.metered_client import MeteredPrisma
+except (ImportError, RuntimeError) as e:  # the Prisma client has not been generated
+    pytest.skip(str(e), allow_module_level=True)
+
+from project.metrics import db_query_latency
+
+
+class RecordingEngine:
+    """
+    Stands in for the query engine process, answering every query with an empty result.
+    """
+
+    def __init__(self) -> None:
+        self.queries = []
+
+    async def query(self, content, *, tx_id=None):
+        self.queries.append(content)
+        return {"data": {"result": {"columns": [], "types": [], "rows": []}}}
+
+    def stop(self, *args, **kwargs) -> None:
+        pass
+
+
+def observations(model: str, action: str) -> float:
+    series = db_query_latency._series.get((model, action))
+    return series[-1] if series else 0
+
+
+def metered_client() -> MeteredPrisma:
+    client = MeteredPrisma()
+    client._engine = RecordingEngine()
+    return client
+
+
+def test_client_is_slotted_and_instantiates():
+    client = MeteredPrisma()
+    assert not hasattr(client, "__dict__")
+
+
+def test_execute_is_recorded():
+    client = metered_client()
+    before = observations("raw", "query_raw")
+    asyncio.run(client.query_raw("SELECT 1"))
+    assert observations("raw", "query_raw") == before + 1
+
+
+def test_batch_commit_is_recorded_once():
+    client = metered_client()
+    before = observations("batch", "commit")
+
+    async def run() -> None:
+        async with client.batch_() as batcher:
+            batcher.execute_raw("SELECT 1")
+            batcher.execute_raw("SELECT 2")
+
+    asyncio.run(run())
+    assert observations("batch", "commit") == before + 1
+    assert len(client._engine.queries) == 1
+
+
+def test_transaction_copies_are_metered():
+    client = metered_client()
+    assert isinstance(client._copy(), MeteredPrisma)
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    from project.rbac import (
+        DEFAULT_POLICY,
+        PERMISSION_BITS,
+        PERMISSIONS,
+        CompiledPolicy,
+        PolicyEngine,
+        permission_mask,
+        permission_names,
+        require_permission,
+    )
+except (ImportError, RuntimeError) as e:  # the Prisma client has not been generated
+    pytest.skip(str(e), allow_module_level=True)
+
+
+def user(id: str, role: str, permissions=()) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=id, email=f"{id}@example.org", role=role, permissions=list(permissions)
+    )
+
+
+def test_every_permission_has_its_own_bit():
+    bits = [PERMISSION_BITS[permission] for permission in PERMISSIONS]
+    assert len(set(bits)) == len(PERMISSIONS)
+    assert all(bit & (bit - 1) == 0 for bit in bits)
+
+
+def test_mask_round_trips_through_names():
+    mask = permission_mask(["ViewContent", "ManageDevices"])
+    assert permission_names(mask) == ["ViewContent", "ManageDevices"]
+    assert permission_mask([]) == 0
+    with pytest.raises(ValueError):
+        permission_mask(["Teleport"])
+
+
+def test_compiled_policy_masks_roles():
+    policy = CompiledPolicy(DEFAULT_POLICY, 1)
+    citizen = policy.role_masks["Citizen"]
+    assert citizen & PERMISSION_BITS["ViewContent"]
+    assert not citizen & PERMISSION_BITS["ManageContent"]
+    assert policy.role_masks["MunicipalAdmin"] == permission_mask(PERMISSIONS)
+    assert policy.as_dict()["Citizen"] == list(DEFAULT_POLICY["Citizen"])
+
+
+def test_compiled_policy_rejects_unknown_roles():
+    with pytest.raises(ValueError):
+        CompiledPolicy({"Visitor": ["ViewContent"]}, 1)
+
+
+def test_roles_missing_from_the_policy_get_nothing():
+    policy = CompiledPolicy({"MunicipalAdmin": PERMISSIONS}, 1)
+    assert policy.role_masks["Technician"] == 0
+
+
+def test_engine_checks_role_and_grants():
+    engine = PolicyEngine()
+    engine.remember(user("u1", "Citizen", ["ViewAnalytics"]))
+
+    async def check(permission: str) -> bool:
+        return await engine.allows("u1@example.org", permission)
+
+    assert asyncio.run(check("ViewContent"))
+    assert asyncio.run(check("ViewAnalytics"))
+    assert not asyncio.run(check("ManageUsers"))
+
+
+def test_engine_follows_policy_swaps():
+    engine = PolicyEngine()
+    engine.remember(user("u1", "Technician"))
+    assert engine.mask("Technician") & PERMISSION_BITS["ManageContent"]
+    engine.policy = CompiledPolicy({"Technician": ["ViewContent"]}, 2)
+    assert not asyncio.run(engine.allows("u1@example.org", "ManageContent"))
+
+
+def test_forget_drops_the_cached_subject():
+    engine = PolicyEngine()
+    engine.remember(user("u1", "Citizen"))
+    assert len(engine) == 1
+    engine.forget("u1")
+    assert len(engine) == 0
+    assert engine.subjects.get("u1@example.org") is None
+
+
+def test_require_permission_rejects_unknown_permissions():
+    with pytest.raises(ValueError):
+        require_permission("Teleport")
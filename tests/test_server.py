@@ -0,0 +1,23 @@
+import pytest
+
+try:
+    from prisma import Prisma
+    from project import server
+except (ImportError, RuntimeError) as e:  # the Prisma client has not been generated
+    pytest.skip(str(e), allow_module_level=True)
+
+
+def test_server_builds_a_real_prisma_client():
+    assert isinstance(server.db_client, Prisma)
+    assert not hasattr(server.db_client, "__dict__")
+
+
+def test_guarded_routes_are_registered():
+    paths = {
+        (method, route.path)
+        for route in server.app.routes
+        for method in getattr(route, "methods", ())
+    }
+    assert ("GET", "/security/audit-logs") in paths
+    assert ("POST", "/telemetry/ingest") in paths
+    assert ("PUT", "/ui-settings/{userId}/update") in paths
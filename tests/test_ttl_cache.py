@@ -0,0 +1,70 @@
+import pytest
+
+from project import ttl_cache
+from project.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_evicts_least_recently_used(clock):
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=5)
+    cache.put("a", 1)
+    clock[0] += 4.9
+    assert cache.get("a") == 1
+    clock[0] += 0.2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_put_refreshes_expiry(clock):
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=5)
+    cache.put("a", 1)
+    clock[0] += 4
+    cache.put("a", 2)
+    clock[0] += 4
+    assert cache.get("a") == 2
+
+
+def test_load_reports_writes_made_while_pending(clock):
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=5)
+    cache.begin_load("a")
+    assert cache.end_load("a")
+    cache.begin_load("a")
+    cache.put("a", 1)
+    assert not cache.end_load("a")
+    cache.begin_load("a")
+    cache.begin_load("a")
+    cache.invalidate("a")
+    assert not cache.end_load("a")
+    assert not cache.end_load("a")
+    cache.begin_load("a")
+    assert cache.end_load("a")
+
+
+def test_clear_marks_pending_loads(clock):
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=5)
+    cache.put("a", 1)
+    cache.begin_load("b")
+    cache.clear()
+    assert not cache.end_load("b")
+    assert cache.get("a") is None